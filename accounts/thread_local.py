@@ -1,17 +1,33 @@
-import threading
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
-thread_local = threading.local()
+# unlike threading.local, also isolates the concurrent requests of async views
+thread_local = Local()
 
 def get_current_request():
     return getattr(thread_local, 'request')
 
 
 class RequestMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, response):
         self.get_response = response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         thread_local.request = request
         response = self.get_response(request)
         thread_local.request = None
-        return response
\ No newline at end of file
+        return response
+
+    async def __acall__(self, request):
+        thread_local.request = request
+        response = await self.get_response(request)
+        thread_local.request = None
+        return response
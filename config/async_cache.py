@@ -0,0 +1,110 @@
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from redis import asyncio as aioredis
+
+from config.utils import get_cache_generation_key, get_cache_lock_key
+
+
+class AsyncRedisCache:
+    """
+    Async client of a django_redis cache for the async views. Keys and values are built by the client of the
+    sync backend, so both sides read each other's entries. Entries written here skip the local tier of
+    TwoTierRedisCache, other processes see them once their local copy expires.
+    """
+    def __init__(self, alias: str = DEFAULT_CACHE_ALIAS):
+        self.alias = alias
+        # connections can not be shared between event loops
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+
+        if client is None:
+            options = settings.CACHES[self.alias].get('OPTIONS', {})
+            location = settings.CACHES[self.alias]['LOCATION']
+            if isinstance(location, (list, tuple)):
+                location = location[0]
+
+            connection_pool = aioredis.ConnectionPool.from_url(location, **options.get('ASYNC_CONNECTION_POOL_KWARGS', {}))
+            client = self._clients[loop] = aioredis.Redis(connection_pool=connection_pool)
+        return client
+
+    def make_key(self, key: str):
+        return str(self.backend.client.make_key(key))
+
+    def get_timeout_ms(self, timeout):
+        # same conversion as django_redis, None never expires
+        return None if timeout is None else int(timeout * 1000)
+
+    async def get(self, key: str, default=None):
+        value = await self.get_client().get(self.make_key(key))
+        return default if value is None else self.backend.client.decode(value)
+
+    async def set(self, key: str, value, timeout: int = None):
+        encoded_value = self.backend.client.encode(value)
+        return bool(await self.get_client().set(self.make_key(key), encoded_value, px=self.get_timeout_ms(timeout)))
+
+    async def add(self, key: str, value, timeout: int = None):
+        encoded_value = self.backend.client.encode(value)
+        return bool(await self.get_client().set(self.make_key(key), encoded_value, nx=True, px=self.get_timeout_ms(timeout)))
+
+    async def delete(self, key: str):
+        return bool(await self.get_client().delete(self.make_key(key)))
+
+
+async_cache = AsyncRedisCache()
+
+
+async def aget_cache_generation(namespace: str):
+    """
+    Async version of get_cache_generation.
+    """
+    generation_key = get_cache_generation_key(namespace)
+    generation = await async_cache.get(generation_key)
+
+    if generation is None:
+        # a concurrent request may have started the generation first
+        await async_cache.add(generation_key, time.time_ns(), timeout=None)
+        generation = await async_cache.get(generation_key)
+    return generation
+
+
+async def aget_or_compute_cache(key: str, compute, timeout: int, soft_timeout: int, lock_timeout: int = 10, wait_timeout: float = 0.5):
+    """
+    Async version of get_or_compute_cache, `compute` is a coroutine function. Entries and locks are
+    the same as on the sync side, so sync and async requests never rebuild one entry twice.
+    """
+    lock_key = get_cache_lock_key(key)
+    entry = await async_cache.get(key)
+
+    if entry is not None:
+        refresh_at, value = entry
+        if time.time() < refresh_at or not await async_cache.add(lock_key, 1, lock_timeout):
+            return value
+
+    elif not await async_cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + wait_timeout
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await async_cache.get(key)
+            if entry is not None:
+                return entry[1]
+        # the lock holder is too slow, do not pile up behind it
+        return await compute()
+
+    try:
+        value = await compute()
+        await async_cache.set(key, (time.time() + soft_timeout, value), timeout)
+    finally:
+        await async_cache.delete(lock_key)
+    return value
@@ -0,0 +1,218 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django_redis.cache import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalCacheTier:
+    """
+    Bounded in-process LRU, values are pickled like in django's LocMemCache so callers never share objects.
+    """
+    def __init__(self, max_entries: int, timeout: float):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # lets the subscriber skip the invalidations published by this process
+        self.origin = uuid.uuid4().hex
+        self.pid = os.getpid()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+
+            expires_at, pickled = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, pickled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TwoTierRedisCache(RedisCache):
+    """
+    django_redis backend that keeps read-mostly keys in an in-process LRU in front of Redis.
+
+    Only keys starting with one of LOCAL_CACHE_KEY_PREFIXES are kept locally. Every write to such a key
+    is published on LOCAL_CACHE_CHANNEL and each process drops its local copy, the short
+    LOCAL_CACHE_TIMEOUT bounds staleness while a subscriber is reconnecting.
+
+    django creates a cache instance per thread, the local tier and the subscriber are shared per process.
+    """
+    _local_tiers = {}
+    _local_tiers_lock = threading.Lock()
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+
+        self._local_prefixes = tuple(options.pop('LOCAL_CACHE_KEY_PREFIXES', ()))
+        self._local_max_entries = options.pop('LOCAL_CACHE_MAX_ENTRIES', 1024)
+        self._local_timeout = options.pop('LOCAL_CACHE_TIMEOUT', 5)
+        self._local_channel = options.pop('LOCAL_CACHE_CHANNEL', 'cache_invalidation')
+
+        params['OPTIONS'] = options
+        super().__init__(server, params)
+
+    # local tier
+    @property
+    def local_tier(self):
+        tier_id = (self._server if isinstance(self._server, str) else tuple(self._server), self._local_channel)
+
+        with self._local_tiers_lock:
+            tier = self._local_tiers.get(tier_id)
+
+            # forked workers must not reuse the parent's entries and subscriber
+            if tier is None or tier.pid != os.getpid():
+                tier = LocalCacheTier(self._local_max_entries, self._local_timeout)
+                self._local_tiers[tier_id] = tier
+                self._start_subscriber(tier)
+        return tier
+
+    def is_local_key(self, key):
+        return bool(self._local_prefixes) and isinstance(key, str) and key.startswith(self._local_prefixes)
+
+    def _start_subscriber(self, tier):
+        thread = threading.Thread(target=self._listen_for_invalidations, args=(tier,), daemon=True)
+        thread.start()
+
+    def _listen_for_invalidations(self, tier):
+        while True:
+            try:
+                pubsub = self.client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._local_channel)
+                # invalidations may have been missed while disconnected
+                tier.clear()
+
+                for message in pubsub.listen():
+                    origin, _, key = message['data'].decode().partition(':')
+                    if origin == tier.origin:
+                        continue
+                    if key:
+                        tier.delete(key)
+                    else:
+                        tier.clear()
+            except Exception:
+                logger.exception('local cache invalidation subscriber disconnected')
+                tier.clear()
+                time.sleep(1)
+
+    def _invalidate_local(self, *keys, version=None):
+        local_keys = [self.make_key(key, version=version) for key in keys if self.is_local_key(key)]
+        if not local_keys:
+            return
+
+        tier = self.local_tier
+        redis_client = self.client.get_client(write=True)
+
+        for local_key in local_keys:
+            tier.delete(local_key)
+            redis_client.publish(self._local_channel, f'{tier.origin}:{local_key}')
+
+    def _clear_local(self):
+        if self._local_prefixes:
+            tier = self.local_tier
+            tier.clear()
+            # an empty key clears every local tier
+            self.client.get_client(write=True).publish(self._local_channel, f'{tier.origin}:')
+
+    # cache api
+    def get(self, key, default=None, version=None, client=None):
+        if not self.is_local_key(key):
+            return super().get(key, default=default, version=version, client=client)
+
+        tier = self.local_tier
+        local_key = self.make_key(key, version=version)
+
+        value = tier.get(local_key)
+        if value is not _MISSING:
+            return value
+
+        value = super().get(key, default=_MISSING, version=version, client=client)
+        if value is _MISSING:
+            return default
+
+        tier.set(local_key, value)
+        return value
+
+    def get_shared(self, key, default=None, version=None, client=None):
+        """
+        The value in Redis, skipping a local copy that may be older.
+        """
+        return super().get(key, default=default, version=version, client=client)
+
+    def set(self, key, value, *args, **kwargs):
+        result = super().set(key, value, *args, **kwargs)
+        self._invalidate_local(key, version=kwargs.get('version'))
+        return result
+
+    def add(self, key, value, *args, **kwargs):
+        result = super().add(key, value, *args, **kwargs)
+        if result:
+            self._invalidate_local(key, version=kwargs.get('version'))
+        return result
+
+    def delete(self, key, *args, **kwargs):
+        result = super().delete(key, *args, **kwargs)
+        self._invalidate_local(key, version=kwargs.get('version'))
+        return result
+
+    def delete_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        result = super().delete_many(keys, *args, **kwargs)
+        self._invalidate_local(*keys, version=kwargs.get('version'))
+        return result
+
+    def set_many(self, data, *args, **kwargs):
+        result = super().set_many(data, *args, **kwargs)
+        self._invalidate_local(*data, version=kwargs.get('version'))
+        return result
+
+    def incr(self, key, *args, **kwargs):
+        result = super().incr(key, *args, **kwargs)
+        self._invalidate_local(key, version=kwargs.get('version'))
+        return result
+
+    def decr(self, key, *args, **kwargs):
+        result = super().decr(key, *args, **kwargs)
+        self._invalidate_local(key, version=kwargs.get('version'))
+        return result
+
+    def delete_pattern(self, *args, **kwargs):
+        result = super().delete_pattern(*args, **kwargs)
+        self._clear_local()
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self._clear_local()
+        return result
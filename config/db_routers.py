@@ -0,0 +1,138 @@
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from config.async_cache import async_cache
+
+# safe for threads and for async views, unlike threading.local
+routing_state = Local()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def use_replicas(enabled: bool):
+    routing_state.use_replicas = enabled
+
+
+def replicas_configured():
+    return bool(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the reads of the block, or of the decorated function, to the primary. Values stored in the shared caches
+    are built with it, an entry filled from a lagging replica would serve the old rows to every client, the writer
+    included once its pin expires.
+    """
+    previous = getattr(routing_state, 'read_from_primary', False)
+    routing_state.read_from_primary = True
+    try:
+        yield
+    finally:
+        routing_state.read_from_primary = previous
+
+
+def get_primary_pin_cache_key(request, response=None):
+    """
+    Cache key of the primary pin of the client behind the request, None for clients that can not be told apart.
+    JWT clients are identified by their token, browsers by their session cookie.
+    """
+    identity = request.META.get('HTTP_AUTHORIZATION')
+
+    if not identity:
+        session_cookie = response.cookies.get(settings.SESSION_COOKIE_NAME) if response is not None else None
+        identity = session_cookie.value if session_cookie else request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+    if not identity:
+        return None
+    return f'db_pin:{hashlib.sha256(identity.encode()).hexdigest()}'
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random alias of DATABASE_REPLICAS while ReplicaRoutingMiddleware allows it,
+    everything else (writes, migrations, celery tasks, commands) uses the primary.
+    """
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+
+        if replicas and getattr(routing_state, 'use_replicas', False) and not getattr(routing_state, 'read_from_primary', False):
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # reads that follow a write in the same request must see it
+        use_replicas(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the schema reaches the replicas through replication
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets the reads of safe-method requests go to the replicas. A client that wrote something is pinned
+    to the primary for DATABASE_REPLICA_PIN_TIMEOUT seconds, so it reads its own carts and orders back.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # no pins to read or write while every read goes to the primary anyway
+        if not replicas_configured():
+            return self.get_response(request)
+
+        pin_cache_key = get_primary_pin_cache_key(request)
+        pinned = pin_cache_key is not None and cache.get(pin_cache_key) is not None
+
+        use_replicas(request.method in SAFE_METHODS and not pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas(False)
+
+        if request.method not in SAFE_METHODS:
+            # the session of an anonymous client may have been created by this very request
+            pin_cache_key = get_primary_pin_cache_key(request, response)
+            if pin_cache_key is not None:
+                cache.set(pin_cache_key, True, settings.DATABASE_REPLICA_PIN_TIMEOUT)
+
+        return response
+
+    async def __acall__(self, request):
+        if not replicas_configured():
+            return await self.get_response(request)
+
+        pin_cache_key = get_primary_pin_cache_key(request)
+        pinned = pin_cache_key is not None and await async_cache.get(pin_cache_key) is not None
+
+        use_replicas(request.method in SAFE_METHODS and not pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replicas(False)
+
+        if request.method not in SAFE_METHODS:
+            pin_cache_key = get_primary_pin_cache_key(request, response)
+            if pin_cache_key is not None:
+                await async_cache.set(pin_cache_key, True, settings.DATABASE_REPLICA_PIN_TIMEOUT)
+
+        return response
@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # outside the session middleware, it has to see the session cookie of the response
+    'config.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # corsheaders middleware
     'corsheaders.middleware.CorsMiddleware',
@@ -66,12 +68,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # debug toolbar middleware
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     # custom middlewares
     'accounts.thread_local.RequestMiddleware',
 ]
 
+# the toolbar only shows up in debug, and its sync only middleware would run the async views in a thread
+if DEBUG:
+    MIDDLEWARE.insert(MIDDLEWARE.index('accounts.thread_local.RequestMiddleware'), 'debug_toolbar.middleware.DebugToolbarMiddleware')
+else:
+    SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W001']
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -115,6 +121,20 @@ DATABASES = {
 #     }
 # }
 
+# Read replicas, comma separated hosts, e.g. POSTGRES_REPLICA_HOSTS=replica-1,replica-2
+for number, replica_host in enumerate(filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host.strip(),
+        # tests run every alias against the test database of the primary
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['config.db_routers.ReplicaRouter']
+# seconds a client reads from the primary after its last write
+DATABASE_REPLICA_PIN_TIMEOUT = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -277,10 +297,34 @@ CACHES = {
         "LOCATION": "redis://redis:6379/1",  # 'redis' is the Docker service name
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        }      
+            # extra redis.asyncio connection pool kwargs of config.async_cache
+            "ASYNC_CONNECTION_POOL_KWARGS": {},
+        }
     }
 }
 
+# Optional in-process LRU in front of redis for read-mostly keys, invalidated over redis pub/sub
+if os.getenv("LOCAL_CACHE_ENABLED") == "True":
+    CACHES["default"]["BACKEND"] = "config.cache_backends.TwoTierRedisCache"
+    CACHES["default"]["OPTIONS"].update({
+        "LOCAL_CACHE_KEY_PREFIXES": [
+            "product:",
+            "cache_generation:",
+            "groups:",
+            "views.decorators.cache.cache_header.category_list.",
+            "views.decorators.cache.cache_page.category_list.",
+        ],
+        "LOCAL_CACHE_MAX_ENTRIES": 1024,
+        "LOCAL_CACHE_TIMEOUT": 5,
+    })
+
+# Optional live inventory of the products flagged with Product.hot_inventory in redis, written back to the database
+# by the flush-hot-inventory task. Check for drift with the reconcile_hot_inventory command.
+HOT_INVENTORY_ENABLED = os.getenv("HOT_INVENTORY_ENABLED") == "True"
+HOT_INVENTORY_FLUSH_BATCH_SIZE = 500
+# products whose pending inventory movements are folded into Product.inventory per transaction
+INVENTORY_COMPACTION_BATCH_SIZE = 500
+
 # Celery config
 CELERY_BROKER_URL = 'redis://redis:6379/1'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/1'
@@ -289,4 +333,21 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERYD_LOG_COLOR = True
 CELERYD_LOG_LEVEL = 'INFO'
 # For django-celery-beat
-CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
\ No newline at end of file
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    # categories also get a new top product right after a payment, this lets old sales leave the window
+    'update-categories-top-product': {
+        'task': 'store.tasks.update_categories_top_product',
+        'schedule': timedelta(hours=1),
+    },
+    # folds the inventory movements into Product.inventory, see store.ledger
+    'compact-inventory-movements': {
+        'task': 'store.tasks.compact_inventory_movements',
+        'schedule': timedelta(seconds=30),
+    },
+    # writes the inventory changes of hot products kept in redis back to the database, a no-op while there are none
+    'flush-hot-inventory': {
+        'task': 'store.tasks.flush_hot_inventory',
+        'schedule': timedelta(seconds=5),
+    },
+}
\ No newline at end of file
@@ -0,0 +1,17 @@
+# Settings of the test suite, python manage.py test --settings=config.test_settings
+from .settings import *  # noqa
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # a mirror of the test database of the primary, the replica tests read their committed rows back through it
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+# reads only go to the replica in the tests that enable it, the rows of a TestCase are never committed
+DATABASE_REPLICAS = []
@@ -1,10 +1,124 @@
+import hashlib
+import time
+from functools import partial, wraps
+
 from django.core.cache import cache
-from django.conf import settings
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+
+def get_cache_generation_key(namespace: str):
+    return f'cache_generation:{namespace}'
+
+
+def get_cache_generation(namespace: str):
+    """
+    Return the current generation of the namespace, it is part of every cache key built inside the namespace.
+    """
+    # start from a timestamp so a lost counter never brings an older generation back
+    return cache.get_or_set(get_cache_generation_key(namespace), time.time_ns, timeout=None)
+
+
+def bump_cache_generation(namespace: str):
+    """
+    Invalidate every cache entry of the namespace at once, stale entries are never read again and expire on their own.
+    """
+    generation_key = get_cache_generation_key(namespace)
+
+    try:
+        cache.incr(generation_key)
+    except ValueError:
+        cache.add(generation_key, time.time_ns(), timeout=None)
+
+
+def cache_page_with_generation(timeout: int, namespace: str):
+    """
+    Drop-in replacement of cache_page whose key prefix carries the namespace generation.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            key_prefix = f'{namespace}.{get_cache_generation(namespace)}'
+            return cache_page(timeout, key_prefix=key_prefix)(view_func)(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+
+def get_cache_lock_key(key: str):
+    return f'lock:{key}'
+
+
+def set_cache_with_soft_timeout(key: str, value, timeout: int, soft_timeout: int):
+    """
+    Cache the value for `timeout` seconds, it is considered stale after `soft_timeout` seconds.
+    """
+    cache.set(key, (time.time() + soft_timeout, value), timeout)
+
+
+def expire_cache_softly(key: str, stale_timeout: int = 60):
+    """
+    Mark the cached value as stale instead of deleting it, the next reader refreshes it while
+    concurrent readers keep getting the stale copy for at most `stale_timeout` seconds.
+    """
+    # a local copy of config.cache_backends.TwoTierRedisCache may be older than redis and must not be written back
+    entry = getattr(cache, 'get_shared', cache.get)(key)
+
+    if entry is not None:
+        _, value = entry
+        cache.set(key, (0, value), stale_timeout)
+
+
+def get_or_compute_cache(key: str, compute, timeout: int, soft_timeout: int, lock_timeout: int = 10, wait_timeout: float = 0.5):
+    """
+    Single-flight version of cache.get_or_set for values stored by set_cache_with_soft_timeout.
+
+    Only the request holding the lock recomputes a missing or stale value, the others get the stale
+    copy or wait up to `wait_timeout` seconds for the fresh one before computing it themselves.
+    """
+    lock_key = get_cache_lock_key(key)
+    entry = cache.get(key)
+
+    if entry is not None:
+        refresh_at, value = entry
+        if time.time() < refresh_at or not cache.add(lock_key, 1, lock_timeout):
+            return value
+
+    elif not cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + wait_timeout
+
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        # the lock holder is too slow, do not pile up behind it
+        return compute()
+
+    try:
+        value = compute()
+        set_cache_with_soft_timeout(key, value, timeout, soft_timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def make_etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
 
 
-def delete_decorative_cache(key_prefix: str):
+def conditional_view(validators_method: str):
     """
-    Delete all cache keys with the given prefix.
+    Method decorator version of django's condition for DRF views, `validators_method` is a view method returning
+    (etag, last_modified) from a cheap query. Matching conditional GET requests are answered with 304 without
+    running the view, return (None, None) to always run it.
     """
-    keys_pattern = f"views.decorators.cache.cache_*.{key_prefix}.*.{settings.LANGUAGE_CODE}.{settings.TIME_ZONE}"
-    cache.delete_pattern(keys_pattern)
\ No newline at end of file
+    def decorator(view_method):
+        @wraps(view_method)
+        def _wrapped_view(self, request, *args, **kwargs):
+            etag, last_modified = getattr(self, validators_method)()
+            return condition(
+                etag_func=lambda *args, **kwargs: etag,
+                last_modified_func=lambda *args, **kwargs: last_modified,
+            )(partial(view_method, self))(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
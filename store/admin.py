@@ -5,7 +5,7 @@ from django.utils.html import format_html
 from django.utils.http import urlencode
 from django.utils.timezone import now
 
-from . import models
+from . import inventory, models
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -41,20 +41,13 @@ class ProductAdmin(admin.ModelAdmin):
     list_per_page = 10
     list_editable = ['unit_price']
     list_select_related = ['category']
-    list_filter = ['datetime_created', 'activation' ,InventoryFilter]
+    list_filter = ['datetime_created', 'activation', 'hot_inventory', InventoryFilter]
     actions = ['clear_inventory']
     search_fields = ['name', ]
     prepopulated_fields = {
         'slug': ['name', ]
     }
 
-    def get_queryset(self, request):
-        return super().get_queryset(request) \
-                .prefetch_related('comments') \
-                .annotate(
-                    comments_count=Count('comments'),
-                )
-
     def inventory_status(self, product):
         if product.inventory < 10:
             return 'Low'
@@ -62,7 +55,7 @@ class ProductAdmin(admin.ModelAdmin):
             return 'High'
         return 'Medium'
     
-    @admin.display(description='# comments', ordering='comments_count')
+    @admin.display(description='# comments', ordering='approved_comments_count')
     def num_of_comments(self, product):
         url = (
             reverse('admin:store_comment_changelist') 
@@ -71,7 +64,7 @@ class ProductAdmin(admin.ModelAdmin):
                 'product__id': product.id,
             })
         )
-        return format_html('<a href="{}">{}</a>', url, product.comments_count)
+        return format_html('<a href="{}">{}</a>', url, product.approved_comments_count)
         
     
     @admin.display(ordering='category__title')
@@ -81,7 +74,8 @@ class ProductAdmin(admin.ModelAdmin):
     
     @admin.action(description='Clear inventory')
     def clear_inventory(self, request, queryset):
-        update_count = queryset.update(inventory=0)
+        # recorded in the inventory ledger like every other change
+        update_count = inventory.clear_inventory(list(queryset.values_list('pk', flat=True)))
         self.message_user(
             request,
             f'{update_count} of products inventories cleared to zero.',
@@ -89,6 +83,26 @@ class ProductAdmin(admin.ModelAdmin):
         )
 
 
+@admin.register(models.InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    # append-only audit trail of Product.inventory, written by store.inventory and store.ledger
+    list_display = ['id', 'product', 'quantity', 'reason', 'order', 'datetime_created', 'datetime_compacted']
+    list_per_page = 20
+    list_select_related = ['product']
+    list_filter = ['reason', 'datetime_created']
+    search_fields = ['product__name']
+    ordering = ['-datetime_created']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(models.Category)
     
 
@@ -0,0 +1,141 @@
+import asyncio
+import platform
+import statistics
+import time
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils.timezone import now
+
+from ..models import Comment, Product
+
+# the store views import the serializers, which need the url configuration loaded before them
+import_module(settings.ROOT_URLCONF)
+from config.asgi import application  # noqa: E402
+from config.urls import SITE_URL_HOST  # noqa: E402
+
+
+CONCURRENCY = [1, 10, 100]
+REQUESTS = 500
+
+# (endpoint, sync url name, async url name, product slug url kwarg, query params)
+BENCHMARKED_ENDPOINTS = [
+    ('product-list', 'product-list', 'async-product-list', None, {'ordering': 'name'}),
+    ('product-detail', 'product-detail', 'async-product-detail', 'slug', {}),
+    ('category-list', 'category-list', 'async-category-list', None, {}),
+    ('comment-list', 'product-comments-list', 'async-product-comments-list', 'product_slug', {}),
+]
+
+
+def get_benchmarked_product_slug():
+    # detail and comment endpoints are read for the most commented product
+    product = Product.objects.order_by('-approved_comments_count', 'id').only('slug').first()
+
+    if product is None:
+        raise ValueError('Benchmarks need products, run the setup_fake_data command first.')
+    return product.slug
+
+
+def build_scope(url, query_params, number):
+    host = urlsplit(SITE_URL_HOST).netloc
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': url,
+        'raw_path': url.encode(),
+        'query_string': urlencode(query_params).encode(),
+        'headers': [(b'host', host.encode()), (b'accept', b'application/json')],
+        # every request comes from its own address, the anonymous throttle of the sync views never kicks in
+        'client': (f'10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}', 0),
+        'server': (host, 80),
+    }
+
+
+async def call_application(scope):
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    response_status = None
+
+    async def send(message):
+        nonlocal response_status
+        if message['type'] == 'http.response.start':
+            response_status = message['status']
+
+    await application(scope, receive, send)
+    return response_status
+
+
+async def run_load(url, query_params, requests, concurrency):
+    """
+    Send `requests` GET requests through the ASGI application with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def send_request(number):
+        nonlocal errors
+        async with semaphore:
+            started_at = time.perf_counter()
+            response_status = await call_application(build_scope(url, query_params, number))
+            latencies.append(time.perf_counter() - started_at)
+            errors += response_status != 200
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send_request(number) for number in range(requests)))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        'throughput': requests / elapsed,
+        'median': statistics.median(latencies),
+        'p95': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0],
+        'errors': errors,
+    }
+
+
+def run_async_view_benchmarks(concurrency=CONCURRENCY, requests=REQUESTS):
+    """
+    Compare the throughput of the sync and async versions of the hot read endpoints, both served by the ASGI
+    application of the project against the data of the configured database. Sync views run in the thread pool
+    of asgiref, like under an ASGI server. Returns a json serializable report, latencies are in seconds.
+    """
+    product_slug = get_benchmarked_product_slug()
+    endpoints = [
+        (endpoint, mode, reverse(url_name, kwargs={url_kwarg: product_slug} if url_kwarg else None), query_params)
+        for endpoint, sync_url_name, async_url_name, url_kwarg, query_params in BENCHMARKED_ENDPOINTS
+        for mode, url_name in [('sync', sync_url_name), ('async', async_url_name)]
+    ]
+    results = []
+
+    for endpoint, mode, url, query_params in endpoints:
+        # one warm up request fills the caches both versions are built around
+        asyncio.run(run_load(url, query_params, 1, 1))
+
+        for concurrent_requests in concurrency:
+            results.append({
+                'endpoint': endpoint,
+                'mode': mode,
+                'concurrency': concurrent_requests,
+                'requests': requests,
+                **asyncio.run(run_load(url, query_params, requests, concurrent_requests)),
+            })
+
+    return {
+        'meta': {
+            'datetime': now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'products': Product.objects.count(),
+            'comments': Comment.objects.count(),
+        },
+        'results': results,
+    }
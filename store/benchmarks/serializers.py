@@ -0,0 +1,167 @@
+import platform
+import statistics
+import time
+from importlib import import_module
+from itertools import cycle
+from urllib.parse import urlsplit
+
+import django
+import rest_framework
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ..factories import (
+    AddressFactory,
+    CartFactory,
+    CartItemFactory,
+    CategoryFactory,
+    CustomerFactory,
+    OrderFactory,
+    OrderItemFactory,
+    ProductFactory,
+    UserFactory,
+)
+from ..models import Address, Cart, CartItem, Category, Customer, Order, OrderItem, Product
+
+# the store views import the serializers, which need the url configuration loaded before them
+import_module(settings.ROOT_URLCONF)
+from config.urls import SITE_URL_HOST  # noqa: E402
+from ..views import CartViewSet, CategoryViewSet, CustomerViewSet, OrderViewSet, ProductViewSet  # noqa: E402
+
+
+ROWS = [10, 100, 1000]
+REPEAT = 5
+PRODUCTS_PER_CATEGORY = 3
+ITEMS_PER_ORDER = 3
+ITEMS_PER_CART = 3
+
+# every benchmark serializes the list queryset of its viewset, as a manager sees it
+BENCHMARKED_VIEWSETS = [ProductViewSet, CategoryViewSet, OrderViewSet, CartViewSet, CustomerViewSet]
+
+
+def build_object_graph(size):
+    """
+    Categories, products, customers with addresses, orders and carts with their items, `size` of every
+    top level object. Rows are built by the factories and written with bulk_create, signals are skipped.
+    """
+    categories = Category.objects.bulk_create(
+        CategoryFactory.build(title=f'Benchmark Category {number}', top_product=None) for number in range(size)
+    )
+    products = Product.objects.bulk_create(
+        ProductFactory.build(name=f'Benchmark Product {number}', category=category, datetime_modified=now())
+        for number, category in enumerate(categories * PRODUCTS_PER_CATEGORY)
+    )
+    users = get_user_model().objects.bulk_create(
+        UserFactory.build(username=f'benchmark-user-{number}', email=f'benchmark-user-{number}@example.com') for number in range(size)
+    )
+    customers = Customer.objects.bulk_create(CustomerFactory.build(user=user) for user in users)
+    Address.objects.bulk_create(AddressFactory.build(customer=customer) for customer in customers)
+
+    orders = Order.objects.bulk_create(OrderFactory.build(customer=customer) for customer in customers)
+    products_cycle = cycle(products)
+    OrderItem.objects.bulk_create(
+        OrderItemFactory.build(order=order, product=product, unit_price=product.unit_price)
+        for order in orders for product in [next(products_cycle) for _ in range(ITEMS_PER_ORDER)]
+    )
+
+    carts = Cart.objects.bulk_create(CartFactory.build(user=user) for user in users)
+    CartItem.objects.bulk_create(
+        CartItemFactory.build(cart=cart, product=product)
+        for cart in carts for product in [next(products_cycle) for _ in range(ITEMS_PER_CART)]
+    )
+
+
+def get_benchmark_renderers():
+    # the browsable api renders a whole html page around a view, it is not a serialization format
+    return [renderer_class() for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES if renderer_class.format != 'api']
+
+
+def get_list_view(viewset_class, user):
+    # hyperlinks are built for the public host of the site
+    request = APIRequestFactory().get('/', HTTP_HOST=urlsplit(SITE_URL_HOST).netloc)
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    force_authenticate(request, user=user)
+
+    view = viewset_class(action_map={'get': 'list'}, kwargs={}, args=(), format_kwarg=None)
+    view.request = view.initialize_request(request)
+    return view
+
+
+def measure(function, repeat):
+    timings = []
+    result = None
+
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+
+    return result, {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+    }
+
+
+def run_serializer_benchmarks(rows=ROWS, repeat=REPEAT):
+    """
+    Time the store list serializers and every configured renderer over each row count, the object graph is
+    written in a transaction that is rolled back. Returns a json serializable report, timings are in seconds.
+    """
+    results = []
+
+    with transaction.atomic():
+        build_object_graph(max(rows))
+        user = get_user_model().objects.create_superuser(username='benchmark-admin', email='benchmark-admin@example.com', password=None)
+
+        for viewset_class in BENCHMARKED_VIEWSETS:
+            view = get_list_view(viewset_class, user)
+            serializer_class = view.get_serializer_class()
+            context = view.get_serializer_context()
+
+            for row_count in rows:
+                # the page is loaded with the prefetches of the view, serializers only read it
+                instances = list(view.get_queryset()[:row_count])
+
+                with CaptureQueriesContext(connection) as queries:
+                    data, timings = measure(lambda: serializer_class(instances, many=True, context=context).data, repeat)
+
+                results.append({
+                    'serializer': serializer_class.__name__,
+                    'rows': len(instances),
+                    'stage': 'serialize',
+                    'renderer': None,
+                    # lazy relations the serializer loads row by row show up here
+                    'queries': len(queries) // repeat,
+                    **timings,
+                })
+
+                for renderer in get_benchmark_renderers():
+                    _, timings = measure(lambda: renderer.render(data, renderer.media_type, {}), repeat)
+                    results.append({
+                        'serializer': serializer_class.__name__,
+                        'rows': len(instances),
+                        'stage': 'render',
+                        'renderer': type(renderer).__name__,
+                        'queries': 0,
+                        **timings,
+                    })
+
+        transaction.set_rollback(True)
+
+    return {
+        'meta': {
+            'datetime': now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rest_framework': rest_framework.VERSION,
+            'database': connection.vendor,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
@@ -0,0 +1,23 @@
+from django.core.cache import cache
+
+from config.utils import bump_cache_generation
+
+
+# product detail payloads are refreshed by a single request after PRODUCT_DETAIL_SOFT_TIMEOUT,
+# concurrent requests keep getting the stale copy until PRODUCT_DETAIL_CACHE_TIMEOUT
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 15
+PRODUCT_DETAIL_SOFT_TIMEOUT = 60 * 10
+
+
+def get_product_detail_cache_key(slug: str):
+    return f'product:{slug}'
+
+
+def invalidate_products_cache(slugs):
+    """
+    Cache invalidation for set-based product writes, they skip the per row signal handlers.
+    """
+    if slugs:
+        cache.delete_many([get_product_detail_cache_key(slug) for slug in slugs])
+    bump_cache_generation('product_list')
+    bump_cache_generation('category_list')
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import yaml
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product
+
+
+def to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else str(value)
+
+
+def write_csv_line(values, delimiter=','):
+    line = io.StringIO()
+    csv.writer(line, delimiter=delimiter).writerow(values)
+    return line.getvalue()
+
+
+class ProductExporter:
+    """
+    Line-oriented export of the catalog, rows are read through a server-side cursor chunk by chunk
+    and every format yields one product at a time, so memory stays flat whatever the catalog size.
+    """
+    FIELDS = ['id', 'name', 'slug', 'category', 'description', 'unit_price', 'inventory', 'activation', 'datetime_modified']
+    # file format: (content type, extension)
+    FILE_FORMATS = {
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+        'csv': ('text/csv', 'csv'),
+        'xml': ('application/xml', 'xml'),
+        'yaml': ('application/yaml', 'yaml'),
+        'txt': ('text/plain', 'txt'),
+    }
+    CHUNK_SIZE = 2000
+
+    def __init__(self, queryset=None, chunk_size=CHUNK_SIZE):
+        self.queryset = Product.objects.all() if queryset is None else queryset
+        self.chunk_size = chunk_size
+
+    def get_rows(self):
+        lookups = ['category__slug' if field == 'category' else field for field in self.FIELDS]
+
+        for row in self.queryset.order_by('id').values(*lookups).iterator(chunk_size=self.chunk_size):
+            row['category'] = row.pop('category__slug')
+            yield row
+
+    def export(self, file_format):
+        return getattr(self, f'export_{file_format}')()
+
+    def export_ndjson(self):
+        for row in self.get_rows():
+            yield json.dumps({field: row[field] for field in self.FIELDS}, cls=DjangoJSONEncoder) + '\n'
+
+    def export_csv(self):
+        yield write_csv_line(self.FIELDS)
+        for row in self.get_rows():
+            yield write_csv_line([to_text(row[field]) for field in self.FIELDS])
+
+    def export_txt(self):
+        yield write_csv_line(self.FIELDS, delimiter='\t')
+        for row in self.get_rows():
+            yield write_csv_line([to_text(row[field]) for field in self.FIELDS], delimiter='\t')
+
+    def export_xml(self):
+        yield '<?xml version="1.0" encoding="utf-8"?>\n<products>\n'
+        for row in self.get_rows():
+            yield '<product>' + ''.join(f'<{field}>{escape(to_text(row[field]))}</{field}>' for field in self.FIELDS) + '</product>\n'
+        yield '</products>\n'
+
+    def export_yaml(self):
+        for row in self.get_rows():
+            # every product is an item of one top level sequence
+            yield yaml.safe_dump([{field: row[field] for field in self.FIELDS}], allow_unicode=True, sort_keys=False)
@@ -51,8 +51,6 @@ class CustomerFactory(DjangoModelFactory):
     class Meta:
         model = models.Customer
 
-
-    phone_number = factory.Faker("phone_number")
     birth_date = factory.LazyFunction(lambda: faker.date_time_ad(start_datetime=datetime(1990,1,1), end_datetime=datetime(2015,1,1)))
 
 
@@ -69,7 +67,7 @@ class OrderFactory(DjangoModelFactory):
     class Meta:
         model = models.Order
 
-    status = factory.LazyFunction(lambda: random.choice([models.Order.ORDER_STATUS_UNPAID, models.Order.ORDER_STATUS_CANCELED]))
+    status = factory.LazyFunction(lambda: random.choice([models.Order.ORDER_STATUS_UNPAID, models.Order.ORDER_STATUS_PAID]))
 
 
 class OrderItemFactory(DjangoModelFactory):
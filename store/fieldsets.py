@@ -0,0 +1,69 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_names(value):
+    return {field_name.strip() for field_name in value.split(',') if field_name.strip()}
+
+
+def is_field_in_fieldset(field_name, fieldset):
+    """
+    Whether a top level field is rendered for the (fields, omit) pair of ?fields= and ?omit=.
+    """
+    if fieldset is None:
+        return True
+
+    fields, omit = fieldset
+    return (fields is None or field_name in fields) and field_name not in omit
+
+
+def apply_fieldset(data, fieldset):
+    # filters an already rendered payload, e.g. one read from the cache
+    return {field_name: value for field_name, value in data.items() if is_field_in_fieldset(field_name, fieldset)}
+
+
+# Mixins
+class SparseFieldsetSerializerMixin:
+    """
+    Drops the top level fields the view left out of the `sparse_fieldset` context,
+    nested serializers always render all of their fields.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('sparse_fieldset')
+
+        # root serializer, or the child of a root many=True list
+        if fieldset is None or self.root not in (self, self.parent):
+            return fields
+        return {field_name: field for field_name, field in fields.items() if is_field_in_fieldset(field_name, fieldset)}
+
+
+class SparseFieldsetViewMixin:
+    """
+    Lets clients pick the rendered fields with ?fields=name,unit_price or drop some with ?omit=comments,
+    views check is_field_rendered() before adding the joins and prefetches only a field needs.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_fieldset(self):
+        query_params = self.request.query_params
+
+        # the full representation is always validated and returned on writes
+        if self.request.method not in SAFE_METHODS:
+            return None
+        if self.fields_query_param not in query_params and self.omit_query_param not in query_params:
+            return None
+
+        fields = query_params.get(self.fields_query_param)
+        return (
+            parse_field_names(fields) if fields is not None else None,
+            parse_field_names(query_params.get(self.omit_query_param, '')),
+        )
+
+    def is_field_rendered(self, field_name):
+        return is_field_in_fieldset(field_name, self.get_sparse_fieldset())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fieldset'] = self.get_sparse_fieldset()
+        return context
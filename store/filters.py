@@ -1,5 +1,9 @@
+from django.db.models import Count, Q
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
 from .models import Product, Order, Customer
+from .search import get_search_backend
 
 
 class ProductFilter(filters.FilterSet):
@@ -9,6 +13,18 @@ class ProductFilter(filters.FilterSet):
         ('Medium', 'medium'),
         ('Good', 'good')
     )
+    # shared by the inventory_status filter and the product facets
+    INVENTORY_STATUS_BANDS = {
+        'Critical': Q(inventory__lte=10),
+        'Medium': Q(inventory__range=[10, 50]),
+        'Good': Q(inventory__gte=50),
+    }
+    PRICE_BUCKETS = {
+        '0-50000': Q(unit_price__lt=50000),
+        '50000-100000': Q(unit_price__gte=50000, unit_price__lt=100000),
+        '100000-500000': Q(unit_price__gte=100000, unit_price__lt=500000),
+        '500000+': Q(unit_price__gte=500000),
+    }
 
     inventory_lte = filters.NumberFilter(field_name='inventory', lookup_expr='lte')
     inventory_gte = filters.NumberFilter(field_name='inventory', lookup_expr='gte')
@@ -25,14 +41,46 @@ class ProductFilter(filters.FilterSet):
         fields = ['inventory_lte', 'inventory_gte', 'min_price', 'max_price', 'category__slug', 'inventory_status']
 
     def filter_by_inventory_status(self, queryset, name, value):
-        if value == 'Critical':
-            return queryset.filter(inventory__lte=10)
-        
-        if value == 'Medium':
-            return queryset.filter(inventory__range=[10, 50])
-        
-        if value == 'Good':
-            return queryset.filter(inventory__gte=50)
+        return queryset.filter(self.INVENTORY_STATUS_BANDS[value])
+
+    @classmethod
+    def get_facets(cls, queryset):
+        """
+        Counts per category, price bucket and inventory status of the queryset, all from one query grouped by category.
+        """
+        price_counts = {f'price_{index}': Count('id', filter=bucket) for index, bucket in enumerate(cls.PRICE_BUCKETS.values())}
+        inventory_counts = {f'inventory_{index}': Count('id', filter=band) for index, band in enumerate(cls.INVENTORY_STATUS_BANDS.values())}
+
+        rows = queryset.order_by().values('category__slug').annotate(count=Count('id'), **price_counts, **inventory_counts)
+
+        facets = {
+            'count': 0,
+            'category__slug': {},
+            'price': dict.fromkeys(cls.PRICE_BUCKETS, 0),
+            'inventory_status': dict.fromkeys(cls.INVENTORY_STATUS_BANDS, 0),
+        }
+        for row in rows:
+            facets['count'] += row['count']
+            facets['category__slug'][row['category__slug']] = row['count']
+
+            for index, bucket in enumerate(cls.PRICE_BUCKETS):
+                facets['price'][bucket] += row[f'price_{index}']
+            for index, band in enumerate(cls.INVENTORY_STATUS_BANDS):
+                facets['inventory_status'][band] += row[f'inventory_{index}']
+        return facets
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Full-text search over the product search index, results are ranked by relevance
+    unless an explicit ordering is requested.
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+
+        if not search_terms:
+            return queryset
+        return get_search_backend().search(queryset, ' '.join(search_terms))
 
 
 class CustomerWithOutAddress(filters.FilterSet):
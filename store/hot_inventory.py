@@ -0,0 +1,353 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django_redis import get_redis_connection
+
+from .ledger import annotate_stock
+from .models import HotInventoryFlush, InventoryMovement, Product
+
+
+# live available stock (inventory - reserved inventory) of every flagged product
+AVAILABLE_KEY_PREFIX = 'hot_inventory:available:'
+# net changes not written to the database yet, fields are "<product id>:inventory:<movement reason>" and "<product id>:reserved"
+PENDING_KEY = 'hot_inventory:pending'
+# the changes a flush is writing, left behind by a failed flush and taken again by the next one
+PROCESSING_KEY = 'hot_inventory:processing'
+# id of the processing batch, recorded with its database changes
+PROCESSING_BATCH_KEY = 'hot_inventory:processing_batch'
+# changes taken from the counters by a transaction that has not committed yet, fields are the hold ids and values
+# "<movement reason> <product id> <available> <inventory> <reserved change> ...". Their commit confirms them
+# into the pending changes, holds of rolled back transactions are released when they expire
+HOLDS_KEY = 'hot_inventory:holds'
+HOLD_TIMES_KEY = 'hot_inventory:hold_times'
+HOLD_TIMEOUT = 60
+FLUSH_LOCK_KEY = 'hot_inventory:flush_lock'
+FLUSH_LOCK_TIMEOUT = 60
+
+# KEYS: holds hash, hold times, then the available counters. ARGV: hold id, time, movement reason, then product id,
+# available, inventory and reserved change per counter. Nothing changes unless every counter exists and none would
+# go below zero, the counters change right away and the rest is held until the commit.
+APPLY_DELTAS_SCRIPT = """
+local count = #KEYS - 2
+
+local missing = {-1}
+for i = 1, count do
+    if redis.call('EXISTS', KEYS[i + 2]) == 0 then
+        missing[#missing + 1] = i
+    end
+end
+if #missing > 1 then
+    return missing
+end
+
+local insufficient = {0}
+for i = 1, count do
+    local available = tonumber(redis.call('GET', KEYS[i + 2]))
+    local available_delta = tonumber(ARGV[(i - 1) * 4 + 5])
+    if available_delta < 0 and available + available_delta < 0 then
+        insufficient[#insufficient + 1] = i
+        insufficient[#insufficient + 1] = available
+    end
+end
+if #insufficient > 1 then
+    return insufficient
+end
+
+for i = 1, count do
+    redis.call('INCRBY', KEYS[i + 2], ARGV[(i - 1) * 4 + 5])
+end
+redis.call('HSET', KEYS[1], ARGV[1], table.concat(ARGV, ' ', 3))
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return {1}
+"""
+
+# KEYS: pending hash, holds hash, hold times, then the available counters. ARGV: hold id, movement reason, then
+# product id, available, inventory and reserved change per counter. Moves a committed hold to the pending changes,
+# a hold released in the meantime is taken from the counters again.
+CONFIRM_HOLD_SCRIPT = """
+local held = redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+
+for i = 1, #KEYS - 3 do
+    local offset = (i - 1) * 4 + 2
+    -- a missing counter is started from the database and the pending changes, this one included
+    if held == 0 and redis.call('EXISTS', KEYS[i + 3]) == 1 then
+        redis.call('INCRBY', KEYS[i + 3], ARGV[offset + 2])
+    end
+    if tonumber(ARGV[offset + 3]) ~= 0 then
+        redis.call('HINCRBY', KEYS[1], ARGV[offset + 1] .. ':inventory:' .. ARGV[2], ARGV[offset + 3])
+    end
+    if tonumber(ARGV[offset + 4]) ~= 0 then
+        redis.call('HINCRBY', KEYS[1], ARGV[offset + 1] .. ':reserved', ARGV[offset + 4])
+    end
+end
+return held
+"""
+
+# KEYS: holds hash, hold times. ARGV: expiry time, prefix of the counter keys. Gives the available changes of the
+# expired holds back to the counters.
+RELEASE_HOLDS_SCRIPT = """
+local hold_ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+
+for _, hold_id in ipairs(hold_ids) do
+    local hold = redis.call('HGET', KEYS[1], hold_id)
+    if hold then
+        local values = {}
+        for value in string.gmatch(hold, '%S+') do
+            values[#values + 1] = value
+        end
+        for j = 2, #values, 4 do
+            local key = ARGV[2] .. values[j]
+            if redis.call('EXISTS', key) == 1 then
+                redis.call('DECRBY', key, values[j + 1])
+            end
+        end
+        redis.call('HDEL', KEYS[1], hold_id)
+    end
+    redis.call('ZREM', KEYS[2], hold_id)
+end
+return #hold_ids
+"""
+
+# KEYS: pending hash, processing hash, holds hash, then the counters. ARGV: product id and database available stock
+# per counter. Changes that have not reached the database yet are added on top of it.
+INIT_COUNTERS_SCRIPT = """
+local pending = {}
+for _, hash in ipairs({KEYS[1], KEYS[2]}) do
+    local entries = redis.call('HGETALL', hash)
+    for j = 1, #entries, 2 do
+        local product_id, column = string.match(entries[j], '^(%d+):(%a+)')
+        local change = tonumber(entries[j + 1])
+        if column == 'reserved' then
+            change = -change
+        end
+        pending[product_id] = (pending[product_id] or 0) + change
+    end
+end
+
+for _, hold in ipairs(redis.call('HVALS', KEYS[3])) do
+    local values = {}
+    for value in string.gmatch(hold, '%S+') do
+        values[#values + 1] = value
+    end
+    for j = 2, #values, 4 do
+        pending[values[j]] = (pending[values[j]] or 0) + tonumber(values[j + 1])
+    end
+end
+
+for i = 4, #KEYS do
+    local product_id = ARGV[(i - 4) * 2 + 1]
+    redis.call('SET', KEYS[i], tonumber(ARGV[(i - 4) * 2 + 2]) + (pending[product_id] or 0), 'NX')
+end
+return #KEYS - 3
+"""
+
+# KEYS: pending hash, processing hash, processing batch id. ARGV: id of a new batch. The batch of a failed flush
+# is taken again with its id before any new changes. Returns the batch id followed by the changes.
+TAKE_PENDING_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+
+local batch_id = redis.call('GET', KEYS[3])
+if not batch_id then
+    batch_id = ARGV[1]
+    redis.call('SET', KEYS[3], batch_id)
+end
+
+local entries = redis.call('HGETALL', KEYS[2])
+table.insert(entries, 1, batch_id)
+return entries
+"""
+
+
+def is_hot_inventory_enabled():
+    return getattr(settings, 'HOT_INVENTORY_ENABLED', False)
+
+
+def get_hot_product_ids(product_ids):
+    """
+    The products of product_ids whose live inventory is kept in redis, none while the mode is disabled.
+    """
+    if not is_hot_inventory_enabled() or not product_ids:
+        return set()
+    return set(Product.objects.filter(pk__in=product_ids, hot_inventory=True).values_list('pk', flat=True))
+
+
+def get_available_key(product_id):
+    return f'{AVAILABLE_KEY_PREFIX}{product_id}'
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def init_counters(product_ids):
+    """
+    Start the missing counters from the database, under the flush lock so no flush is halfway through.
+    """
+    client = get_client()
+
+    with client.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT):
+        products = annotate_stock(Product.objects.filter(pk__in=product_ids)).values_list('pk', 'stock', 'reserved_inventory')
+        args = [value for product_id, stock, reserved_inventory in products for value in (product_id, stock - reserved_inventory)]
+        keys = [get_available_key(product_id) for product_id, _, _ in products]
+
+        client.register_script(INIT_COUNTERS_SCRIPT)(keys=[PENDING_KEY, PROCESSING_KEY, HOLDS_KEY, *keys], args=args)
+
+
+def reset_counters(product_ids):
+    """
+    Drop the counters of products whose inventory was written directly, the next reader starts them from the database.
+    """
+    if product_ids:
+        get_client().delete(*(get_available_key(product_id) for product_id in product_ids))
+
+
+def flush_before_overwrite(products):
+    """
+    Flush the pending changes before the inventory of the hot products among the `products` queryset is written
+    directly, so they are not added on top of the new values. Returns the hot product ids, their counters are
+    reset once the new values are committed.
+    """
+    if not is_hot_inventory_enabled():
+        return set()
+
+    hot_product_ids = set(products.filter(hot_inventory=True).values_list('pk', flat=True))
+    if hot_product_ids:
+        flush_pending_deltas()
+    return hot_product_ids
+
+
+def apply_deltas(deltas: dict, reason: str):
+    """
+    Apply {product_id: (available change, inventory change, reserved change)} to the counters of hot products
+    in one atomic script. Returns {product_id: available stock} of the products that would go below zero, nothing
+    is changed then. The change is held until the current transaction commits and follows the database with the
+    next flush then, inventory changes as movements of the given reason. The hold of a rolled back transaction
+    is released by release_expired_holds.
+    """
+    if not deltas:
+        return {}
+
+    client = get_client()
+    product_ids = list(deltas)
+    hold_id = uuid.uuid4().hex
+    counter_keys = [get_available_key(product_id) for product_id in product_ids]
+    values = [value for product_id in product_ids for value in (product_id, *deltas[product_id])]
+    script = client.register_script(APPLY_DELTAS_SCRIPT)
+
+    keys = [HOLDS_KEY, HOLD_TIMES_KEY, *counter_keys]
+    result = script(keys=keys, args=[hold_id, time.time(), reason, *values])
+    if result[0] == -1:
+        # counters are started lazily, or were lost with the redis data
+        init_counters([product_ids[index - 1] for index in result[1:]])
+        result = script(keys=keys, args=[hold_id, time.time(), reason, *values])
+
+    if result[0] == 0:
+        return {product_ids[index - 1]: int(available) for index, available in zip(result[1::2], result[2::2])}
+
+    confirm_hold = client.register_script(CONFIRM_HOLD_SCRIPT)
+    transaction.on_commit(lambda: confirm_hold(keys=[PENDING_KEY, HOLDS_KEY, HOLD_TIMES_KEY, *counter_keys], args=[hold_id, reason, *values]))
+    return {}
+
+
+def release_expired_holds(timeout: int = HOLD_TIMEOUT):
+    """
+    Give the changes held by transactions that never committed back to the counters, returns the number of holds.
+    Transactions live far shorter than the timeout, a later commit takes its change from the counters again.
+    """
+    return get_client().register_script(RELEASE_HOLDS_SCRIPT)(
+        keys=[HOLDS_KEY, HOLD_TIMES_KEY], args=[time.time() - timeout, AVAILABLE_KEY_PREFIX],
+    )
+
+
+def get_available_inventories(product_ids):
+    """
+    Live available stock of hot products, {product_id: available stock}.
+    """
+    if not product_ids:
+        return {}
+
+    client = get_client()
+    product_ids = list(product_ids)
+    values = client.mget([get_available_key(product_id) for product_id in product_ids])
+
+    missing_ids = [product_id for product_id, value in zip(product_ids, values) if value is None]
+    if missing_ids:
+        init_counters(missing_ids)
+        values = client.mget([get_available_key(product_id) for product_id in product_ids])
+
+    return {product_id: int(value) for product_id, value in zip(product_ids, values)}
+
+
+def parse_pending_deltas(entries):
+    """
+    ({(product_id, movement reason): inventory change}, {product_id: reserved change}) of a flat HGETALL reply.
+    """
+    inventory_deltas, reserved_deltas = {}, {}
+    for field, value in zip(entries[::2], entries[1::2]):
+        product_id, column, *reason = field.decode().split(':')
+
+        if column == 'inventory':
+            inventory_deltas[(int(product_id), reason[0])] = int(value)
+        else:
+            reserved_deltas[int(product_id)] = int(value)
+    return (
+        {key: delta for key, delta in inventory_deltas.items() if delta},
+        {product_id: delta for product_id, delta in reserved_deltas.items() if delta},
+    )
+
+
+def flush_pending_deltas(batch_size: int = None, locked: bool = False):
+    """
+    Write the net changes of the hot products to the database in a single transaction, inventory changes as pending
+    movements per reason and reserved changes with one UPDATE per batch of products. Returns the number of products.
+    A batch whose changes were committed before is only dropped from redis, a replay never applies it twice.
+    """
+    client = get_client()
+    if not locked:
+        with client.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT):
+            return flush_pending_deltas(batch_size, locked=True)
+
+    batch_size = batch_size or settings.HOT_INVENTORY_FLUSH_BATCH_SIZE
+    reply = client.register_script(TAKE_PENDING_SCRIPT)(
+        keys=[PENDING_KEY, PROCESSING_KEY, PROCESSING_BATCH_KEY], args=[str(uuid.uuid4())],
+    )
+    if not reply:
+        return 0
+
+    batch_id = uuid.UUID(reply[0].decode())
+    inventory_deltas, reserved_deltas = parse_pending_deltas(reply[1:])
+    product_ids = sorted(reserved_deltas)
+
+    with transaction.atomic():
+        # only the processing batch can be taken again, the records of older ones are not needed anymore
+        written = HotInventoryFlush.objects.filter(batch_id=batch_id).exists()
+        HotInventoryFlush.objects.exclude(batch_id=batch_id).delete()
+
+        if not written:
+            HotInventoryFlush.objects.create(batch_id=batch_id)
+            # the product rows and caches follow with the compaction of the movements
+            InventoryMovement.objects.bulk_create(
+                (InventoryMovement(product_id=product_id, quantity=delta, reason=reason) for (product_id, reason), delta in inventory_deltas.items()),
+                batch_size=batch_size,
+            )
+            for start in range(0, len(product_ids), batch_size):
+                batch_ids = product_ids[start:start + batch_size]
+                reserved_delta = Case(*(When(pk=product_id, then=Value(reserved_deltas[product_id])) for product_id in batch_ids), output_field=IntegerField())
+
+                # a reservation released by the reconciliation in the meantime must not fail the batch
+                Product.objects.filter(pk__in=batch_ids).update(reserved_inventory=Greatest(F('reserved_inventory') + reserved_delta, 0))
+
+    # a failure above leaves the batch in place for the next flush, a failure here makes it a replay
+    client.delete(PROCESSING_KEY, PROCESSING_BATCH_KEY)
+    return len({product_id for product_id, _ in inventory_deltas} | set(product_ids))
@@ -0,0 +1,74 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+# longest side of every rendition, images are never upscaled
+PRODUCT_IMAGE_RENDITIONS = {
+    'thumbnail': (150, 150),
+    'card': (400, 400),
+    'detail': (1200, 1200),
+}
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_rendition_name(image_name, rendition, extension):
+    # renditions live next to the original, sample/lamp.png -> sample/renditions/lamp_card.webp
+    directory, filename = os.path.split(os.path.splitext(image_name)[0])
+    return os.path.join(directory, 'renditions', f'{filename}_{rendition}.{extension}')
+
+
+def get_image_renditions(product):
+    """
+    Rendition names of the current product image, empty until they are generated for it.
+    """
+    renditions = product.image_renditions or {}
+
+    if not product.image or renditions.get('source') != product.image.name:
+        return {}
+    return renditions
+
+
+def encode_rendition(image, image_format, options):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # jpeg has no alpha channel, flatten transparent areas on white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_image_renditions(storage, image_name):
+    """
+    Write every rendition of the stored image in every format and return the map kept in Product.image_renditions.
+    """
+    with storage.open(image_name) as image_file:
+        image = ImageOps.exif_transpose(Image.open(image_file))
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    renditions = {'source': image_name}
+
+    for rendition, size in PRODUCT_IMAGE_RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        renditions[rendition] = {}
+
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            rendition_name = get_rendition_name(image_name, rendition, extension)
+            # regenerating replaces the files instead of piling up suffixed copies
+            if storage.exists(rendition_name):
+                storage.delete(rendition_name)
+            renditions[rendition][extension] = storage.save(rendition_name, encode_rendition(resized, image_format, options))
+
+    return renditions
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils.text import slugify
+from django.utils.timezone import now
+from rest_framework import serializers
+
+from .caching import invalidate_products_cache
+from .hot_inventory import flush_before_overwrite, reset_counters
+from .ledger import record_overwritten_inventories
+from .models import Category, InventoryMovement, Product
+from .pricing import update_effective_prices
+from .search import get_search_backend
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    # category slug, resolved once per batch
+    category = serializers.SlugField()
+    description = serializers.CharField(allow_blank=True, default='')
+    unit_price = serializers.IntegerField(min_value=0, max_value=2147483647)
+    inventory = serializers.IntegerField(min_value=0, max_value=2147483647)
+
+    def validate_name(self, name):
+        # products are keyed and routed by the slug of their name
+        slug = slugify(name)
+        max_length = Product._meta.get_field('slug').max_length
+
+        if not slug:
+            raise serializers.ValidationError('The name must contain letters or digits.')
+        if len(slug) > max_length:
+            raise serializers.ValidationError(f'The slug of the name is longer than {max_length} characters: {slug}')
+        return name
+
+
+def iter_csv_rows(stream):
+    # utf-8-sig drops the BOM spreadsheet exports start with
+    yield from csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+
+def iter_ndjson_rows(stream):
+    for line in stream:
+        if line.strip():
+            # a broken line is reported as the error of its row
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield error
+
+
+class ProductImporter:
+    """
+    Create or update products from a CSV or NDJSON stream, keyed on the slug of the product name.
+
+    Rows are read lazily and written in batches with bulk_create/bulk_update, the signals are skipped so
+    caches and the search index are refreshed once per batch. Invalid rows are reported and skipped.
+    """
+    FILE_FORMATS = {
+        'csv': iter_csv_rows,
+        'ndjson': iter_ndjson_rows,
+    }
+    BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+    UPDATE_FIELDS = ['name', 'category', 'description', 'unit_price', 'inventory', 'datetime_modified']
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.errors_count = 0
+
+    def add_error(self, row_number, errors):
+        self.errors_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def run(self, stream, file_format):
+        rows = enumerate(self.FILE_FORMATS[file_format](stream), start=1)
+
+        try:
+            while batch := list(islice(rows, self.batch_size)):
+                self.import_batch(batch)
+        except (csv.Error, UnicodeDecodeError) as error:
+            # the rest of the file can not be read, batches written so far are kept
+            self.add_error(None, str(error))
+
+        return self.get_report()
+
+    def get_report(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'errors_count': self.errors_count,
+            'errors': self.errors,
+        }
+
+    def validate_batch(self, batch):
+        valid_rows = {}
+
+        for row_number, row in batch:
+            if not isinstance(row, dict):
+                self.add_error(row_number, str(row) if isinstance(row, Exception) else 'Expected an object.')
+                continue
+
+            serializer = ProductImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.add_error(row_number, serializer.errors)
+                continue
+
+            slug = slugify(serializer.validated_data['name'])
+            if slug in valid_rows:
+                self.add_error(row_number, {'name': [f'Product {slug} is already imported by row {valid_rows[slug][0]}.']})
+                continue
+
+            valid_rows[slug] = (row_number, serializer.validated_data)
+        return valid_rows
+
+    def import_batch(self, batch):
+        valid_rows = self.validate_batch(batch)
+        if not valid_rows:
+            return
+
+        category_slugs = {data['category'] for _, data in valid_rows.values()}
+        categories = Category.objects.in_bulk(list(category_slugs), field_name='slug')
+        hot_product_ids = flush_before_overwrite(Product.objects.filter(slug__in=valid_rows))
+        existing_products = Product.objects.only(*self.UPDATE_FIELDS, 'slug').in_bulk(list(valid_rows), field_name='slug')
+
+        products_to_create = []
+        products_to_update = []
+        modified_at = now()
+
+        for slug, (row_number, data) in valid_rows.items():
+            category = categories.get(data['category'])
+            if category is None:
+                self.add_error(row_number, {'category': [f'Category {data["category"]} does not exist.']})
+                continue
+
+            product = existing_products.get(slug) or Product(slug=slug)
+            product.name = data['name']
+            product.category = category
+            product.description = data['description']
+            product.unit_price = data['unit_price']
+            product.inventory = data['inventory']
+            # bulk_update does not apply auto_now
+            product.datetime_modified = modified_at
+
+            if product.pk:
+                products_to_update.append(product)
+            else:
+                products_to_create.append(product)
+
+        with transaction.atomic():
+            # the inventories being replaced are read under the row locks
+            previous_inventories = dict(
+                Product.objects.select_for_update().filter(pk__in=[product.pk for product in products_to_update])
+                .order_by('pk').values_list('pk', 'inventory')
+            )
+            Product.objects.bulk_create(products_to_create)
+            Product.objects.bulk_update(products_to_update, self.UPDATE_FIELDS)
+            # imported values overwrite the whole stock, the ledger records the differences
+            record_overwritten_inventories(
+                previous_inventories,
+                {product.pk: product.inventory for product in products_to_create + products_to_update},
+                InventoryMovement.REASON_IMPORT,
+            )
+
+            imported_slugs = [product.slug for product in products_to_create + products_to_update]
+            update_effective_prices(Product.objects.filter(slug__in=imported_slugs))
+            get_search_backend().index_products(Product.objects.filter(slug__in=imported_slugs))
+            # the next reader starts the counters from the imported inventories
+            transaction.on_commit(lambda: reset_counters(hot_product_ids))
+
+        self.created += len(products_to_create)
+        self.updated += len(products_to_update)
+        # once per batch instead of the per row signal handlers
+        invalidate_products_cache([product.slug for product in products_to_update])
@@ -0,0 +1,263 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import hot_inventory
+from .ledger import annotate_stock, append_movements, compact_movements, get_pending_quantities
+from .models import InventoryMovement, Product, StockReservation
+
+
+# unpaid orders hold their items for this long, starting a payment renews the reservation
+RESERVATION_TIMEOUT = timedelta(minutes=15)
+
+
+class InsufficientInventory(Exception):
+    def __init__(self, insufficient_products):
+        # (product name, available inventory, requested change) of every product that would go below zero
+        self.insufficient_products = insufficient_products
+        super().__init__(f'Not enough inventory for {insufficient_products}')
+
+
+def get_inventory_deltas(items, reduce: bool):
+    """
+    Signed inventory change per product id for (product_id, quantity) pairs, e.g. the items of an order.
+    """
+    deltas = Counter()
+    for product_id, quantity in items:
+        deltas[product_id] += -quantity if reduce else quantity
+    return dict(deltas)
+
+
+def split_hot_products(deltas: dict):
+    # (deltas of the products kept in the database, deltas of the products whose live inventory is in redis)
+    hot_product_ids = hot_inventory.get_hot_product_ids(list(deltas))
+    return (
+        {product_id: delta for product_id, delta in deltas.items() if product_id not in hot_product_ids},
+        {product_id: delta for product_id, delta in deltas.items() if product_id in hot_product_ids},
+    )
+
+
+def apply_hot_deltas(deltas: dict, reason: str = InventoryMovement.REASON_SALE):
+    """
+    Apply {product_id: (available change, inventory change, reserved change)} to the redis counters of hot products.
+    Called last inside the transaction of the database changes, which roll back with InsufficientInventory. The
+    change is confirmed by the commit of that transaction, see hot_inventory.apply_deltas.
+    """
+    insufficient_inventories = hot_inventory.apply_deltas(deltas, reason)
+    if insufficient_inventories:
+        names = dict(Product.objects.filter(pk__in=insufficient_inventories).values_list('pk', 'name'))
+        raise InsufficientInventory([
+            (names[product_id], available, deltas[product_id][0]) for product_id, available in insufficient_inventories.items()
+        ])
+
+
+def get_available_inventory(product: Product):
+    """
+    Stock that can be ordered, the stock minus its reserved part. Read from the live redis counter for hot products
+    while HOT_INVENTORY_ENABLED, and from the `stock` annotation of store.ledger when the product has one.
+    """
+    if product.hot_inventory and hot_inventory.is_hot_inventory_enabled():
+        return max(hot_inventory.get_available_inventories([product.pk])[product.pk], 0)
+
+    if hasattr(product, 'stock'):
+        # annotated in the same row as the reserved inventory
+        stock, reserved_inventory = product.stock, product.reserved_inventory
+    else:
+        stock, reserved_inventory = annotate_stock(Product.objects.filter(pk=product.pk)).values_list('stock', 'reserved_inventory').get()
+    return max(stock - reserved_inventory, 0)
+
+
+def get_delta_expression(deltas: dict):
+    # the change of every row in a single UPDATE
+    return Case(
+        *(When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()),
+        output_field=IntegerField(),
+    )
+
+
+def lock_products(product_ids):
+    """
+    Lock the products and return their (pk, name, slug, stock, reserved_inventory), the stock includes the pending
+    movements. Rows are locked in id order, concurrent changes of the same products queue up instead of deadlocking.
+    """
+    products = list(
+        Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+        .values_list('pk', 'name', 'slug', 'inventory', 'reserved_inventory')
+    )
+    # a separate statement, one started before the lock was granted would miss the movements of the previous holder
+    pending_quantities = get_pending_quantities([product_id for product_id, *_ in products])
+    return [
+        (product_id, name, slug, inventory + pending_quantities.get(product_id, 0), reserved_inventory)
+        for product_id, name, slug, inventory, reserved_inventory in products
+    ]
+
+
+def lock_reservations(reservations):
+    # reservations are always locked before their products, in id order
+    return list(reservations.select_for_update().order_by('pk').values_list('pk', 'product_id', 'quantity'))
+
+
+def adjust_inventory(deltas: dict, reason: str, order=None):
+    """
+    Record the signed change of every product id as inventory movements in one transaction, returns the number of
+    products. Nothing changes and InsufficientInventory is raised if a stock would go below its reserved part.
+    Product.inventory and the product caches follow with the compaction, hot products are changed in redis without
+    any database write.
+
+    Only additions are lock-free plain inserts. A reduction has to check the stock, and under READ COMMITTED two
+    concurrent checks do not see each other's uncommitted movements, so both could pass and oversell. Reductions
+    therefore lock their product rows for the check, for as long as the insert of their movements takes.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    deltas, hot_deltas = split_hot_products(deltas)
+    reductions = {product_id: delta for product_id, delta in deltas.items() if delta < 0}
+
+    with transaction.atomic():
+        # stock held for unpaid orders can not be taken
+        insufficient_products = [
+            (name, stock - reserved_inventory, reductions[product_id])
+            for product_id, name, _, stock, reserved_inventory in lock_products(reductions)
+            if stock - reserved_inventory + reductions[product_id] < 0
+        ]
+        if insufficient_products:
+            raise InsufficientInventory(insufficient_products)
+
+        append_movements(deltas, reason, order)
+        apply_hot_deltas({product_id: (delta, delta, 0) for product_id, delta in hot_deltas.items()}, reason)
+
+    return len(deltas) + len(hot_deltas)
+
+
+def deduct_available_inventory(deltas: dict, reason: str, order=None):
+    """
+    Record the reductions of deltas one product at a time, a product without enough stock gives what is available.
+    Returns the (product name, available inventory, requested change) of the products that fell short.
+    """
+    shortfalls = []
+
+    with transaction.atomic():
+        # ascending ids, the rows locked by earlier products are held until the end like in adjust_inventory
+        for product_id, delta in sorted(deltas.items()):
+            requested_delta = delta
+
+            # the available stock of a hot product can drop between the refusal and the retry
+            while True:
+                try:
+                    adjust_inventory({product_id: delta}, reason, order)
+                    break
+                except InsufficientInventory as e:
+                    (name, available, _), = e.insufficient_products
+                    delta = -max(available, 0)
+
+            if delta != requested_delta:
+                shortfalls.append((name, -delta, requested_delta))
+
+    return shortfalls
+
+
+def reserve_inventory(order, items, expires_at):
+    """
+    Hold the (product_id, quantity) items of an unpaid order until expires_at, items reserved before only get the
+    new expiry. Nothing is reserved and InsufficientInventory is raised if the available stock of a product,
+    stock minus the reserved inventory, is not enough.
+    """
+    quantities = get_inventory_deltas(items, reduce=False)
+
+    with transaction.atomic():
+        reserved_product_ids = {product_id for _, product_id, _ in lock_reservations(order.reservations.all())}
+        order.reservations.update(expires_at=expires_at)
+
+        missing_quantities = {
+            product_id: quantity for product_id, quantity in quantities.items() if product_id not in reserved_product_ids
+        }
+        if not missing_quantities:
+            return
+        cold_quantities, hot_quantities = split_hot_products(missing_quantities)
+
+        insufficient_products = [
+            (name, stock - reserved_inventory, -missing_quantities[product_id])
+            for product_id, name, _, stock, reserved_inventory in lock_products(cold_quantities)
+            if stock - reserved_inventory < missing_quantities[product_id]
+        ]
+        if insufficient_products:
+            raise InsufficientInventory(insufficient_products)
+
+        # the available stock is not rendered anywhere, reservations leave the product caches alone
+        if cold_quantities:
+            Product.objects.filter(pk__in=cold_quantities).update(
+                reserved_inventory=F('reserved_inventory') + get_delta_expression(cold_quantities),
+            )
+        StockReservation.objects.bulk_create(
+            StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in missing_quantities.items()
+        )
+        apply_hot_deltas({product_id: (-quantity, 0, quantity) for product_id, quantity in hot_quantities.items()})
+
+
+def release_reservations(reservations):
+    """
+    Give the reserved quantities back to the available stock with one UPDATE and delete the reservations,
+    returns the number of released reservations. Concurrent releases of the same reservations happen once.
+    """
+    with transaction.atomic():
+        released_reservations = lock_reservations(reservations)
+        if not released_reservations:
+            return 0
+
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in released_reservations]).delete()
+        deltas = get_inventory_deltas(((product_id, quantity) for _, product_id, quantity in released_reservations), reduce=True)
+        deltas, hot_deltas = split_hot_products(deltas)
+
+        if deltas:
+            Product.objects.filter(pk__in=deltas).update(reserved_inventory=F('reserved_inventory') + get_delta_expression(deltas))
+        apply_hot_deltas({product_id: (-delta, 0, delta) for product_id, delta in hot_deltas.items()})
+
+    return len(released_reservations)
+
+
+def commit_reservations(order):
+    """
+    Turn the reservations of a paid order into sale movements of the order. Returns the (product_id, quantity)
+    items whose reservation was released before the payment, they are not deducted.
+    """
+    with transaction.atomic():
+        reservations = lock_reservations(order.reservations.all())
+        reserved_quantities = get_inventory_deltas(((product_id, quantity) for _, product_id, quantity in reservations), reduce=True)
+        deltas, hot_deltas = split_hot_products(reserved_quantities)
+
+        if deltas:
+            Product.objects.filter(pk__in=deltas).update(reserved_inventory=F('reserved_inventory') + get_delta_expression(deltas))
+            append_movements(deltas, InventoryMovement.REASON_SALE, order)
+
+        if reservations:
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in reservations]).delete()
+        # the reserved stock was already taken from the available counter
+        apply_hot_deltas({product_id: (0, delta, delta) for product_id, delta in hot_deltas.items()}, InventoryMovement.REASON_SALE)
+
+    return [
+        (product_id, quantity) for product_id, quantity in order.items.values_list('product_id', 'quantity')
+        if product_id not in reserved_quantities
+    ]
+
+
+def clear_inventory(product_ids):
+    """
+    Take the whole stock of the products with cleared movements and compact them right away, returns the number
+    of cleared products.
+    """
+    hot_product_ids = hot_inventory.get_hot_product_ids(list(product_ids))
+    # pending sales of hot products must reach the ledger before their stock is read
+    if hot_product_ids:
+        hot_inventory.flush_pending_deltas()
+
+    with transaction.atomic():
+        stocks = {product_id: stock for product_id, _, _, stock, _ in lock_products(product_ids)}
+        append_movements({product_id: -stock for product_id, stock in stocks.items()}, InventoryMovement.REASON_CLEAR)
+
+    compact_movements(list(stocks))
+    hot_inventory.reset_counters(hot_product_ids)
+    return len(stocks)
@@ -0,0 +1,136 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from .caching import invalidate_products_cache
+from .models import InventoryMovement, Product
+
+
+logger = logging.getLogger(__name__)
+
+def get_pending_quantities(product_ids):
+    """
+    Sum of the pending movements per product id, products without any are left out.
+    """
+    return dict(
+        InventoryMovement.pending.filter(product_id__in=product_ids).order_by()
+        .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+
+
+def annotate_stock(queryset):
+    """
+    Annotate `stock`, the compacted inventory plus the pending movements, in the same statement so a concurrent
+    compaction is never counted twice.
+    """
+    pending_quantity = InventoryMovement.pending.filter(product=OuterRef('pk')).order_by() \
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    return queryset.annotate(stock=F('inventory') + Coalesce(Subquery(pending_quantity), 0))
+
+
+def prefetch_stock(lookup='product'):
+    """
+    Prefetch the products of `lookup` with their stock annotated, for lists that render the available inventory
+    of every row.
+    """
+    return Prefetch(lookup, queryset=annotate_stock(Product.objects.all()))
+
+
+def get_stock(product_ids):
+    """
+    Current stock per product id, {product_id: stock}.
+    """
+    return dict(annotate_stock(Product.objects.filter(pk__in=product_ids)).values_list('pk', 'stock'))
+
+
+def append_movements(deltas: dict, reason: str, order=None):
+    """
+    Record the signed change of every product id as a pending movement, plain inserts that lock no product row.
+    The compaction folds them into Product.inventory.
+    """
+    return InventoryMovement.objects.bulk_create(
+        InventoryMovement(product_id=product_id, quantity=delta, reason=reason, order=order)
+        for product_id, delta in deltas.items() if delta
+    )
+
+
+def record_compacted_movements(deltas: dict, reason: str):
+    """
+    Record changes that were written to Product.inventory directly, they are part of the snapshot already.
+    """
+    compacted_at = now()
+    return InventoryMovement.objects.bulk_create(
+        InventoryMovement(product_id=product_id, quantity=delta, reason=reason, datetime_compacted=compacted_at)
+        for product_id, delta in deltas.items() if delta
+    )
+
+
+def record_overwritten_inventories(previous_inventories: dict, inventories: dict, reason: str):
+    """
+    Record new values written to Product.inventory directly, {product_id: inventory} with the compacted inventories
+    they replace. Called with the product rows locked: the pending movements are superseded by the new values, they
+    are marked compacted and the recorded change is measured from the whole stock.
+    """
+    movements = list(InventoryMovement.pending.filter(product_id__in=inventories).values_list('pk', 'product_id', 'quantity'))
+    InventoryMovement.objects.filter(pk__in=[pk for pk, _, _ in movements]).update(datetime_compacted=now())
+
+    stocks = dict(previous_inventories)
+    for _, product_id, quantity in movements:
+        stocks[product_id] = stocks.get(product_id, 0) + quantity
+
+    return record_compacted_movements(
+        {product_id: inventory - stocks.get(product_id, 0) for product_id, inventory in inventories.items()}, reason,
+    )
+
+
+def compact_movements(product_ids=None, batch_size: int = None):
+    """
+    Fold the pending movements into Product.inventory, one transaction and one UPDATE per batch of products.
+    Returns the number of compacted products. The movements are kept as the inventory history.
+    """
+    batch_size = batch_size or settings.INVENTORY_COMPACTION_BATCH_SIZE
+    pending_movements = InventoryMovement.pending.all()
+    if product_ids is not None:
+        pending_movements = pending_movements.filter(product_id__in=product_ids)
+
+    pending_product_ids = sorted(set(pending_movements.values_list('product_id', flat=True)))
+    compacted_count = 0
+
+    for start in range(0, len(pending_product_ids), batch_size):
+        batch_ids = pending_product_ids[start:start + batch_size]
+
+        with transaction.atomic():
+            # the movements are read after the rows are locked, in id order like every other inventory write
+            products = list(Product.objects.select_for_update().filter(pk__in=batch_ids).order_by('pk').values_list('pk', 'slug', 'inventory'))
+            movements = list(InventoryMovement.pending.filter(product_id__in=batch_ids).values_list('pk', 'product_id', 'quantity'))
+            slugs = [slug for _, slug, _ in products]
+
+            deltas = {}
+            for _, product_id, quantity in movements:
+                deltas[product_id] = deltas.get(product_id, 0) + quantity
+
+            # a stock below zero is a bug of some writer, it is corrected in the open so the history keeps adding up
+            corrections = {
+                product_id: -(inventory + deltas[product_id])
+                for product_id, _, inventory in products if product_id in deltas and inventory + deltas[product_id] < 0
+            }
+            if corrections:
+                logger.warning('Inventory movements took the stock of products below zero, corrected: %s', corrections)
+                record_compacted_movements(corrections, InventoryMovement.REASON_CORRECTION)
+                for product_id, correction in corrections.items():
+                    deltas[product_id] += correction
+
+            delta_expression = Case(
+                *(When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()),
+                output_field=IntegerField(),
+            )
+            Product.objects.filter(pk__in=deltas).update(inventory=F('inventory') + delta_expression, datetime_modified=now())
+            InventoryMovement.objects.filter(pk__in=[pk for pk, _, _ in movements]).update(datetime_compacted=now())
+            transaction.on_commit(lambda slugs=slugs: invalidate_products_cache(slugs))
+
+        compacted_count += len(deltas)
+    return compacted_count
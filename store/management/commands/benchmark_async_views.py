@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from store.benchmarks.async_views import CONCURRENCY, REQUESTS, run_async_view_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compares the throughput of the sync and async read endpoints over the ASGI application and prints the results as json"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY, help='Numbers of concurrent requests every endpoint is loaded with')
+        parser.add_argument('--requests', type=int, default=REQUESTS, help='Number of requests per measurement')
+        parser.add_argument('--output', help='Path of the json report, defaults to stdout')
+
+    def handle(self, *args, **options):
+        report = run_async_view_benchmarks(concurrency=options['concurrency'], requests=options['requests'])
+
+        if not options['output']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} measurements to {options['output']}."))
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from store.benchmarks.serializers import REPEAT, ROWS, run_serializer_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Times the store serializers and renderers over generated data and prints the results as json"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=ROWS, help='Row counts every serializer is timed with')
+        parser.add_argument('--repeat', type=int, default=REPEAT, help='Number of timed runs per measurement')
+        parser.add_argument('--output', help='Path of the json report, defaults to stdout')
+
+    def handle(self, *args, **options):
+        report = run_serializer_benchmarks(rows=options['rows'], repeat=options['repeat'])
+
+        if not options['output']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} measurements to {options['output']}."))
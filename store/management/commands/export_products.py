@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.exporters import ProductExporter
+
+
+class Command(BaseCommand):
+    help = "Streams the whole catalog to a file or stdout, one line per product"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-format', choices=list(ProductExporter.FILE_FORMATS), default='ndjson')
+        parser.add_argument('--output', help='Path of the export file, defaults to stdout')
+        parser.add_argument('--chunk-size', type=int, default=ProductExporter.CHUNK_SIZE, help='Number of rows fetched per query')
+
+    def handle(self, *args, **options):
+        exporter = ProductExporter(chunk_size=options['chunk_size'])
+        lines = exporter.export(options['file_format'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Exported the catalog to {options['output']}."))
@@ -0,0 +1,32 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importers import ProductImporter
+
+
+class Command(BaseCommand):
+    help = "Creates or updates products from a CSV or NDJSON file in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file with name, category, description, unit_price and inventory')
+        parser.add_argument(
+            '--file-format', choices=list(ProductImporter.FILE_FORMATS), help='Defaults to the file extension'
+        )
+        parser.add_argument('--batch-size', type=int, default=ProductImporter.BATCH_SIZE, help='Number of rows written per batch')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in ProductImporter.FILE_FORMATS:
+            raise CommandError(f'Unknown file format {file_format}, use --file-format')
+
+        with open(options['path'], 'rb') as stream:
+            report = ProductImporter(batch_size=options['batch_size']).run(stream, file_format)
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} and updated {report['updated']} products, {report['errors_count']} rows failed."
+        ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from store.caching import invalidate_products_cache
+from store.models import Comment, Product
+
+
+class Command(BaseCommand):
+    help = "Recomputes the approved comments counter of every product in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of products updated per query')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        approved_comments = Comment.approved.filter(product=OuterRef('pk')) \
+            .order_by().values('product').annotate(count=Count('id')).values('count')
+
+        last_product_id = 0
+        updated_slugs = []
+
+        while True:
+            product_ids = list(
+                Product.objects.filter(id__gt=last_product_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not product_ids:
+                break
+
+            with transaction.atomic():
+                # only drifted counters are written, the payload of the others has not changed
+                drifted_products = Product.objects.filter(id__in=product_ids) \
+                    .annotate(expected_count=Coalesce(Subquery(approved_comments), 0)) \
+                    .exclude(approved_comments_count=F('expected_count'))
+                slugs = list(drifted_products.values_list('slug', flat=True))
+
+                Product.objects.filter(slug__in=slugs).update(
+                    approved_comments_count=Coalesce(Subquery(approved_comments), 0), datetime_modified=now()
+                )
+            updated_slugs.extend(slugs)
+
+            last_product_id = product_ids[-1]
+            self.stdout.write(f"Recomputed comments count up to product {last_product_id}...")
+
+        # the counter is part of the cached product payloads
+        if updated_slugs:
+            invalidate_products_cache(updated_slugs)
+
+        self.stdout.write(self.style.SUCCESS(f"Fixed the comments count of {len(updated_slugs)} products."))
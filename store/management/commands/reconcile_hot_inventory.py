@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from store import hot_inventory
+from store.ledger import annotate_stock
+from store.models import Product, StockReservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Flushes the pending hot inventory changes and compares the redis counters of hot products with the database. "
+        "Run with --fix while checkouts are paused to overwrite the counters and the reserved inventory with the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted counters and reserved inventories')
+
+    def handle(self, *args, **options):
+        client = hot_inventory.get_client()
+
+        with client.lock(hot_inventory.FLUSH_LOCK_KEY, timeout=hot_inventory.FLUSH_LOCK_TIMEOUT):
+            # paused checkouts leave only the holds of rolled back transactions
+            hot_inventory.release_expired_holds(timeout=0)
+            flushed_count = hot_inventory.flush_pending_deltas(locked=True)
+            self.stdout.write(f"Flushed pending changes of {flushed_count} products.")
+
+            reserved_quantities = StockReservation.objects.filter(product=OuterRef('pk')) \
+                .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+            products = list(
+                annotate_stock(Product.objects.filter(hot_inventory=True)).order_by('pk')
+                .annotate(reserved_quantity=Coalesce(Subquery(reserved_quantities), 0))
+                .values_list('pk', 'name', 'stock', 'reserved_inventory', 'reserved_quantity')
+            )
+            counters = client.mget([hot_inventory.get_available_key(product_id) for product_id, *_ in products])
+
+            drifted_products = []
+            for (product_id, name, stock, reserved_inventory, reserved_quantity), counter in zip(products, counters):
+                available = stock - reserved_quantity
+                # a missing counter is started from the database by the next reader
+                counter_drifted = counter is not None and int(counter) != available
+
+                if counter_drifted or reserved_inventory != reserved_quantity:
+                    drifted_products.append((product_id, available, reserved_quantity))
+                    self.stdout.write(self.style.WARNING(
+                        f"{name} (#{product_id}): counter {counter and int(counter)}, expected {available} | "
+                        f"reserved inventory {reserved_inventory}, expected {reserved_quantity}"
+                    ))
+
+            hot_product_ids = {product_id for product_id, *_ in products}
+            stale_keys = [
+                key for key in client.scan_iter(match=f'{hot_inventory.AVAILABLE_KEY_PREFIX}*')
+                if int(key.decode().removeprefix(hot_inventory.AVAILABLE_KEY_PREFIX)) not in hot_product_ids
+            ]
+
+            if not options['fix']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Found {len(drifted_products)} drifted products and {len(stale_keys)} counters of products that are not hot."
+                ))
+                return
+
+            with transaction.atomic():
+                for product_id, available, reserved_quantity in drifted_products:
+                    Product.objects.filter(pk=product_id).update(reserved_inventory=reserved_quantity)
+
+            pipeline = client.pipeline()
+            for product_id, available, _ in drifted_products:
+                pipeline.set(hot_inventory.get_available_key(product_id), available)
+            if stale_keys:
+                pipeline.delete(*stale_keys)
+            pipeline.execute()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fixed {len(drifted_products)} drifted products and removed {len(stale_keys)} stale counters."
+        ))
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.8 on 2026-10-17 09:12
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+POSTGRES_INDEX_SQL = 'CREATE INDEX store_product_search_vector_gin ON store_product USING gin (search_vector)'
+POSTGRES_DROP_INDEX_SQL = 'DROP INDEX IF EXISTS store_product_search_vector_gin'
+POSTGRES_BACKFILL_SQL = """
+    UPDATE store_product p SET search_vector =
+        setweight(to_tsvector('simple', COALESCE(p.name, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(c.title, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(p.description, '')), 'C')
+    FROM store_category c WHERE c.id = p.category_id
+"""
+
+SQLITE_CREATE_SQL = 'CREATE VIRTUAL TABLE store_product_fts USING fts5(name, category_title, description)'
+SQLITE_DROP_SQL = 'DROP TABLE IF EXISTS store_product_fts'
+SQLITE_BACKFILL_SQL = """
+    INSERT INTO store_product_fts (rowid, name, category_title, description)
+    SELECT p.id, p.name, c.title, p.description FROM store_product p
+    INNER JOIN store_category c ON c.id = p.category_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_INDEX_SQL)
+        schema_editor.execute(POSTGRES_BACKFILL_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE_SQL)
+        schema_editor.execute(SQLITE_BACKFILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_DROP_INDEX_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0036_alter_order_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0037_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-datetime_created'], name='store_order_created_desc_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-17 10:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_approved_comments_count(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Comment = apps.get_model('store', 'Comment')
+
+    approved_comments = Comment.objects.filter(product=OuterRef('pk'), status='approved') \
+        .order_by().values('product').annotate(count=Count('id')).values('count')
+
+    Product.objects.update(approved_comments_count=Coalesce(Subquery(approved_comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0038_order_store_order_created_desc_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='approved_comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_approved_comments_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.8 on 2026-10-17 13:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0039_product_approved_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='datetime_modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
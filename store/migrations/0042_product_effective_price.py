@@ -0,0 +1,35 @@
+# Generated by Django 4.2.8 on 2026-10-17 16:05
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Floor
+
+
+def fill_effective_price(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Discount = apps.get_model('store', 'Discount')
+
+    largest_discount = Discount.objects.filter(product=OuterRef('pk'), discount__gt=0, discount__lte=1) \
+        .order_by('-discount').values('discount')[:1]
+    discounted_price = ExpressionWrapper(
+        F('unit_price') * (Value(1.0) - Coalesce(Subquery(largest_discount), Value(0.0))) + Value(0.5),
+        output_field=FloatField(),
+    )
+
+    Product.objects.update(effective_price=Cast(Floor(discounted_price), output_field=models.PositiveIntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0041_product_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+    ]
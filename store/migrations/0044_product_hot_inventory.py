@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0043_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='hot_inventory',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.8 on 2026-10-17 17:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0044_product_hot_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('sale', 'Sale'), ('restock', 'Restock'), ('initial', 'Initial inventory'), ('manual_edit', 'Manual edit'), ('bulk_update', 'Bulk update'), ('import', 'Import'), ('clear', 'Cleared')], max_length=255)),
+                ('datetime_created', models.DateTimeField(auto_now_add=True)),
+                ('datetime_compacted', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_movements', to='store.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('datetime_compacted__isnull', True)), fields=['product', 'quantity'], name='store_movement_pending_idx'), models.Index(fields=['product', '-datetime_created'], name='store_movement_history_idx')],
+            },
+        ),
+    ]
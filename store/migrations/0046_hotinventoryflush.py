@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0045_inventorymovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotInventoryFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.UUIDField(unique=True)),
+                ('datetime_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0046_hotinventoryflush'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorymovement',
+            name='reason',
+            field=models.CharField(choices=[('sale', 'Sale'), ('restock', 'Restock'), ('initial', 'Initial inventory'), ('manual_edit', 'Manual edit'), ('bulk_update', 'Bulk update'), ('import', 'Import'), ('clear', 'Cleared'), ('correction', 'Correction')], max_length=255),
+        ),
+    ]
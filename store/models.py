@@ -1,5 +1,6 @@
 from datetime import timedelta
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db import models
@@ -12,6 +13,7 @@ class Category(models.Model):
     slug = models.SlugField(unique=True, db_index=True)
     description = models.CharField(max_length=500, blank=True)
     top_product = models.ForeignKey('Product', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    datetime_modified = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -36,12 +38,25 @@ class Product(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
     unit_price = models.PositiveIntegerField()
+    # compacted snapshot, the stock is this plus the pending InventoryMovement rows, see store.ledger
     inventory = models.PositiveIntegerField(validators=[MinValueValidator(0)])
+    # quantity held by the stock reservations of unpaid orders, maintained by store.inventory
+    reserved_inventory = models.PositiveIntegerField(default=0, editable=False)
+    # high contention products, their live inventory is kept in redis while HOT_INVENTORY_ENABLED, see store.hot_inventory
+    hot_inventory = models.BooleanField(default=False)
     datetime_created = models.DateTimeField(auto_now_add=True)
     datetime_modified = models.DateTimeField(auto_now=True)
     discounts = models.ManyToManyField(Discount, blank=True)
+    # unit price after the largest discount, maintained by store.pricing through the product and discount signals
+    effective_price = models.PositiveIntegerField(default=0, editable=False)
     activation = models.BooleanField(default=True)
     image = models.ImageField(upload_to='sample/', blank=True, null=True)
+    # maintained by store.search through the product signals
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+    # maintained by the comment signals, recompute with the recompute_comments_count command
+    approved_comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # generated by the generate_product_image_renditions task after every upload, see store.images
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     objects = models.Manager()
     active = ActiveProductManager()
@@ -51,12 +66,41 @@ class Product(models.Model):
             models.Index(fields=['name' ,'category', 'slug', 'unit_price', 'inventory'])
         ]
 
+    # columns kept up to date with set-based updates, a regular save must not write back a stale copy of them.
+    # An inventory changed by hand is recorded as a movement by the ledger signals instead
+    MAINTAINED_FIELDS = ['approved_comments_count', 'image_renditions', 'reserved_inventory', 'inventory']
+
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # a manual edit is the change from this value, see the inventory ledger signals
+        instance._loaded_inventory = instance.__dict__.get('inventory')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or 'inventory' in fields:
+            self._loaded_inventory = self.inventory
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped_fields = set(self.MAINTAINED_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped_fields
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def clean_price(self):
         return f'{self.unit_price: ,}'
+
+    @property
+    def clean_effective_price(self):
+        return f'{self.effective_price: ,}'
     
 
 class Customer(models.Model):
@@ -107,6 +151,12 @@ class Order(models.Model):
     objects = models.Manager()
     unpaid_orders = UnpaidOrderManger()
 
+    class Meta:
+        indexes = [
+            # keyset (cursor) pagination of orders walks this index
+            models.Index(fields=['-datetime_created'], name='store_order_created_desc_idx'),
+        ]
+
     def __str__(self):
         return f'Order id: {self.id} | Customer: {self.customer}'
     
@@ -119,18 +169,6 @@ class Order(models.Model):
     def total_items_price(self):
         return sum([item.unit_price * item.quantity for item in self.items.all()])
     
-    def check_stock(self):
-        insufficient_products = []
-        for item in self.items.select_related('product'):
-            if item.quantity > item.product.inventory:
-                insufficient_products.append({
-                    'product': item.product.name,
-                    'product_current_stock': item.product.inventory,
-                    'amount': item.quantity
-                })
-        
-        return (len(insufficient_products) == 0 ,insufficient_products)
-    
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_index=True)
@@ -149,6 +187,93 @@ class OrderItem(models.Model):
         return f'{self.unit_price: ,}'
 
 
+class StockReservation(models.Model):
+    """
+    Quantity of a product held for an unpaid order until expires_at, see store.inventory.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [['order', 'product']]
+        indexes = [
+            # expired reservations are released in bulk by the remove_expired_orders task
+            models.Index(fields=['expires_at'], name='store_reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} | reserved for order_{self.order_id}'
+
+
+class PendingInventoryMovementManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(datetime_compacted__isnull=True)
+
+
+class InventoryMovement(models.Model):
+    """
+    Append-only record of a change of Product.inventory, see store.ledger.
+    """
+    REASON_SALE = 'sale'
+    REASON_RESTOCK = 'restock'
+    REASON_INITIAL = 'initial'
+    REASON_MANUAL_EDIT = 'manual_edit'
+    REASON_BULK_UPDATE = 'bulk_update'
+    REASON_IMPORT = 'import'
+    REASON_CLEAR = 'clear'
+    REASON_CORRECTION = 'correction'
+    REASONS = [
+        (REASON_SALE, 'Sale'),
+        (REASON_RESTOCK, 'Restock'),
+        (REASON_INITIAL, 'Initial inventory'),
+        (REASON_MANUAL_EDIT, 'Manual edit'),
+        (REASON_BULK_UPDATE, 'Bulk update'),
+        (REASON_IMPORT, 'Import'),
+        (REASON_CLEAR, 'Cleared'),
+        (REASON_CORRECTION, 'Correction'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_movements')
+    # signed change of the inventory
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=255, choices=REASONS)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, related_name='inventory_movements', blank=True, null=True)
+    datetime_created = models.DateTimeField(auto_now_add=True)
+    # set once the quantity is part of Product.inventory, by the compaction or by a write of the column itself
+    datetime_compacted = models.DateTimeField(blank=True, null=True)
+
+    objects = models.Manager()
+    pending = PendingInventoryMovementManager()
+
+    class Meta:
+        indexes = [
+            # the stock of a product sums only its pending movements, the partial index stays small
+            models.Index(
+                fields=['product', 'quantity'],
+                condition=models.Q(datetime_compacted__isnull=True),
+                name='store_movement_pending_idx',
+            ),
+            models.Index(fields=['product', '-datetime_created'], name='store_movement_history_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity:+} x {self.product_id} | {self.reason}'
+
+
+class HotInventoryFlush(models.Model):
+    """
+    A batch of hot inventory changes written to the database, a batch taken again after its redis copy
+    could not be dropped is not written twice. See store.hot_inventory.
+    """
+    batch_id = models.UUIDField(unique=True)
+    datetime_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.batch_id)
+
+
 class CommentManger(models.Manager):
     def get_approved(self):
         return self.get_queryset().filter(status=Comment.COMMENT_STATUS_APPROVED)
@@ -193,7 +318,7 @@ class Cart(models.Model):
     TOMAN_SIGN = 'T'
 
     def total_price(self):
-        cart_total_price = sum((item.product.unit_price * item.quantity) for item in self.items.all())
+        cart_total_price = sum((item.product.effective_price * item.quantity) for item in self.items.all())
 
         return f'{cart_total_price: ,} {self.TOMAN_SIGN}'
 
@@ -209,7 +334,7 @@ class CartItem(models.Model):
     TOMAN_SIGN = 'T'
     
     def total_price(self):
-        cartitem_total_price =  sum([self.product.unit_price * self.quantity])
+        cartitem_total_price =  sum([self.product.effective_price * self.quantity])
 
         return f'{cartitem_total_price: ,} {self.TOMAN_SIGN}'
 
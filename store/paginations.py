@@ -1,7 +1,35 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
-class StandardResultSetPagination(PageNumberPagination):
+class AsyncPageNumberPaginationMixin:
+    """
+    apaginate_queryset() for the async views, the count and the page are loaded with the async ORM
+    so the rest of PageNumberPagination, links included, runs without queries.
+    """
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count is a cached property of the paginator
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return self.page.object_list
+
+
+class StandardResultSetPagination(AsyncPageNumberPaginationMixin, PageNumberPagination):
     page_size = 10
     page_query_param = 'page'
     page_size_query_param = 'page_size'
@@ -10,8 +38,62 @@ class StandardResultSetPagination(PageNumberPagination):
 
 
 
-class LargeResultSetPagination(PageNumberPagination):
+class LargeResultSetPagination(AsyncPageNumberPaginationMixin, PageNumberPagination):
     page_size = 20
     page_query_param = 'page'
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+# Keyset pagination, no COUNT(*) and no OFFSET so every page costs the same at any depth
+class TiebreakerCursorPagination(CursorPagination):
+    """
+    Appends a unique column to the ordering, with ?ordering=name or any other non-unique column the rows of one value
+    would come in a different order on every page and the cursor offset would skip or repeat them.
+    """
+    tiebreaker = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if self.tiebreaker.lstrip('-') in {field.lstrip('-') for field in ordering}:
+            return ordering
+        return (*ordering, self.tiebreaker)
+
+
+class ProductCursorPagination(TiebreakerCursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+
+class OrderCursorPagination(TiebreakerCursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-datetime_created'
+
+
+# Mixins
+class CursorPaginationMixin:
+    """
+    Lets clients opt into cursor pagination with ?pagination=cursor, the next/previous
+    links of a cursor page keep carrying the opaque cursor param.
+    """
+    cursor_pagination_class = None
+    pagination_mode_query_param = 'pagination'
+
+    def use_cursor_pagination(self):
+        query_params = self.request.query_params
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+
+        return query_params.get(self.pagination_mode_query_param) == 'cursor' or cursor_query_param in query_params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.cursor_pagination_class is not None and self.use_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
@@ -1,9 +1,49 @@
 from rest_framework import permissions
 from django.contrib.auth.models import Group
+from django.core.cache import cache
 from copy import deepcopy
+
+from config.db_routers import read_from_primary
+
 from .models import Customer
 
 
+GROUPS_CACHE_TIMEOUT = 60 * 15
+GROUP_NAMES_CACHE_KEY = 'groups:names'
+
+
+def get_user_groups_cache_key(user_id):
+    return f'groups:user:{user_id}'
+
+
+def get_user_group_names(user):
+    """
+    Names of the user's groups, cached since every permission and throttle check needs them.
+    """
+    if not user.is_authenticated:
+        return set()
+
+    cache_key = get_user_groups_cache_key(user.pk)
+    group_names = cache.get(cache_key)
+
+    if group_names is None:
+        # cached for every request of the user, a lagging replica would keep a changed membership out for minutes
+        with read_from_primary():
+            group_names = set(user.groups.values_list('name', flat=True))
+        cache.set(cache_key, group_names, GROUPS_CACHE_TIMEOUT)
+    return group_names
+
+
+def get_group_names():
+    group_names = cache.get(GROUP_NAMES_CACHE_KEY)
+
+    if group_names is None:
+        with read_from_primary():
+            group_names = list(Group.objects.values_list('name', flat=True))
+        cache.set(GROUP_NAMES_CACHE_KEY, group_names, GROUPS_CACHE_TIMEOUT)
+    return group_names
+
+
 class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_superuser)
@@ -25,10 +65,7 @@ class IsAdminOrReadOnlyMixin:
 
 class GroupCheckMixin:
     def check_users_group(self, request, view, group_name):
-        try:
-            return bool(Group.objects.get(name=group_name) in request.user.groups.all()) 
-        except Group.DoesNotExist:
-            return False
+        return group_name in get_user_group_names(request.user)
 
 
 # Other Permission classes that use above mixins
@@ -0,0 +1,44 @@
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField, OuterRef, PositiveIntegerField, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Floor
+from django.utils.timezone import now
+
+from .models import Discount, Product
+
+
+# discounts are fractions of the unit price, anything outside (0, 1] is ignored
+MIN_DISCOUNT = 0
+MAX_DISCOUNT = 1
+
+
+def get_effective_price(unit_price, discounts):
+    """
+    Unit price after the largest valid discount, discounts of a product do not stack.
+    Must give the same result as get_effective_price_expression.
+    """
+    valid_discounts = [discount for discount in discounts if MIN_DISCOUNT < discount <= MAX_DISCOUNT]
+    discount = max(valid_discounts, default=0)
+    # half up rounding, the database rounds the same way
+    return math.floor(unit_price * (1 - discount) + 0.5)
+
+
+def get_effective_price_expression():
+    largest_discount = Discount.objects.filter(
+        product=OuterRef('pk'), discount__gt=MIN_DISCOUNT, discount__lte=MAX_DISCOUNT,
+    ).order_by('-discount').values('discount')[:1]
+
+    discounted_price = ExpressionWrapper(
+        F('unit_price') * (Value(1.0) - Coalesce(Subquery(largest_discount), Value(0.0))) + Value(0.5),
+        output_field=FloatField(),
+    )
+    return Cast(Floor(discounted_price), output_field=PositiveIntegerField())
+
+
+def update_effective_prices(products=None):
+    """
+    Recompute Product.effective_price for the products queryset in one UPDATE, returns the number of rows.
+    Callers invalidate the product caches, the per row signals are skipped.
+    """
+    products = Product.objects.all() if products is None else products
+    return products.update(effective_price=get_effective_price_expression(), datetime_modified=now())
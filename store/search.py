@@ -0,0 +1,97 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+
+from .models import Category, Product
+
+
+# 'simple' keeps the index language agnostic, product names are not always english
+SEARCH_CONFIG = 'simple'
+SQLITE_FTS_TABLE = 'store_product_fts'
+
+
+def get_search_terms(text):
+    # keep only word characters, this also makes the terms safe to embed in tsquery/fts5 syntax
+    return re.findall(r'\w+', text)
+
+
+class PostgresProductSearch:
+    """
+    Search over the Product.search_vector tsvector column (GIN indexed).
+    """
+    def get_search_vector(self):
+        category_title = Subquery(Category.objects.filter(id=OuterRef('category_id')).values('title')[:1])
+
+        return (
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(category_title, weight='B', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+        )
+
+    def index_products(self, queryset):
+        Product.objects.filter(pk__in=queryset.values('pk')).update(search_vector=self.get_search_vector())
+
+    def remove_products(self, queryset):
+        # the vector lives on the product row itself, nothing to clean up
+        pass
+
+    def search(self, queryset, text):
+        terms = get_search_terms(text)
+        if not terms:
+            return queryset.none()
+
+        # prefix matching on every term, 'prod' should still find 'product'
+        raw_query = ' & '.join(f"'{term}':*" for term in terms)
+        query = SearchQuery(raw_query, search_type='raw', config=SEARCH_CONFIG)
+
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+
+
+class SQLiteProductSearch:
+    """
+    FTS5 fallback used by the sqlite test database, rows of store_product_fts share the product id as rowid.
+    """
+    def index_products(self, queryset):
+        ids_sql, ids_params = queryset.values('pk').query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({ids_sql})', ids_params)
+            cursor.execute(
+                f'INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, category_title, description) '
+                f'SELECT p.id, p.name, c.title, p.description FROM store_product p '
+                f'INNER JOIN store_category c ON c.id = p.category_id WHERE p.id IN ({ids_sql})',
+                ids_params,
+            )
+
+    def remove_products(self, queryset):
+        ids_sql, ids_params = queryset.values('pk').query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({ids_sql})', ids_params)
+
+    def search(self, queryset, text):
+        terms = get_search_terms(text)
+        if not terms:
+            return queryset.none()
+
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matched_ids = RawSQL(f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', (match,))
+        # bm25 is lower for better matches
+        rank = RawSQL(
+            f'SELECT -bm25({SQLITE_FTS_TABLE}, 10.0, 4.0, 1.0) FROM {SQLITE_FTS_TABLE} '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = store_product.id',
+            (match,),
+        )
+
+        return queryset.filter(id__in=matched_ids).annotate(search_rank=rank).order_by('-search_rank', '-id')
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresProductSearch()
+    return SQLiteProductSearch()
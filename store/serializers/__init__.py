@@ -1,6 +1,12 @@
 # __init__.py
 
-from .product_serializers import CategorySerializer, CommentSerializer, ProductSerializer
+from .product_serializers import (
+    CategoryProductsSerializer,
+    CategorySerializer,
+    CommentSerializer,
+    ProductBulkUpdateSerializer,
+    ProductSerializer,
+)
 from .wishlist_serializers import WishlistProductSerializer, WishlistSerializer
 from .cart_serializers import (
     ManagerAddItemtoCartSerializer,
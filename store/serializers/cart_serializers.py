@@ -2,7 +2,7 @@ from .imports import *
 
 
 class CartProductSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='product-detail', lookup_field = 'slug')
+    detail = TemplatedHyperlinkedIdentityField(view_name='product-detail', lookup_field = 'slug')
     unit_price = serializers.SerializerMethodField()
 
     class Meta:
@@ -12,7 +12,8 @@ class CartProductSerializer(serializers.ModelSerializer):
     TOMAN_SIGN = 'T'
 
     def get_unit_price(self, obj:Product):
-        return f'{obj.clean_price} {self.TOMAN_SIGN}'
+        # the price the cart totals are computed with
+        return f'{obj.clean_effective_price} {self.TOMAN_SIGN}'
 
 
 # Manager Cart & CartItem Serializer
@@ -57,11 +58,11 @@ class ManagerCartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'current_product_stuck', 'total_price']
 
     def get_current_product_stuck(self, obj:CartItem):
-        invenory = obj.product.inventory
+        invenory = get_available_inventory(obj.product)
         quantity = obj.quantity
         
         if invenory > quantity:
-            return obj.product.inventory - obj.quantity 
+            return invenory - obj.quantity 
         return 'Out of Stuck'
 
     def get_total_price(self, obj:CartItem):
@@ -76,8 +77,8 @@ class ManagerCartItemSerializer(serializers.ModelSerializer):
         return instance
     
 
-class ManagerCartSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='cart-detail', lookup_field='id', read_only=True)
+class ManagerCartSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    detail = TemplatedHyperlinkedIdentityField(view_name='cart-detail', lookup_field='id', read_only=True)
     id = serializers.UUIDField(read_only=True)
     items = ManagerCartItemSerializer(many=True, read_only=True)
     belongs_to = serializers.SerializerMethodField()
@@ -90,8 +91,8 @@ class ManagerCartSerializer(serializers.ModelSerializer):
         return obj.total_price()
     
     def get_belongs_to(self, obj:Cart):
-        if obj.user:
-            return (SITE_URL_HOST + reverse('customuser-detail', kwargs={'id': obj.user.id}))
+        if obj.user_id:
+            return (SITE_URL_HOST + reverse_url('customuser-detail', 'id', obj.user_id))
         return f'anon user | {obj.session_key}'
     
     
@@ -116,11 +117,15 @@ class AddItemtoCartSerializer(serializers.ModelSerializer):
 class CartItemSerializer(serializers.ModelSerializer):
     # detail = serializers.HyperlinkedRelatedField(view_name='cart-items-detail', lookup_field='pk', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
-    current_product_stuck = serializers.IntegerField(source='product.inventory', read_only=True)
+    current_product_stuck = serializers.SerializerMethodField()
+    unit_price = serializers.CharField(source='product.clean_effective_price', read_only=True)
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product_name', 'quantity', 'current_product_stuck', 'total_price']
+        fields = ['id', 'product_name', 'quantity', 'unit_price', 'current_product_stuck', 'total_price']
+
+    def get_current_product_stuck(self, obj:CartItem) -> int:
+        return get_available_inventory(obj.product)
 
     def get_total_price(self, obj):
         return obj.total_price()
@@ -134,8 +139,8 @@ class CartItemSerializer(serializers.ModelSerializer):
         return instance
     
 
-class CartSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='cart-detail', lookup_field='id', read_only=True)
+class CartSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    detail = TemplatedHyperlinkedIdentityField(view_name='cart-detail', lookup_field='id', read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
 
     class Meta:
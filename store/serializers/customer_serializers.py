@@ -16,8 +16,8 @@ class ManagersAddAddressSerializer(serializers.ModelSerializer):
 
 class ManagerAddressSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
-    customer = serializers.HyperlinkedRelatedField(view_name='customer-detail', lookup_field='pk', read_only=True)
-    detail = serializers.HyperlinkedIdentityField(view_name='address-detail', lookup_field='pk')
+    customer = TemplatedHyperlinkedRelatedField(view_name='customer-detail', lookup_field='pk', read_only=True)
+    detail = TemplatedHyperlinkedIdentityField(view_name='address-detail', lookup_field='pk')
 
     class Meta:
         model = Address
@@ -50,7 +50,7 @@ class AddAddressSerializer(serializers.ModelSerializer):
 
 
 class AddressSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='address-detail', lookup_field='pk')
+    detail = TemplatedHyperlinkedIdentityField(view_name='address-detail', lookup_field='pk')
 
     class Meta:
         model = Address
@@ -76,7 +76,7 @@ class ManagerCustomerSerializer(serializers.ModelSerializer):
         return obj.user.username
     
     def get_address_creation_endpoint(self, obj:Customer):
-        search_url = (SITE_URL_HOST + reverse('address-list') + f'?search={obj.user.username}')
+        search_url = (SITE_URL_HOST + reverse_url('address-list') + f'?search={obj.user.username}')
         address = Address.objects.filter(customer=obj)
         
         if address.exists():
@@ -102,7 +102,7 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = ['birth_date', 'address', 'address_info']
     
     def get_address_info(self, obj:Customer):
-        url = (SITE_URL_HOST + reverse('address-list'))
+        url = (SITE_URL_HOST + reverse_url('address-list'))
         address = Address.objects.filter(customer=obj)
 
         if address.exists():
@@ -0,0 +1,108 @@
+import re
+from functools import lru_cache
+
+from django.urls import NoReverseMatch, get_script_prefix, get_urlconf, reverse
+from rest_framework import serializers
+
+from ..images import PRODUCT_IMAGE_RENDITIONS, RENDITION_FORMATS, get_image_renditions
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Absolute urls of the product image renditions per format, the original image stands in until they are generated.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, product):
+        if not product.image:
+            return None
+
+        renditions = get_image_renditions(product)
+        storage = product.image.storage
+        request = self.context.get('request')
+
+        def build_url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            rendition: {
+                extension: build_url(renditions[rendition][extension] if renditions else product.image.name)
+                for extension in RENDITION_FORMATS
+            }
+            for rendition in PRODUCT_IMAGE_RENDITIONS
+        }
+
+
+# stands in for the lookup value while the route is reversed, it has to match every lookup regex of the store urls
+URL_LOOKUP_PLACEHOLDER = '00000000-0000-0000-0000-000000000000'
+# values reverse() would put in the url unquoted
+SAFE_LOOKUP_VALUE = re.compile(r'[-\w]+', re.ASCII)
+
+
+@lru_cache(maxsize=None)
+def _get_url_template(view_name, lookup_url_kwarg, format, script_prefix, urlconf):
+    kwargs = {lookup_url_kwarg: URL_LOOKUP_PLACEHOLDER} if lookup_url_kwarg else {}
+    if format:
+        kwargs['format'] = format
+
+    try:
+        url = reverse(view_name, urlconf, kwargs=kwargs)
+    except NoReverseMatch:
+        return None
+
+    if not lookup_url_kwarg:
+        return url, ''
+    if url.count(URL_LOOKUP_PLACEHOLDER) != 1:
+        return None
+    return tuple(url.split(URL_LOOKUP_PLACEHOLDER))
+
+
+def get_url_template(view_name, lookup_url_kwarg=None, format=None):
+    """
+    Url of the route split around its lookup value as (prefix, suffix), None if the route can not be templated.
+    """
+    # the script prefix and urlconf are part of the key, they can change per request
+    return _get_url_template(view_name, lookup_url_kwarg, format, get_script_prefix(), get_urlconf())
+
+
+def reverse_url(view_name, lookup_url_kwarg=None, lookup_value=None, format=None):
+    """
+    Same url as reverse(view_name, kwargs={lookup_url_kwarg: lookup_value}), the route is resolved
+    once and every later call only fills in the lookup value.
+    """
+    template = get_url_template(view_name, lookup_url_kwarg, format)
+    value = str(lookup_value) if lookup_url_kwarg else ''
+
+    if template is None or (lookup_url_kwarg and not SAFE_LOOKUP_VALUE.fullmatch(value)):
+        kwargs = {lookup_url_kwarg: lookup_value} if lookup_url_kwarg else {}
+        if format:
+            kwargs['format'] = format
+        return reverse(view_name, kwargs=kwargs)
+
+    prefix, suffix = template
+    return prefix + value + suffix
+
+
+class TemplatedHyperlinkMixin:
+    """
+    Builds the urls of hyperlinked fields from the precompiled route template instead of reversing it per row.
+    """
+    def get_url(self, obj, view_name, request, format):
+        # unsaved objects have no url, same as the drf fields
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+
+        url = reverse_url(view_name, self.lookup_url_kwarg, getattr(obj, self.lookup_field), format)
+        return request.build_absolute_uri(url) if request else url
+
+
+class TemplatedHyperlinkedIdentityField(TemplatedHyperlinkMixin, serializers.HyperlinkedIdentityField):
+    pass
+
+
+class TemplatedHyperlinkedRelatedField(TemplatedHyperlinkMixin, serializers.HyperlinkedRelatedField):
+    pass
@@ -2,12 +2,25 @@ from rest_framework import serializers
 from rest_framework.reverse import reverse
 
 from django.db import transaction 
-from django.db.models import Prefetch
+from django.db.models import Case, F, Prefetch, Value, When
 from django.urls import reverse
 from django.utils.text import slugify
+from django.utils.timezone import now
 
 from config.urls import SITE_URL_HOST
 
 
-from ..models import Product, Category, Comment, Cart, CartItem, Customer, Address, Order, OrderItem, Wishlist
+from ..caching import invalidate_products_cache
+from ..fieldsets import SparseFieldsetSerializerMixin
+from ..hot_inventory import flush_before_overwrite, reset_counters
+from ..inventory import RESERVATION_TIMEOUT, InsufficientInventory, get_available_inventory, reserve_inventory
+from ..ledger import record_overwritten_inventories
+from ..pricing import update_effective_prices
+from ..models import Product, Category, Comment, Cart, CartItem, Customer, Address, InventoryMovement, Order, OrderItem, Wishlist
 from ..validations import quantity_validation
+from .fields import (
+    ImageRenditionsField,
+    TemplatedHyperlinkedIdentityField,
+    TemplatedHyperlinkedRelatedField,
+    reverse_url,
+)
@@ -30,7 +30,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return f'{total_price: ,} {self.TOMAN_SIGN}'
     
 
-class ManagerOrderSerializer(serializers.ModelSerializer):
+class ManagerOrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
 
     customer = CustomerOrderSerializer(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
@@ -47,7 +47,7 @@ class ManagerOrderSerializer(serializers.ModelSerializer):
         return f'{total_order_items_price: ,} {self.TOMAN_SIGN}'
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total_items_price = serializers.SerializerMethodField()
 
@@ -77,10 +77,11 @@ class OrderCreationSerializer(serializers.Serializer):
         with transaction.atomic():
             # access cart from the validated data
             cart_id = self.validated_data['cart_uuid']
-            cart_obj = Cart.objects.prefetch_related('items').get(id=cart_id)
+            cart_obj = Cart.objects.prefetch_related('items__product').get(id=cart_id)
             # creating order obj 
             customer = Customer.objects.select_related('user').get(user=self.context['request'].user)
-            order_obj = Order.objects.create(customer=customer)
+            expires_at = now() + RESERVATION_TIMEOUT
+            order_obj = Order.objects.create(customer=customer, expires_at=expires_at)
 
             # create orderitems based on the items in cart that user fill its uuid
                 
@@ -89,12 +90,19 @@ class OrderCreationSerializer(serializers.Serializer):
                     order = order_obj,
                     product = item.product,
                     quantity = item.quantity,
-                    unit_price = item.product.unit_price
+                    # the price the customer saw in the cart, discounts included
+                    unit_price = item.product.effective_price
                 ) for item in cart_obj.items.all()
             ]
 
             OrderItem.objects.bulk_create(order_items)
 
+            # the stock is held until the order is paid or expires, the whole order is rolled back without it
+            try:
+                reserve_inventory(order_obj, [(item.product_id, item.quantity) for item in order_items], expires_at)
+            except InsufficientInventory as e:
+                raise serializers.ValidationError(f'Your order items has not enough stock. | detail: {e.insufficient_products}')
+
             cart_obj.delete()
 
             return order_obj
\ No newline at end of file
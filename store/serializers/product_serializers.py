@@ -15,13 +15,17 @@ class CategoryProductsSerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name = 'category-detail', lookup_field = 'slug')
+    detail = TemplatedHyperlinkedIdentityField(view_name = 'category-detail', lookup_field = 'slug')
     num_of_products = serializers.IntegerField(source='products_count', read_only=True)
-    products = CategoryProductsSerializer(many=True, read_only=True)
+    # top products only, bounded by the prefetch of CategoryViewSet, the full set is served by all_products
+    products = CategoryProductsSerializer(many=True, read_only=True, source='preview_products')
+    all_products = TemplatedHyperlinkedIdentityField(view_name = 'category-products', lookup_field = 'slug')
+    # best seller of the category, maintained by the update_categories_top_product task
+    top_product = CategoryProductsSerializer(read_only=True)
 
     class Meta:
         model = Category
-        fields = ['title', 'description', 'num_of_products', 'detail', 'products']
+        fields = ['title', 'description', 'num_of_products', 'top_product', 'detail', 'products', 'all_products']
 
     # for POST HTTP Method
     def create(self, validated_data):
@@ -55,15 +59,25 @@ class CommentSerializer(serializers.ModelSerializer):
         return self.instance
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='product-detail', lookup_field = 'slug')
-    category = serializers.HyperlinkedRelatedField(queryset=Category.objects.all(), view_name = 'category-detail', lookup_field = 'slug')
-    num_of_comments = serializers.IntegerField(source='comments_count', read_only=True)
-    comments = CommentSerializer(many=True, read_only=True) # Nested serializer for comments
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    detail = TemplatedHyperlinkedIdentityField(view_name='product-detail', lookup_field = 'slug')
+    category = TemplatedHyperlinkedRelatedField(queryset=Category.objects.all(), view_name = 'category-detail', lookup_field = 'slug')
+    num_of_comments = serializers.IntegerField(source='approved_comments_count', read_only=True)
+    # latest approved comments, bounded by the prefetch of ProductViewSet on ?expand=comments
+    comments = CommentSerializer(many=True, read_only=True, source='latest_comments')
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Product
-        fields = ['name', 'unit_price', 'category', 'inventory', 'num_of_comments', 'detail', 'image', 'comments']
+        fields = ['name', 'unit_price', 'effective_price', 'category', 'inventory', 'num_of_comments', 'detail', 'image', 'image_renditions', 'comments']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+
+        # comments are opt-in, the full list is served by CommentViewSet
+        if not self.context.get('expand_comments'):
+            fields.pop('comments', None)
+        return fields
     
     def create(self, validated_data):
         product = Product(**validated_data)
@@ -80,4 +94,65 @@ class ProductSerializer(serializers.ModelSerializer):
         instance.slug = slugify(instance.name)
         instance.save()
 
-        return instance
\ No newline at end of file
+        return instance
+
+class ProductChangeSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    unit_price = serializers.IntegerField(min_value=0, required=False)
+    inventory = serializers.IntegerField(min_value=0, required=False)
+    activation = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError('At least one of unit_price, inventory or activation is required.')
+        return attrs
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    BULK_FIELDS = ['unit_price', 'inventory', 'activation']
+
+    products = ProductChangeSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_products(self, products):
+        slugs = [change['slug'] for change in products]
+        if len(set(slugs)) != len(slugs):
+            raise serializers.ValidationError('Every product can be changed only once per request.')
+
+        missing_slugs = set(slugs) - set(Product.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        if missing_slugs:
+            raise serializers.ValidationError(f'Products not found: {sorted(missing_slugs)}')
+        return products
+
+    def save(self):
+        changes = self.validated_data['products']
+        slugs = [change['slug'] for change in changes]
+
+        # one UPDATE for the whole request, every column picks its new value per row with CASE WHEN slug = ...
+        updates = {}
+        for field_name in self.BULK_FIELDS:
+            whens = [When(slug=change['slug'], then=Value(change[field_name])) for change in changes if field_name in change]
+            if whens:
+                updates[field_name] = Case(*whens, default=F(field_name), output_field=Product._meta.get_field(field_name))
+
+        inventories = {change['slug']: change['inventory'] for change in changes if 'inventory' in change}
+        hot_product_ids = flush_before_overwrite(Product.objects.filter(slug__in=inventories))
+
+        with transaction.atomic():
+            previous_inventories = list(
+                Product.objects.select_for_update().filter(slug__in=inventories).order_by('pk').values_list('pk', 'slug', 'inventory')
+            )
+            updated_count = Product.objects.filter(slug__in=slugs).update(**updates, datetime_modified=now())
+            # the new values overwrite the whole stock, the ledger records the differences
+            record_overwritten_inventories(
+                {pk: inventory for pk, _, inventory in previous_inventories},
+                {pk: inventories[slug] for pk, slug, _ in previous_inventories},
+                InventoryMovement.REASON_BULK_UPDATE,
+            )
+            if 'unit_price' in updates:
+                update_effective_prices(Product.objects.filter(slug__in=slugs))
+            # signals are skipped, invalidate once after the changes are visible to other requests
+            transaction.on_commit(lambda: invalidate_products_cache(slugs))
+            # the next reader starts the counters from the new inventories
+            transaction.on_commit(lambda: reset_counters(hot_product_ids))
+
+        return updated_count
@@ -2,16 +2,17 @@ from .imports import *
 
 
 class WishlistProductSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='product-detail', lookup_field='slug')
+    detail = TemplatedHyperlinkedIdentityField(view_name='product-detail', lookup_field='slug')
     # wishlist_detail = serializers.HyperlinkedIdentityField(view_name='wishlist-products-detail', lookup_field='id')
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Product
-        fields = ['detail', 'id', 'name', 'unit_price', 'inventory', 'image']
+        fields = ['detail', 'id', 'name', 'unit_price', 'inventory', 'image', 'image_renditions']
 
 
-class WishlistSerializer(serializers.ModelSerializer):
-    detail = serializers.HyperlinkedIdentityField(view_name='wishlist-detail', lookup_field='id')
+class WishlistSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    detail = TemplatedHyperlinkedIdentityField(view_name='wishlist-detail', lookup_field='id')
     products = WishlistProductSerializer(many=True ,read_only=True)
 
     class Meta:
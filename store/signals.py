@@ -1,17 +1,25 @@
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models import ProtectedError
-from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.db.models import F, ProtectedError
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
+from django.utils.timezone import now
 
-from config.utils import delete_decorative_cache
+from config.utils import bump_cache_generation, expire_cache_softly
 
-from .models import Customer, OrderItem, Order, Product
-from .tasks import update_inventory
-
-from celery import group
+from .caching import get_product_detail_cache_key, invalidate_products_cache
+from .hot_inventory import is_hot_inventory_enabled, reset_counters
+from .inventory import release_reservations
+from .ledger import append_movements, compact_movements, record_compacted_movements
+from .permissions import GROUP_NAMES_CACHE_KEY, get_user_groups_cache_key
+from .pricing import get_effective_price, update_effective_prices
+from .models import Category, Comment, Customer, Discount, InventoryMovement, OrderItem, Order, Product
+from .search import get_search_backend
+from .tasks import generate_product_image_renditions
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -26,13 +34,45 @@ def create_customer_instance_for_newly_signed_up_users(sender, instance, created
                 [order.delete() for order in Order.objects.filter(customer__user=instance)]
 
 
+# Group membership cache handlers signals
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def delete_user_groups_cache_after_changing_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = instance.user_set.values_list('id', flat=True)
+    else:
+        user_ids = pk_set
+
+    cache.delete_many([get_user_groups_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_groups_cache_after_changing_user(sender, instance, **kwargs):
+    # a new user must never see the memberships cached for a deleted user with the same id
+    cache.delete(get_user_groups_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def delete_groups_cache_after_changing_group(sender, instance, **kwargs):
+    user_ids = instance.user_set.values_list('id', flat=True)
+    cache.delete_many([GROUP_NAMES_CACHE_KEY, *(get_user_groups_cache_key(user_id) for user_id in user_ids)])
+
+
 # Product cach handlers singals
 @receiver(pre_save, sender=Product)
 def delete_products_cache_before_saving_instance(sender, instance, **kwargs):
-    detail_cache_key = instance.slug
+    detail_cache_key = get_product_detail_cache_key(instance.slug)
 
-    cache.delete(detail_cache_key)
-    delete_decorative_cache('product_list')
+    # the next reader rebuilds the entry, concurrent readers get the previous payload meanwhile
+    expire_cache_softly(detail_cache_key)
+    bump_cache_generation('product_list')
+    bump_cache_generation('category_list')
 
     # this line make sure after caching is handled the slug is up to date 
     instance.slug = slugify(instance.name)
@@ -40,7 +80,178 @@ def delete_products_cache_before_saving_instance(sender, instance, **kwargs):
 
 @receiver(pre_delete, sender=Product)
 def delete_products_cache_before_instance_deletion(sender, instance, **kwargs):
-    detail_cache_key = instance.slug
+    detail_cache_key = get_product_detail_cache_key(instance.slug)
 
     cache.delete(detail_cache_key)
-    delete_decorative_cache('product_list')
+    bump_cache_generation('product_list')
+    bump_cache_generation('category_list')
+
+    get_search_backend().remove_products(Product.objects.filter(pk=instance.pk))
+
+
+# Category cache handlers signals
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def delete_categories_cache_after_changing_instance(sender, instance, **kwargs):
+    bump_cache_generation('category_list')
+    # product payloads link to the category slug
+    bump_cache_generation('product_list')
+
+
+# Product effective price signals
+@receiver(pre_save, sender=Product)
+def update_product_effective_price(sender, instance, **kwargs):
+    # the price may still be the raw value the instance was built with
+    unit_price = sender._meta.get_field('unit_price').to_python(instance.unit_price)
+    if unit_price is None:
+        return
+
+    # a new product has no discounts yet, they are added after it is saved
+    discounts = [] if instance._state.adding else instance.discounts.values_list('discount', flat=True)
+    instance.effective_price = get_effective_price(unit_price, discounts)
+
+
+def update_products_effective_price(product_ids):
+    products = Product.objects.filter(pk__in=product_ids)
+
+    if update_effective_prices(products):
+        invalidate_products_cache(list(products.values_list('slug', flat=True)))
+
+
+@receiver(m2m_changed, sender=Product.discounts.through)
+def update_effective_price_after_changing_discounts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # the products of the discount are unknown once the rows are gone
+        instance._cleared_product_ids = list(instance.product_set.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = getattr(instance, '_cleared_product_ids', [])
+    else:
+        product_ids = pk_set
+
+    update_products_effective_price(product_ids)
+
+
+@receiver(post_save, sender=Discount)
+def update_effective_price_after_saving_discount(sender, instance, created, **kwargs):
+    if not created:
+        update_products_effective_price(instance.product_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Discount)
+def remember_discount_products(sender, instance, **kwargs):
+    instance._product_ids = list(instance.product_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Discount)
+def update_effective_price_after_discount_deletion(sender, instance, **kwargs):
+    update_products_effective_price(getattr(instance, '_product_ids', []))
+
+
+# Product image renditions signals
+@receiver(pre_save, sender=Product)
+def detect_product_image_upload(sender, instance, **kwargs):
+    # the file of a new upload is written to the storage while the instance is saved
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_renditions_after_upload(sender, instance, **kwargs):
+    if getattr(instance, '_image_uploaded', False):
+        product_id, image_name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: generate_product_image_renditions.delay(product_id, image_name))
+
+
+# Hot inventory signals
+@receiver(post_save, sender=Product)
+def reset_hot_inventory_counter_after_saving_product(sender, instance, **kwargs):
+    # a manual edit changes the stock in the database, the redis counter starts again from it
+    if instance.hot_inventory and is_hot_inventory_enabled():
+        product_id = instance.pk
+        transaction.on_commit(lambda: reset_counters([product_id]))
+
+
+# Inventory ledger signals
+@receiver(post_save, sender=Product)
+def record_inventory_movement_after_saving_product(sender, instance, created, update_fields, **kwargs):
+    previous_inventory = getattr(instance, '_loaded_inventory', None)
+
+    if created:
+        # the new row holds its inventory as the first compacted snapshot
+        record_compacted_movements({instance.pk: instance.inventory}, InventoryMovement.REASON_INITIAL)
+    elif previous_inventory is not None and instance.inventory != previous_inventory:
+        deltas = {instance.pk: instance.inventory - previous_inventory}
+
+        if update_fields and 'inventory' in update_fields:
+            # written to the column by an explicit update_fields
+            record_compacted_movements(deltas, InventoryMovement.REASON_MANUAL_EDIT)
+        else:
+            # the save left the column alone, concurrent movements are kept and the edit is folded in right away
+            append_movements(deltas, InventoryMovement.REASON_MANUAL_EDIT)
+            compact_movements([instance.pk])
+
+    instance._loaded_inventory = instance.inventory
+
+
+# Product search index signals
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, **kwargs):
+    get_search_backend().index_products(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def update_category_products_search_index(sender, instance, created, **kwargs):
+    # category title is part of the indexed document of its products
+    if not created:
+        get_search_backend().index_products(Product.objects.filter(category=instance))
+
+
+# Product approved comments counter signals
+def update_approved_comments_count(product_id, amount):
+    products = Product.objects.filter(pk=product_id)
+
+    # never let a missed signal push the counter below zero
+    if amount < 0:
+        products = products.filter(approved_comments_count__gte=-amount)
+
+    # the counter is part of the product payload, conditional requests and caches must see the change
+    if products.update(approved_comments_count=F('approved_comments_count') + amount, datetime_modified=now()):
+        product_slug = Product.objects.filter(pk=product_id).values_list('slug', flat=True).get()
+        expire_cache_softly(get_product_detail_cache_key(product_slug))
+        bump_cache_generation('product_list')
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_previous_state(sender, instance, **kwargs):
+    instance._previous_state = None
+
+    if instance.pk:
+        instance._previous_state = Comment.objects.filter(pk=instance.pk).values_list('status', 'product_id').first()
+
+
+@receiver(post_save, sender=Comment)
+def update_approved_comments_count_after_saving_comment(sender, instance, **kwargs):
+    previous_state = getattr(instance, '_previous_state', None)
+
+    if previous_state and previous_state[0] == Comment.COMMENT_STATUS_APPROVED:
+        update_approved_comments_count(previous_state[1], -1)
+
+    if instance.status == Comment.COMMENT_STATUS_APPROVED:
+        update_approved_comments_count(instance.product_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_approved_comments_count_after_comment_deletion(sender, instance, **kwargs):
+    if instance.status == Comment.COMMENT_STATUS_APPROVED:
+        update_approved_comments_count(instance.product_id, -1)
+
+
+# Stock reservation signals
+@receiver(pre_delete, sender=Order)
+def release_order_reservations_before_deletion(sender, instance, **kwargs):
+    # the cascade would drop the reservations without giving their stock back
+    release_reservations(instance.reservations.all())
@@ -1,10 +1,27 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError, transaction
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
 from django.utils.timezone import now
 
 from celery import shared_task
 
-from .models import Order, Product, Cart, CartItem
+from config.utils import bump_cache_generation
+
+from .caching import invalidate_products_cache
+from .hot_inventory import flush_pending_deltas, release_expired_holds
+from .ledger import compact_movements
+from .images import generate_image_renditions
+from .inventory import (
+    InsufficientInventory,
+    adjust_inventory,
+    commit_reservations,
+    deduct_available_inventory,
+    get_inventory_deltas,
+    release_reservations,
+)
+from .models import Category, InventoryMovement, Order, OrderItem, Product, Cart, CartItem, StockReservation
 
 
 CELERY_MESSAGES = {
@@ -12,17 +29,41 @@ CELERY_MESSAGES = {
     'warning': 'Warning:',
 }
 
+# sales of paid orders created in this window decide the top product of a category
+TOP_PRODUCT_SALES_WINDOW = timedelta(days=30)
+
 @shared_task(bind=True)
 def approve_order_status_after_successful_payment(self, order_id):
     try:
-        order_obj = Order.objects.get(id=order_id)
+        category_ids = None
+        oversold_products = None
+
+        with transaction.atomic():
+            # locked, a retried or duplicated task must not deduct the inventory twice
+            order_obj = Order.objects.select_for_update().get(id=order_id)
+
+            # this if statement ensures that order wont save multiple times due to some unexcepted error
+            if order_obj.status != 'paid':
+                order_obj.status = 'paid'
+                order_obj.expires_at = None
+                order_obj.save()
+
+                # the reserved stock becomes a permanent deduction of the inventory, items whose reservation
+                # was released by an expiry before the payment come from the available stock. The order is paid
+                # either way, products short of stock give what they have and are reported as oversold
+                unreserved_items = commit_reservations(order_obj)
+                oversold_products = deduct_available_inventory(
+                    get_inventory_deltas(unreserved_items, reduce=True), InventoryMovement.REASON_SALE, order_obj,
+                )
 
-        # this if statement ensures that order wont save multiple times due to some unexcepted error
-        if order_obj.status != 'paid':
-            order_obj.status = 'paid'
-            order_obj.expires_at = None
-            order_obj.save()
+                # only the categories of the sold products can get a new top product
+                category_ids = list(order_obj.items.values_list('product__category_id', flat=True).distinct())
 
+        if category_ids is not None:
+            update_categories_top_product.delay(category_ids)
+
+        if oversold_products:
+            return f"{CELERY_MESSAGES['warning']} order {order_id} approved but oversold | {oversold_products}"
         return f"{CELERY_MESSAGES['successful']} order {order_id} for {order_obj.customer.user.username} approved."
     
     except Exception as exc:
@@ -30,31 +71,90 @@ def approve_order_status_after_successful_payment(self, order_id):
 
 
 @shared_task()
-def update_inventory(product_id:int, quantity:int, reduce: bool):
-    try:
-        product = Product.objects.get(id=product_id)
-
-        if reduce:
-            product.inventory -= quantity
-            keyword = 'reduced'
-        else:
-            product.inventory += quantity
-            keyword = 'added'
-        
-        product.save()
+def update_categories_top_product(category_ids: list = None):
+    """
+    Store the best selling product of each category over TOP_PRODUCT_SALES_WINDOW in Category.top_product,
+    runs periodically for every category and after a payment for the categories of the paid order.
+    """
+    paid_sales = OrderItem.objects.filter(
+        order__status=Order.ORDER_STATUS_PAID,
+        order__datetime_created__gte=now() - TOP_PRODUCT_SALES_WINDOW,
+    )
+    best_seller = paid_sales.filter(product__category=OuterRef('pk')) \
+        .values('product_id').annotate(sold=Sum('quantity')).order_by('-sold', 'product_id').values('product_id')[:1]
+
+    categories = Category.objects.annotate(best_seller_id=Subquery(best_seller)).only('id', 'top_product')
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+
+    changed_categories = []
+    for category in categories:
+        if category.top_product_id != category.best_seller_id:
+            category.top_product_id = category.best_seller_id
+            category.datetime_modified = now()
+            changed_categories.append(category)
+
+    if changed_categories:
+        Category.objects.bulk_update(changed_categories, ['top_product', 'datetime_modified'])
+        # bulk_update skips the category signals
+        bump_cache_generation('category_list')
+
+    return f"{CELERY_MESSAGES['successful']} Top product changed for {len(changed_categories)} categories"
 
-        return f"{CELERY_MESSAGES['successful']} Inventory {keyword} for {product.name} | Current Inventory: {product.inventory} | Amount: {quantity}"
-    
-    except IntegrityError as e:
-        error_msg = f"{CELERY_MESSAGES['warning']} Failed to update inventory for product {product.name} and the amount of {quantity} | {str(e)}"
-        return error_msg
+
+@shared_task()
+def generate_product_image_renditions(product_id: int, image_name: str):
+    products = Product.objects.filter(pk=product_id, image=image_name)
+
+    # the image has been replaced or removed since the upload, a newer task handles it
+    if not products.exists():
+        return f"{CELERY_MESSAGES['warning']} Image {image_name} of product {product_id} is not current anymore"
     
-    except Exception as e:
-        return f"{CELERY_MESSAGES['warning']} Failed to update inventory due to {e}"
+    renditions = generate_image_renditions(Product._meta.get_field('image').storage, image_name)
+
+    # the conditional GET validators of the product views are built from datetime_modified
+    if products.update(image_renditions=renditions, datetime_modified=now()):
+        invalidate_products_cache(list(products.values_list('slug', flat=True)))
+
+    return f"{CELERY_MESSAGES['successful']} Renditions generated for {image_name}"
+
+
+@shared_task()
+def update_order_inventory(order_items: list, reduce: bool):
+    """
+    Apply the [product_id, quantity] pairs of an order to the inventory at once, the pairs are passed in
+    because a deleted order has no items left when the task runs.
+    """
+    try:
+        reason = InventoryMovement.REASON_SALE if reduce else InventoryMovement.REASON_RESTOCK
+        updated_count = adjust_inventory(get_inventory_deltas(order_items, reduce), reason)
+    except InsufficientInventory as e:
+        return f"{CELERY_MESSAGES['warning']} Failed to update inventory, nothing changed | {e.insufficient_products}"
+
+    keyword = 'reduced' if reduce else 'added'
+    return f"{CELERY_MESSAGES['successful']} Inventory {keyword} for {updated_count} products"
+
+
+@shared_task()
+def flush_hot_inventory():
+    # runs every few seconds, the net changes of the hot products since the last run go to the database at once
+    released_count = release_expired_holds()
+    updated_count = flush_pending_deltas()
+    return f"{CELERY_MESSAGES['successful']} Flushed hot inventory of {updated_count} products, released {released_count} expired holds"
+
+
+@shared_task()
+def compact_inventory_movements():
+    # the stock is the same before and after, only the pending movements summed by every stock read get shorter
+    compacted_count = compact_movements()
+    return f"{CELERY_MESSAGES['successful']} Compacted inventory movements of {compacted_count} products"
 
 
 @shared_task()
 def remove_expired_orders():
+    # expired reservations go back to the available stock in bulk, deleting the orders then finds nothing to release
+    release_reservations(StockReservation.objects.filter(expires_at__lt=now()))
+
     expired_orders = Order.objects.filter(expires_at__lt=now()).exclude(status='paid')
     list_of_expired_orders = list(expired_orders)
     expired_orders.delete()
@@ -0,0 +1,126 @@
+import time
+import uuid
+from unittest.mock import PropertyMock, patch
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django_redis.cache import RedisCache
+
+from config.cache_backends import _MISSING, LocalCacheTier, TwoTierRedisCache
+from config.utils import expire_cache_softly
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+class LocalCacheTierTests(SimpleTestCase):
+    def test_least_recently_used_entry_evicted(self):
+        tier = LocalCacheTier(max_entries=2, timeout=5)
+        tier.set('a', 1)
+        tier.set('b', 2)
+        tier.get('a')
+        tier.set('c', 3)
+
+        self.assertEqual((tier.get('a'), tier.get('b'), tier.get('c')), (1, _MISSING, 3))
+
+    def test_entry_expires(self):
+        tier = LocalCacheTier(max_entries=2, timeout=5)
+        tier.set('a', 1)
+
+        with patch('config.cache_backends.time.monotonic', return_value=time.monotonic() + 6):
+            self.assertIs(tier.get('a'), _MISSING)
+
+
+class TwoTierRedisCacheTests(SimpleTestCase):
+    def create_cache(self, **options):
+        # the redis of the test settings, with the local tier in front of it
+        params = dict(settings.CACHES['default'])
+        params['OPTIONS'] = {**params.get('OPTIONS', {}), **options}
+        return TwoTierRedisCache(params['LOCATION'], params)
+
+    def setUp(self):
+        # a channel per test gives every test its own local tier and subscriber
+        self.channel = f'cache_invalidation_test:{uuid.uuid4().hex}'
+        self.cache = self.create_cache(
+            LOCAL_CACHE_KEY_PREFIXES=['product:'], LOCAL_CACHE_MAX_ENTRIES=2, LOCAL_CACHE_CHANNEL=self.channel,
+        )
+        self.tier = self.cache.local_tier
+        # the subscriber clears the tier once it is subscribed
+        redis_client = self.cache.client.get_client(write=True)
+        wait_until(lambda: redis_client.pubsub_numsub(self.channel)[0][1] > 0)
+
+        self.other_cache = self.create_cache(LOCAL_CACHE_KEY_PREFIXES=['product:'], LOCAL_CACHE_CHANNEL=self.channel)
+        self.other_tier = LocalCacheTier(max_entries=2, timeout=5)
+        self.addCleanup(self.cache.delete_many, ['product:a', 'product:b', 'product:c', 'product:counter'])
+
+    def is_local(self, key):
+        return self.tier.get(self.cache.make_key(key)) is not _MISSING
+
+    def as_other_process(self):
+        # the local tier of a process is shared by its cache instances, the writes come from a tier of their own
+        return patch.object(TwoTierRedisCache, 'local_tier', new_callable=PropertyMock, return_value=self.other_tier)
+
+    def test_local_hit_avoids_redis(self):
+        self.cache.set('product:a', 1)
+        self.assertEqual(self.cache.get('product:a'), 1)
+
+        with patch.object(RedisCache, 'get', side_effect=AssertionError('redis read')):
+            self.assertEqual(self.cache.get('product:a'), 1)
+
+    def test_local_entries_bounded(self):
+        for key in ['product:a', 'product:b', 'product:c']:
+            self.cache.set(key, 1)
+            self.cache.get(key)
+
+        self.assertEqual([self.is_local(key) for key in ['product:a', 'product:b', 'product:c']], [False, True, True])
+
+    def test_writes_of_other_processes_drop_local_copy(self):
+        self.cache.set('product:a', 1)
+        self.cache.set('product:counter', 1)
+        writes = [
+            ('product:a', lambda: self.other_cache.set('product:a', 2)),
+            ('product:counter', lambda: self.other_cache.incr('product:counter')),
+            ('product:a', lambda: self.other_cache.delete('product:a')),
+        ]
+
+        for key, write in writes:
+            self.cache.get(key)
+            self.assertTrue(self.is_local(key))
+
+            with self.as_other_process():
+                write()
+            wait_until(lambda: not self.is_local(key))
+
+        self.assertEqual((self.cache.get('product:a'), self.cache.get('product:counter')), (None, 2))
+
+    def test_clear_and_delete_pattern_clear_every_tier(self):
+        self.cache.set('product:a', 1)
+        self.cache.get('product:a')
+
+        with self.as_other_process():
+            self.other_cache.delete_pattern('product:*')
+        wait_until(lambda: not self.is_local('product:a'))
+
+        self.cache.set('product:b', 1)
+        self.cache.get('product:b')
+        self.other_tier.set(self.cache.make_key('product:b'), 1)
+
+        with self.as_other_process():
+            self.other_cache.clear()
+        self.assertIs(self.other_tier.get(self.cache.make_key('product:b')), _MISSING)
+        wait_until(lambda: not self.is_local('product:b'))
+
+    def test_soft_expiry_keeps_redis_value(self):
+        self.cache.set('product:a', (time.time() + 60, 'old'))
+        self.cache.get('product:a')
+        # written by another process whose invalidation has not arrived yet
+        RedisCache.set(self.cache, 'product:a', (time.time() + 60, 'new'))
+
+        with patch('config.utils.cache', self.cache):
+            expire_cache_softly('product:a')
+        self.assertEqual(self.cache.get_shared('product:a'), (0, 'new'))
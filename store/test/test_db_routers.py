@@ -0,0 +1,119 @@
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from config.db_routers import ReplicaRoutingMiddleware, get_primary_pin_cache_key, read_from_primary
+
+from ..models import Category, Product
+
+
+def read_alias_view(request):
+    return HttpResponse(Product.objects.all().db)
+
+
+def primary_read_alias_view(request):
+    with read_from_primary():
+        return HttpResponse(Product.objects.all().db)
+
+
+def write_then_read_alias_view(request):
+    Category.objects.create(title='category', slug='category')
+    return HttpResponse(Product.objects.all().db)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_PIN_TIMEOUT=10)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.request_factory = RequestFactory()
+        # pins live in the shared cache, every test is a different client
+        self.auth_header = {'HTTP_AUTHORIZATION': f'JWT {self.id()}'}
+
+    def get_read_alias(self, method='get', view=read_alias_view, **headers):
+        request = getattr(self.request_factory, method)('/', **headers)
+        return ReplicaRoutingMiddleware(view)(request).content.decode()
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.get_read_alias(**self.auth_header), 'replica')
+        self.assertEqual(self.get_read_alias('post', **self.auth_header), 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_client_pinned_to_primary_after_write(self):
+        self.get_read_alias('post', **self.auth_header)
+
+        self.assertEqual(self.get_read_alias(**self.auth_header), 'default')
+        # other clients are not affected
+        self.assertEqual(self.get_read_alias(HTTP_AUTHORIZATION=f'JWT {self.id()}-other'), 'replica')
+
+    def test_reads_after_write_in_same_request_use_primary(self):
+        self.assertEqual(self.get_read_alias(view=write_then_read_alias_view), 'default')
+
+    def test_cache_fills_read_from_primary(self):
+        self.assertEqual(self.get_read_alias(view=primary_read_alias_view, **self.auth_header), 'default')
+
+    def test_no_pins_without_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.get_read_alias('post', **self.auth_header), 'default')
+        self.assertIsNone(cache.get(get_primary_pin_cache_key(self.request_factory.get('/', **self.auth_header))))
+
+    async def test_async_requests_share_the_primary_pin(self):
+        async def async_read_alias_view(request):
+            return HttpResponse(Product.objects.all().db)
+
+        middleware = ReplicaRoutingMiddleware(async_read_alias_view)
+        response = await middleware(self.request_factory.get('/', **self.auth_header))
+        self.assertEqual(response.content.decode(), 'replica')
+
+        # pinned by a write of the sync side
+        await sync_to_async(self.get_read_alias)('post', **self.auth_header)
+        response = await middleware(self.request_factory.get('/', **self.auth_header))
+        self.assertEqual(response.content.decode(), 'default')
+
+
+# e.g. the replica alias of config.test_settings
+REPLICA_ALIAS = next((alias for alias in settings.DATABASES if alias != 'default'), None)
+
+
+@skipUnless(REPLICA_ALIAS, 'no replica database configured')
+class ReplicaReadsTests(TransactionTestCase):
+    # replicas are test mirrors of the primary, e.g. two sqlite databases with TEST = {'MIRROR': 'default'},
+    # rows must be committed to be visible through the replica connection
+    databases = '__all__'
+
+    def setUp(self):
+        Group.objects.bulk_create([Group(name='Product Manager'), Group(name='Content Manager')])
+        category = Category.objects.create(title='category', slug='category')
+        self.product = Product.objects.create(name='product', category=category, slug='product', unit_price=100, inventory=1)
+        cache.clear()
+
+    def get(self, url):
+        with override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS]), CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica_queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [query['sql'] for query in replica_queries]
+
+    def test_comment_list_served_from_replica(self):
+        _, replica_queries = self.get(reverse('product-comments-list', kwargs={'product_slug': self.product.slug}))
+        self.assertTrue(any('store_comment' in query for query in replica_queries))
+
+    def test_cached_product_reads_filled_from_primary(self):
+        # only the validators of conditional requests may still read the replica, never the cached payloads
+        response, replica_queries = self.get(reverse('product-list'))
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(any('"store_product"."name"' in query for query in replica_queries))
+
+        response, replica_queries = self.get(reverse('product-detail', kwargs={'slug': self.product.slug}))
+        self.assertEqual(response.data['name'], 'product')
+        self.assertFalse(any('"store_product"."name"' in query for query in replica_queries))
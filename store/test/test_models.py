@@ -0,0 +1,590 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from PIL import Image
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from ..caching import get_product_detail_cache_key
+from ..hot_inventory import PROCESSING_KEY, get_available_key, get_client, release_expired_holds
+from ..importers import ProductImporter
+from ..inventory import (
+    RESERVATION_TIMEOUT,
+    InsufficientInventory,
+    adjust_inventory,
+    clear_inventory,
+    get_available_inventory,
+    release_reservations,
+    reserve_inventory,
+)
+from ..ledger import append_movements, get_stock, prefetch_stock
+from ..models import Cart, CartItem, Category, Comment, Discount, InventoryMovement, Order, OrderItem, Product, StockReservation
+from ..permissions import get_user_group_names
+from ..pricing import get_effective_price, update_effective_prices
+from ..serializers.cart_serializers import CartItemSerializer, CartProductSerializer
+from ..serializers.product_serializers import ProductBulkUpdateSerializer
+from ..serializers.fields import ImageRenditionsField
+from ..tasks import (
+    approve_order_status_after_successful_payment,
+    compact_inventory_movements,
+    flush_hot_inventory,
+    generate_product_image_renditions,
+    remove_expired_orders,
+    update_categories_top_product,
+    update_order_inventory,
+)
+
+
+class ProductApprovedCommentsCountTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(
+            name = 'product',
+            category = self.category_obj,
+            slug = 'product',
+            unit_price = '100000',
+            inventory = 10,
+        )
+
+    def create_comment(self, status):
+        return Comment.objects.create(product=self.product_obj, name='comment', body='random text', status=status)
+
+    def get_approved_comments_count(self):
+        self.product_obj.refresh_from_db()
+        return self.product_obj.approved_comments_count
+
+    # Test Cases
+    def test_counter_follows_comment_creation(self):
+        self.create_comment(Comment.COMMENT_STATUS_APPROVED)
+        self.create_comment(Comment.COMMENT_STATUS_WAITING)
+
+        self.assertEqual(self.get_approved_comments_count(), 1)
+
+    def test_counter_follows_comment_status_change(self):
+        comment = self.create_comment(Comment.COMMENT_STATUS_WAITING)
+
+        comment.status = Comment.COMMENT_STATUS_APPROVED
+        comment.save()
+        self.assertEqual(self.get_approved_comments_count(), 1)
+
+        comment.status = Comment.COMMENT_STATUS_NOT_APPROVED
+        comment.save()
+        self.assertEqual(self.get_approved_comments_count(), 0)
+
+    def test_counter_follows_comment_deletion(self):
+        comment = self.create_comment(Comment.COMMENT_STATUS_APPROVED)
+
+        comment.delete()
+        self.assertEqual(self.get_approved_comments_count(), 0)
+
+    def test_product_save_does_not_overwrite_counter(self):
+        stale_product = Product.objects.get(pk=self.product_obj.pk)
+        self.create_comment(Comment.COMMENT_STATUS_APPROVED)
+
+        stale_product.unit_price = 90000
+        stale_product.save()
+        self.assertEqual(self.get_approved_comments_count(), 1)
+
+    def test_recompute_comments_count_command(self):
+        self.create_comment(Comment.COMMENT_STATUS_APPROVED)
+        self.create_comment(Comment.COMMENT_STATUS_APPROVED)
+        # queryset updates bypass the signals
+        Comment.objects.update(status=Comment.COMMENT_STATUS_WAITING)
+        Product.objects.update(approved_comments_count=5)
+
+        modified_at = Product.objects.get(pk=self.product_obj.pk).datetime_modified
+        cache.set(get_product_detail_cache_key(self.product_obj.slug), 'stale payload')
+
+        call_command('recompute_comments_count', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.get_approved_comments_count(), 0)
+        # the validators and caches of the product views see the repaired counter
+        self.assertGreater(self.product_obj.datetime_modified, modified_at)
+        self.assertIsNone(cache.get(get_product_detail_cache_key(self.product_obj.slug)))
+
+
+class UserGroupNamesCacheTests(TestCase):
+    def setUp(self):
+        self.user_obj = get_user_model().objects.create_user(username='user', password='password')
+        self.group_obj = Group.objects.create(name='Product Manager')
+
+    def test_cache_follows_membership_changes(self):
+        self.assertEqual(get_user_group_names(self.user_obj), set())
+
+        self.user_obj.groups.add(self.group_obj)
+        self.assertEqual(get_user_group_names(self.user_obj), {'Product Manager'})
+
+        self.group_obj.user_set.clear()
+        self.assertEqual(get_user_group_names(self.user_obj), set())
+
+    def test_cache_follows_group_rename(self):
+        self.user_obj.groups.add(self.group_obj)
+        get_user_group_names(self.user_obj)
+
+        self.group_obj.name = 'Content Manager'
+        self.group_obj.save()
+        self.assertEqual(get_user_group_names(self.user_obj), {'Content Manager'})
+
+
+class CategoryTopProductTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_1 = Product.objects.create(name='product1', category=self.category_obj, slug='product1', unit_price=1000, inventory=100)
+        self.product_2 = Product.objects.create(name='product2', category=self.category_obj, slug='product2', unit_price=1000, inventory=100)
+        self.customer_obj = get_user_model().objects.create_user(username='user', password='password').customer
+
+    def create_order(self, status, quantities):
+        order = Order.objects.create(customer=self.customer_obj, status=status)
+        for product, quantity in quantities.items():
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=product.unit_price)
+        return order
+
+    def get_top_product(self):
+        self.category_obj.refresh_from_db()
+        return self.category_obj.top_product
+
+    def test_top_product_counts_paid_sales_in_window(self):
+        self.create_order(Order.ORDER_STATUS_PAID, {self.product_1: 2, self.product_2: 1})
+        self.create_order(Order.ORDER_STATUS_UNPAID, {self.product_2: 10})
+        old_order = self.create_order(Order.ORDER_STATUS_PAID, {self.product_2: 10})
+        Order.objects.filter(pk=old_order.pk).update(datetime_created=now() - timedelta(days=60))
+
+        update_categories_top_product()
+        self.assertEqual(self.get_top_product(), self.product_1)
+
+    def test_top_product_updated_after_payment(self):
+        self.create_order(Order.ORDER_STATUS_PAID, {self.product_1: 2})
+        update_categories_top_product()
+
+        order = self.create_order(Order.ORDER_STATUS_UNPAID, {self.product_2: 5})
+        # the payment task queues the update, run it inline whatever CELERY_TASK_ALWAYS_EAGER is
+        with patch.object(update_categories_top_product, 'delay', side_effect=update_categories_top_product) as delay:
+            approve_order_status_after_successful_payment(order.id)
+        delay.assert_called_once_with([self.category_obj.id])
+        self.assertEqual(self.get_top_product(), self.product_2)
+
+
+class ProductImageRenditionsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(
+            name = 'product',
+            category = self.category_obj,
+            slug = 'product',
+            unit_price = '100000',
+            inventory = 10,
+            image = SimpleUploadedFile('lamp.png', self.create_image(), content_type='image/png'),
+        )
+
+    def create_image(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (1600, 800), (200, 100, 50, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def get_image_renditions(self):
+        return ImageRenditionsField().to_representation(self.product_obj)
+
+    def test_original_image_served_until_renditions_exist(self):
+        self.assertEqual(self.get_image_renditions()['card']['webp'], self.product_obj.image.url)
+
+    def test_generate_renditions(self):
+        generate_product_image_renditions(self.product_obj.pk, self.product_obj.image.name)
+        self.product_obj.refresh_from_db()
+
+        renditions = self.get_image_renditions()
+        self.assertTrue(renditions['card']['webp'].endswith('sample/renditions/lamp_card.webp'))
+
+        with Image.open(self.product_obj.image.storage.open(self.product_obj.image_renditions['card']['jpeg'])) as card:
+            self.assertEqual((card.format, card.size), ('JPEG', (400, 200)))
+
+    def test_generated_renditions_change_the_etag(self):
+        Group.objects.create(name='Product Manager')
+        detail_url = reverse('product-detail', args=[self.product_obj.slug])
+        response = APIClient().get(detail_url)
+
+        generate_product_image_renditions(self.product_obj.pk, self.product_obj.image.name)
+
+        # clients holding the payload of the original image must get the renditions
+        response = APIClient().get(detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['image_renditions']['card']['webp'].endswith('sample/renditions/lamp_card.webp'))
+
+
+class ProductEffectivePriceTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(
+            name = 'product',
+            category = self.category_obj,
+            slug = 'product',
+            unit_price = '100000',
+            inventory = 10,
+        )
+        self.discount_obj = Discount.objects.create(discount=0.25, description='discount')
+
+    def get_effective_price(self):
+        self.product_obj.refresh_from_db()
+        return self.product_obj.effective_price
+
+    def test_effective_price_without_discounts(self):
+        self.assertEqual(self.get_effective_price(), 100000)
+
+    def test_effective_price_follows_discounts(self):
+        self.product_obj.discounts.add(self.discount_obj, Discount.objects.create(discount=0.1, description='smaller'))
+        # discounts do not stack, the largest one applies
+        self.assertEqual(self.get_effective_price(), 75000)
+
+        self.discount_obj.discount = 0.5
+        self.discount_obj.save()
+        self.assertEqual(self.get_effective_price(), 50000)
+
+        self.discount_obj.delete()
+        self.assertEqual(self.get_effective_price(), 90000)
+
+        self.product_obj.discounts.clear()
+        self.assertEqual(self.get_effective_price(), 100000)
+
+    def test_effective_price_follows_unit_price(self):
+        self.discount_obj.product_set.add(self.product_obj)
+
+        self.product_obj.unit_price = 999
+        self.product_obj.save()
+        self.assertEqual(self.get_effective_price(), 749)
+
+    def test_cart_unit_price_is_effective_price(self):
+        self.product_obj.discounts.add(self.discount_obj)
+        self.product_obj.refresh_from_db()
+        self.assertEqual(CartProductSerializer().get_unit_price(self.product_obj), f'{75000: ,} T')
+
+    def test_database_and_python_prices_match(self):
+        for unit_price, discount in [(100, 0.9), (100, 0.29), (5, 0.5), (12345, 0.333), (1, 1.0), (80, 1.5)]:
+            self.product_obj.discounts.set([Discount.objects.create(discount=discount, description='discount')])
+            Product.objects.filter(pk=self.product_obj.pk).update(unit_price=unit_price)
+            update_effective_prices(Product.objects.filter(pk=self.product_obj.pk))
+
+            self.assertEqual(self.get_effective_price(), get_effective_price(unit_price, [discount]))
+
+
+class OrderInventoryTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_1 = Product.objects.create(name='product1', category=self.category_obj, slug='product1', unit_price=1000, inventory=10)
+        self.product_2 = Product.objects.create(name='product2', category=self.category_obj, slug='product2', unit_price=1000, inventory=2)
+
+    def get_inventories(self):
+        stocks = get_stock([self.product_1.id, self.product_2.id])
+        return [stocks[self.product_1.id], stocks[self.product_2.id]]
+
+    def test_order_inventory_appended_in_one_query(self):
+        order_items = [(self.product_1.id, 3), (self.product_2.id, 2)]
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            update_order_inventory(order_items, reduce=True)
+        self.assertEqual(self.get_inventories(), [7, 0])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
+        update_order_inventory(order_items, reduce=False)
+        self.assertEqual(self.get_inventories(), [10, 2])
+
+    def test_order_inventory_never_goes_negative(self):
+        result = update_order_inventory([(self.product_1.id, 3), (self.product_2.id, 3)], reduce=True)
+
+        self.assertIn('nothing changed', result)
+        self.assertEqual(self.get_inventories(), [10, 2])
+        with self.assertRaises(InsufficientInventory):
+            adjust_inventory({self.product_2.id: -3}, InventoryMovement.REASON_SALE)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(name='product', category=self.category_obj, slug='product', unit_price=1000, inventory=10)
+        self.customer_obj = get_user_model().objects.create_user(username='user', password='password').customer
+
+    def create_reserved_order(self, quantity, expires_at=None):
+        expires_at = expires_at or now() + RESERVATION_TIMEOUT
+        order = Order.objects.create(customer=self.customer_obj, expires_at=expires_at)
+        OrderItem.objects.create(order=order, product=self.product_obj, quantity=quantity, unit_price=1000)
+        reserve_inventory(order, [(self.product_obj.id, quantity)], expires_at)
+        return order
+
+    def get_stock(self):
+        self.product_obj.refresh_from_db()
+        return get_stock([self.product_obj.id])[self.product_obj.id], self.product_obj.reserved_inventory
+
+    def test_reservations_never_exceed_inventory(self):
+        self.create_reserved_order(6)
+
+        with self.assertRaises(InsufficientInventory):
+            self.create_reserved_order(5)
+        self.assertEqual(self.get_stock(), (10, 6))
+        # reserved stock can not be taken by other inventory changes either
+        with self.assertRaises(InsufficientInventory):
+            adjust_inventory({self.product_obj.id: -5}, InventoryMovement.REASON_SALE)
+
+    def test_expired_reservations_released_in_bulk(self):
+        self.create_reserved_order(3, expires_at=now() - timedelta(minutes=1))
+        self.create_reserved_order(4, expires_at=now() - timedelta(minutes=1))
+        active_order = self.create_reserved_order(2)
+
+        remove_expired_orders()
+        self.assertEqual(self.get_stock(), (10, 2))
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [active_order.id])
+
+        active_order.delete()
+        self.assertEqual(self.get_stock(), (10, 0))
+
+    def test_payment_turns_reservation_into_deduction(self):
+        order = self.create_reserved_order(4)
+
+        approve_order_status_after_successful_payment(order.id)
+        approve_order_status_after_successful_payment(order.id)
+        self.assertEqual(self.get_stock(), (6, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_available_inventory_excludes_reserved_stock(self):
+        self.create_reserved_order(4)
+        self.assertEqual(get_available_inventory(self.product_obj), 6)
+
+        cart = Cart.objects.create(session_key='session')
+        other_product = Product.objects.create(name='other', category=self.category_obj, slug='other', unit_price=1000, inventory=3)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=self.product_obj, quantity=2), CartItem(cart=cart, product=other_product, quantity=1),
+        ])
+
+        # the items and their products with the stock annotated, none per item
+        with self.assertNumQueries(2):
+            data = CartItemSerializer(CartItem.objects.prefetch_related(prefetch_stock()).order_by('pk'), many=True).data
+        self.assertEqual([item['current_product_stuck'] for item in data], [6, 3])
+
+    def test_payment_deducts_available_stock_of_released_items(self):
+        order = self.create_reserved_order(4)
+        other_product = Product.objects.create(name='other', category=self.category_obj, slug='other', unit_price=1000, inventory=10)
+        OrderItem.objects.create(order=order, product=other_product, quantity=2, unit_price=1000)
+        release_reservations(order.reservations.all())
+        adjust_inventory({self.product_obj.id: -8}, InventoryMovement.REASON_SALE)
+
+        result = approve_order_status_after_successful_payment(order.id)
+        self.assertIn(f"oversold | [('{self.product_obj.name}', 2, -4)]", result)
+        self.assertEqual(Order.objects.get(pk=order.id).status, 'paid')
+        # the short product gives its available stock, the other items are deducted in full
+        self.assertEqual(self.get_stock(), (0, 0))
+        self.assertEqual(get_stock([other_product.id])[other_product.id], 8)
+
+
+@override_settings(HOT_INVENTORY_ENABLED=True)
+class HotInventoryTests(TransactionTestCase):
+    # the redis changes follow the commits of the database transactions
+    def setUp(self):
+        self.redis_client = get_client()
+        for key in self.redis_client.scan_iter(match='hot_inventory:*'):
+            self.redis_client.delete(key)
+
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(
+            name='product', category=self.category_obj, slug='product', unit_price=1000, inventory=10, hot_inventory=True,
+        )
+        self.customer_obj = get_user_model().objects.create_user(username='user', password='password').customer
+
+    def create_reserved_order(self, quantity):
+        expires_at = now() + RESERVATION_TIMEOUT
+        order = Order.objects.create(customer=self.customer_obj, expires_at=expires_at)
+        OrderItem.objects.create(order=order, product=self.product_obj, quantity=quantity, unit_price=1000)
+        reserve_inventory(order, [(self.product_obj.id, quantity)], expires_at)
+        return order
+
+    def get_stock(self):
+        self.product_obj.refresh_from_db()
+        return get_stock([self.product_obj.id])[self.product_obj.id], self.product_obj.reserved_inventory
+
+    def test_sales_written_behind_to_database(self):
+        order = self.create_reserved_order(4)
+        self.assertEqual(get_available_inventory(self.product_obj), 6)
+        self.assertEqual(self.get_stock(), (10, 0))
+
+        approve_order_status_after_successful_payment(order.id)
+        adjust_inventory({self.product_obj.id: 3}, InventoryMovement.REASON_RESTOCK)
+        self.assertEqual(get_available_inventory(self.product_obj), 9)
+
+        flush_hot_inventory()
+        self.assertEqual(self.get_stock(), (9, 0))
+        self.assertEqual(get_available_inventory(self.product_obj), 9)
+        # one movement per reason, the order of a sale is lost in the net change
+        self.assertEqual(
+            sorted(InventoryMovement.pending.values_list('reason', 'quantity')),
+            [(InventoryMovement.REASON_RESTOCK, 3), (InventoryMovement.REASON_SALE, -4)],
+        )
+
+    def test_counter_never_goes_below_zero(self):
+        self.create_reserved_order(6)
+
+        with self.assertRaises(InsufficientInventory):
+            self.create_reserved_order(5)
+        with self.assertRaises(InsufficientInventory):
+            adjust_inventory({self.product_obj.id: -5}, InventoryMovement.REASON_SALE)
+        self.assertEqual(get_available_inventory(self.product_obj), 4)
+        # the failed order rolled back without a reservation
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+    def test_replayed_flush_written_once(self):
+        self.create_reserved_order(4)
+        adjust_inventory({self.product_obj.id: -1}, InventoryMovement.REASON_SALE)
+
+        # the changes are committed but their redis copy is kept
+        with patch.object(self.redis_client, 'delete', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                flush_hot_inventory()
+        self.assertEqual(self.get_stock(), (9, 4))
+
+        flush_hot_inventory()
+        self.assertEqual(self.get_stock(), (9, 4))
+        self.assertFalse(self.redis_client.exists(PROCESSING_KEY))
+        self.assertEqual(get_available_inventory(self.product_obj), 5)
+
+    def test_overwritten_inventory_resets_counter(self):
+        self.create_reserved_order(4)
+        serializer = ProductBulkUpdateSerializer(data={'products': [{'slug': self.product_obj.slug, 'inventory': 20}]})
+        serializer.is_valid(raise_exception=True)
+
+        serializer.save()
+        self.assertIsNone(self.redis_client.get(get_available_key(self.product_obj.id)))
+        # the pending reservation was flushed before the overwrite and stays held
+        self.assertEqual(get_available_inventory(self.product_obj), 16)
+
+        stream = BytesIO(b'{"name": "product", "category": "category", "unit_price": 1000, "inventory": 30}\n')
+        ProductImporter().run(stream, 'ndjson')
+        self.assertIsNone(self.redis_client.get(get_available_key(self.product_obj.id)))
+        self.assertEqual(get_available_inventory(self.product_obj), 26)
+
+    def test_rolled_back_change_released(self):
+        # e.g. the cart deletion after the reservation of an order fails
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_reserved_order(4)
+                raise RuntimeError()
+
+        # the counter stays taken until the hold expires, nothing reaches the database
+        self.assertEqual(get_available_inventory(self.product_obj), 6)
+        self.assertEqual(release_expired_holds(timeout=0), 1)
+        self.assertEqual(get_available_inventory(self.product_obj), 10)
+
+        flush_hot_inventory()
+        self.assertEqual(self.get_stock(), (10, 0))
+        self.assertFalse(InventoryMovement.pending.exists())
+
+    def test_reconcile_fixes_drifted_counter(self):
+        self.create_reserved_order(4)
+        self.redis_client.set(get_available_key(self.product_obj.id), 100)
+
+        call_command('reconcile_hot_inventory', stdout=StringIO())
+        self.assertEqual(get_available_inventory(self.product_obj), 100)
+
+        call_command('reconcile_hot_inventory', '--fix', stdout=StringIO())
+        self.assertEqual(get_available_inventory(self.product_obj), 6)
+        self.assertEqual(self.get_stock(), (10, 4))
+
+
+class InventoryLedgerTests(TestCase):
+    def setUp(self):
+        self.category_obj = Category.objects.create(title='category', slug='category')
+        self.product_obj = Product.objects.create(name='product', category=self.category_obj, slug='product', unit_price=1000, inventory=10)
+
+    def get_history(self):
+        return list(self.product_obj.inventory_movements.order_by('pk').values_list('reason', 'quantity'))
+
+    def test_movements_compacted_into_inventory(self):
+        adjust_inventory({self.product_obj.id: -4}, InventoryMovement.REASON_SALE)
+        adjust_inventory({self.product_obj.id: 1}, InventoryMovement.REASON_RESTOCK)
+        self.assertEqual(get_stock([self.product_obj.id]), {self.product_obj.id: 7})
+        self.assertEqual(get_available_inventory(self.product_obj), 7)
+
+        compact_inventory_movements()
+        self.product_obj.refresh_from_db()
+        self.assertEqual(self.product_obj.inventory, 7)
+        self.assertEqual(get_stock([self.product_obj.id]), {self.product_obj.id: 7})
+        self.assertFalse(InventoryMovement.pending.exists())
+        # the movements stay as the history of the inventory
+        self.assertEqual(self.get_history(), [
+            (InventoryMovement.REASON_INITIAL, 10),
+            (InventoryMovement.REASON_SALE, -4),
+            (InventoryMovement.REASON_RESTOCK, 1),
+        ])
+
+    def test_stock_below_zero_corrected_in_history(self):
+        # written past the checks of adjust_inventory
+        append_movements({self.product_obj.id: -15}, InventoryMovement.REASON_SALE)
+
+        with self.assertLogs('store.ledger', 'WARNING'):
+            compact_inventory_movements()
+        self.product_obj.refresh_from_db()
+        self.assertEqual(self.product_obj.inventory, 0)
+        self.assertEqual(sum(quantity for _, quantity in self.get_history()), 0)
+        self.assertEqual(self.get_history()[-1], (InventoryMovement.REASON_CORRECTION, 5))
+
+    def test_manual_edit_keeps_concurrent_movements(self):
+        product = Product.objects.get(pk=self.product_obj.pk)
+        adjust_inventory({self.product_obj.id: -2}, InventoryMovement.REASON_SALE)
+
+        # the edit is the change from the loaded value, the sale recorded in the meantime is not overwritten
+        product.inventory = 15
+        product.save()
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, 13)
+        self.assertFalse(InventoryMovement.pending.exists())
+        self.assertEqual(self.get_history(), [
+            (InventoryMovement.REASON_INITIAL, 10),
+            (InventoryMovement.REASON_SALE, -2),
+            (InventoryMovement.REASON_MANUAL_EDIT, 5),
+        ])
+
+    def test_overwrites_supersede_pending_movements(self):
+        adjust_inventory({self.product_obj.id: -2}, InventoryMovement.REASON_SALE)
+        serializer = ProductBulkUpdateSerializer(data={'products': [{'slug': self.product_obj.slug, 'inventory': 20}]})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(get_stock([self.product_obj.id]), {self.product_obj.id: 20})
+
+        adjust_inventory({self.product_obj.id: -1}, InventoryMovement.REASON_SALE)
+        ProductImporter().run(BytesIO(b'{"name": "product", "category": "category", "unit_price": 1000, "inventory": 30}\n'), 'ndjson')
+        self.assertEqual(get_stock([self.product_obj.id]), {self.product_obj.id: 30})
+        self.assertFalse(InventoryMovement.pending.exists())
+        # the history still adds up to the inventory
+        self.assertEqual(self.get_history(), [
+            (InventoryMovement.REASON_INITIAL, 10),
+            (InventoryMovement.REASON_SALE, -2),
+            (InventoryMovement.REASON_BULK_UPDATE, 12),
+            (InventoryMovement.REASON_SALE, -1),
+            (InventoryMovement.REASON_IMPORT, 11),
+        ])
+
+    def test_manual_edit_and_clear_recorded(self):
+        self.product_obj.inventory = 15
+        self.product_obj.save()
+        adjust_inventory({self.product_obj.id: -2}, InventoryMovement.REASON_SALE)
+
+        self.assertEqual(clear_inventory([self.product_obj.id]), 1)
+        self.product_obj.refresh_from_db()
+        self.assertEqual(self.product_obj.inventory, 0)
+        self.assertEqual(self.get_history(), [
+            (InventoryMovement.REASON_INITIAL, 10),
+            (InventoryMovement.REASON_MANUAL_EDIT, 5),
+            (InventoryMovement.REASON_SALE, -2),
+            (InventoryMovement.REASON_CLEAR, -13),
+        ])
@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from ..benchmarks.serializers import BENCHMARKED_VIEWSETS, get_benchmark_renderers, run_serializer_benchmarks
+from ..models import Product
+
+
+class SerializerBenchmarkTests(TestCase):
+    def test_benchmark_report_covers_every_serializer_and_renderer(self):
+        report = run_serializer_benchmarks(rows=[2, 4], repeat=1)
+
+        serialize_results = [result for result in report['results'] if result['stage'] == 'serialize']
+        render_results = [result for result in report['results'] if result['stage'] == 'render']
+
+        self.assertEqual(len(serialize_results), len(BENCHMARKED_VIEWSETS) * 2)
+        self.assertEqual(len(render_results), len(serialize_results) * len(get_benchmark_renderers()))
+        self.assertEqual({result['rows'] for result in serialize_results}, {2, 4})
+        self.assertIn('ManagerOrderSerializer', {result['serializer'] for result in serialize_results})
+
+    def test_benchmark_data_is_rolled_back(self):
+        products_count = Product.objects.count()
+        run_serializer_benchmarks(rows=[2], repeat=1)
+        self.assertEqual(Product.objects.count(), products_count)
@@ -1,13 +1,27 @@
+import json
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
 from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework.reverse import reverse
 from rest_framework import status
+from rest_framework.throttling import AnonRateThrottle
 
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import Group
+from django.db import connection
 from django.db.utils import IntegrityError
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls.exceptions import NoReverseMatch
 
+from config.utils import get_cache_lock_key
+
+from ..caching import get_product_detail_cache_key
+from ..inventory import get_available_inventory
 from ..models import Product, Category, Comment, Cart, CartItem, Customer, Address, Order, OrderItem
 from ..serializers import (
     CartItemSerializer, 
@@ -20,6 +34,8 @@ from ..serializers import (
     OrderSerializer,
     OrderCreationSerializer,
 )
+from ..views import ProductViewSet
+from ..views.async_views import AsyncReadView
 from store.test.helpers.base_helper import MockObjects, UserAuthHelper, GenerateAuthToken
 
 class ProductViewSetTests(APITestCase):
@@ -171,6 +187,281 @@ class ProductViewSetTests(APITestCase):
         response = self.api_client.get(self.product_list_url, {'search': 'category'})
         self.assertEqual(response.data['count'], 4)
 
+    def test_product_search_by_partial_term(self):
+        response = self.api_client.get(self.product_list_url, {'search': 'prod'})
+        self.assertEqual(response.data['count'], 4)
+
+    def test_product_search_ranks_name_matches_first(self):
+        Product.objects.create(
+            name = 'desk lamp',
+            category = self.categoty_obj,
+            slug = 'desk-lamp',
+            description = 'lamp',
+            unit_price = '30000',
+            inventory = 5,
+        )
+        Product.objects.create(
+            name = 'table',
+            category = self.categoty_obj,
+            slug = 'table',
+            description = 'goes well with a lamp',
+            unit_price = '30000',
+            inventory = 5,
+        )
+
+        response = self.api_client.get(self.product_list_url, {'search': 'lamp'})
+        results = [result['name'] for result in response.data['results']]
+        self.assertEqual(results, ['desk lamp', 'table'])
+
+    def test_product_search_index_follows_updates(self):
+        self.product_1.name = 'renamed product'
+        self.product_1.save()
+
+        response = self.api_client.get(self.product_list_url, {'search': 'renamed'})
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.api_client.get(self.product_list_url, {'search': 'product1'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_product_list_cache_invalidated_after_product_change(self):
+        response = self.api_client.get(self.product_list_url)
+        self.assertEqual(response.data['results'][0]['unit_price'], 20000)
+
+        self.product_3.unit_price = 25000
+        self.product_3.save()
+
+        response = self.api_client.get(self.product_list_url)
+        self.assertEqual(response.data['results'][0]['unit_price'], 25000)
+
+    def test_product_detail_cache_refreshed_after_product_change(self):
+        response = self.api_client.get(self.product_detail_url)
+        inventory = response.data['inventory']
+
+        self.product_obj.inventory = inventory + 1
+        self.product_obj.save()
+
+        response = self.api_client.get(self.product_detail_url)
+        self.assertEqual(response.data['inventory'], inventory + 1)
+
+    def test_product_detail_stale_cache_served_while_refresh_in_progress(self):
+        response = self.api_client.get(self.product_detail_url)
+        inventory = response.data['inventory']
+
+        self.product_obj.inventory = inventory + 1
+        self.product_obj.save()
+
+        # another request holds the refresh lock
+        detail_cache_key = get_product_detail_cache_key(self.product_obj.slug)
+        cache.add(get_cache_lock_key(detail_cache_key), 1)
+        self.addCleanup(cache.delete_many, [detail_cache_key, get_cache_lock_key(detail_cache_key)])
+        response = self.api_client.get(self.product_detail_url)
+        self.assertEqual(response.data['inventory'], inventory)
+
+    def test_product_list_conditional_get(self):
+        response = self.api_client.get(self.product_list_url)
+        etag = response.headers['ETag']
+
+        response = self.api_client.get(self.product_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.product_3.delete()
+
+        response = self.api_client.get(self.product_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_product_detail_conditional_get(self):
+        response = self.api_client.get(self.product_detail_url)
+        etag = response.headers['ETag']
+        num_of_comments = response.data['num_of_comments']
+
+        response = self.api_client.get(self.product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Comment.objects.create(product=self.product_obj, name='comment', body='text', status=Comment.COMMENT_STATUS_APPROVED)
+
+        response = self.api_client.get(self.product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['num_of_comments'], num_of_comments + 1)
+
+    def test_product_facets(self):
+        response = self.api_client.get(reverse('product-facets'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['category__slug'], {'category': 4})
+        self.assertEqual(response.data['price']['0-50000'], 1)
+        self.assertEqual(response.data['price']['50000-100000'], 2)
+
+    def test_product_facets_follow_filters_and_changes(self):
+        facets_url = reverse('product-facets')
+
+        response = self.api_client.get(facets_url, {'min_price': 50000})
+        self.assertEqual(response.data['count'], 2)
+
+        self.product_2.unit_price = 60000
+        self.product_2.save()
+
+        response = self.api_client.get(facets_url, {'min_price': 50000})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_product_import_csv(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        feed = (
+            'name,category,description,unit_price,inventory\n'
+            'product1,category,updated,95000,8\n'
+            'new product,category,new,10000,3\n'
+            'broken product,category,,-1,3\n'
+            'lost product,no-category,,1000,3\n'
+        )
+        response = self.api_client.post(
+            reverse('product-import-products'), {'file': SimpleUploadedFile('feed.csv', feed.encode())}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['errors_count']), (1, 1, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+
+        self.product_1.refresh_from_db()
+        self.assertEqual((self.product_1.unit_price, self.product_1.inventory), (95000, 8))
+
+        response = self.api_client.get(self.product_list_url, {'search': 'new'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_product_import_rejects_invalid_slugs(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        feed = (
+            'name,category,description,unit_price,inventory\n'
+            f'{"long name " * 10},category,,1000,3\n'
+            '!!!,category,,1000,3\n'
+            'twin,category,,1000,3\n'
+            'Twin,category,,2000,3\n'
+        )
+        response = self.api_client.post(
+            reverse('product-import-products'), {'file': SimpleUploadedFile('feed.csv', feed.encode())}, format='multipart'
+        )
+        self.assertEqual((response.data['created'], response.data['errors_count']), (1, 3))
+        self.assertEqual([(error['row'], list(error['errors'])) for error in response.data['errors']], [(1, ['name']), (2, ['name']), (4, ['name'])])
+        # the first row of a slug is imported
+        self.assertEqual(Product.objects.get(slug='twin').unit_price, 1000)
+
+    def test_product_import_ndjson(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        feed = (
+            '{"name": "new product", "category": "category", "unit_price": 10000, "inventory": 3}\n'
+            '{"name": "broken\n'
+        )
+        response = self.api_client.post(
+            reverse('product-import-products'), {'file': SimpleUploadedFile('feed.ndjson', feed.encode())}, format='multipart'
+        )
+        self.assertEqual((response.data['created'], response.data['errors_count']), (1, 1))
+        self.assertTrue(Product.objects.filter(slug='new-product').exists())
+
+    def test_product_bulk_update(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+        self.api_client.get(reverse('product-detail', args=[self.product_1.slug]))
+
+        data = {'products': [
+            {'slug': self.product_1.slug, 'unit_price': 95000, 'inventory': 20},
+            {'slug': self.product_2.slug, 'activation': False},
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api_client.patch(reverse('product-bulk-update'), data, 'json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+
+        self.product_2.refresh_from_db()
+        self.assertEqual((self.product_2.unit_price, self.product_2.activation), (50000, False))
+
+        response = self.api_client.get(reverse('product-detail', args=[self.product_1.slug]))
+        self.assertEqual((response.data['unit_price'], response.data['inventory']), (95000, 20))
+
+    def test_product_bulk_update_rejects_unknown_products(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        data = {'products': [{'slug': self.product_1.slug, 'inventory': 1}, {'slug': 'unknown', 'inventory': 1}]}
+        response = self.api_client.patch(reverse('product-bulk-update'), data, 'json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.product_1.refresh_from_db()
+        self.assertEqual(self.product_1.inventory, 10)
+
+    def test_product_export_streams_every_product(self):
+        response = self.api_client.get(reverse('product-export'), {'file_format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['slug'] for line in lines], ['product', 'product1', 'product2', 'product3'])
+
+    def test_product_export_formats(self):
+        for file_format in ['csv', 'xml', 'yaml', 'txt']:
+            response = self.api_client.get(reverse('product-export'), {'file_format': file_format, 'min_price': 50000})
+            content = b''.join(response.streaming_content).decode()
+            self.assertIn('product2', content)
+            self.assertNotIn('product1', content)
+
+    def test_product_comments_not_embedded_by_default(self):
+        response = self.api_client.get(self.product_list_url)
+        self.assertNotIn('comments', response.data['results'][0])
+
+        response = self.api_client.get(self.product_detail_url)
+        self.assertNotIn('comments', response.data)
+
+    def test_product_expand_comments_embeds_latest_approved_comments(self):
+        for number in range(4):
+            Comment.objects.create(product=self.product_obj, name=f'approved {number}', body='text', status=Comment.COMMENT_STATUS_APPROVED)
+        Comment.objects.create(product=self.product_obj, name='waiting', body='text', status=Comment.COMMENT_STATUS_WAITING)
+
+        response = self.api_client.get(self.product_detail_url, {'expand': 'comments', 'comments_limit': 2})
+        self.assertEqual([comment['name'] for comment in response.data['comments']], ['approved 3', 'approved 2'])
+
+        response = self.api_client.get(self.product_list_url, {'expand': 'comments'})
+        results = {result['name']: result['comments'] for result in response.data['results']}
+        self.assertEqual(len(results['product']), ProductViewSet.EMBEDDED_COMMENTS_LIMIT)
+        self.assertEqual(results['product1'], [])
+
+    def test_product_sparse_fieldsets(self):
+        response = self.api_client.get(self.product_list_url, {'fields': 'name,unit_price,detail'})
+        self.assertEqual(set(response.data['results'][0]), {'name', 'unit_price', 'detail'})
+
+        response = self.api_client.get(self.product_list_url, {'omit': 'category,image_renditions'})
+        self.assertNotIn('category', response.data['results'][0])
+        self.assertIn('inventory', response.data['results'][0])
+
+        # the detail cache keeps the full payload for the next request
+        response = self.api_client.get(self.product_detail_url, {'fields': 'name'})
+        self.assertEqual(response.data, {'name': self.product_obj.name})
+
+        response = self.api_client.get(self.product_detail_url)
+        self.assertIn('category', response.data)
+
+    def test_product_omitted_comments_are_not_prefetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.get(self.product_list_url, {'expand': 'comments', 'fields': 'name,inventory'})
+        self.assertEqual(set(response.data['results'][0]), {'name', 'inventory'})
+
+        page_query = next(query['sql'] for query in queries if 'LIMIT' in query['sql'])
+        self.assertNotIn('store_category', page_query)
+        self.assertFalse(any('store_comment' in query['sql'] for query in queries))
+
+    def test_product_hyperlinks_match_reversed_urls(self):
+        response = self.api_client.get(self.product_list_url)
+
+        for result in response.data['results']:
+            product = Product.objects.select_related('category').get(name=result['name'])
+            self.assertEqual(result['detail'], 'http://testserver' + reverse('product-detail', args=[product.slug]))
+            self.assertEqual(result['category'], 'http://testserver' + reverse('category-detail', args=[product.category.slug]))
+
+        response = self.api_client.get(reverse('product-list', kwargs={'format': 'json'}))
+        self.assertTrue(response.data['results'][0]['detail'].endswith('.json'))
+
     def test_product_name_ordering_filter(self):
         ascending_order_response = self.api_client.get(self.product_list_url, {'ordering': 'name'})
         results = [result['name'] for result in ascending_order_response.data['results']]
@@ -209,6 +500,32 @@ class ProductViewSetTests(APITestCase):
         self.assertIsNotNone(response.data['previous'])
         self.assertIsNone(response.data['next'])
 
+    def test_product_cursor_pagination(self):
+        response = self.api_client.get(self.product_list_url, {'pagination': 'cursor', 'page_size': 3})
+        self.assertNotIn('count', response.data)
+        self.assertEqual([result['name'] for result in response.data['results']], ['product3', 'product2', 'product1'])
+        self.assertIn('cursor=', response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.api_client.get(response.data['next'])
+        self.assertEqual([result['name'] for result in response.data['results']], ['product'])
+        self.assertIsNotNone(response.data['previous'])
+        self.assertIsNone(response.data['next'])
+
+    def test_product_cursor_pagination_with_non_unique_ordering(self):
+        Product.objects.update(inventory=5)
+
+        names = []
+        response = self.api_client.get(self.product_list_url, {'pagination': 'cursor', 'page_size': 1, 'ordering': 'inventory'})
+        while True:
+            names += [result['name'] for result in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.api_client.get(response.data['next'])
+
+        # every product once, in id order within the same inventory
+        self.assertEqual(names, ['product3', 'product2', 'product1', 'product'])
+
 
 class CategoryViewSetTests(APITestCase):
     def setUp(self):
@@ -314,6 +631,52 @@ class CategoryViewSetTests(APITestCase):
 
         self.assertEqual(response.data['results'][0]['num_of_products'], 2)
     
+    def test_category_list_cache_invalidated_after_category_and_product_change(self):
+        response = self.api_client.get(self.category_list_url)
+        self.assertEqual(response.data['results'][0]['num_of_products'], 1)
+
+        self.categoty_obj.description = 'new description'
+        self.categoty_obj.save()
+
+        response = self.api_client.get(self.category_list_url)
+        self.assertEqual(response.data['results'][0]['description'], 'new description')
+
+        Product.objects.create(name='new product', category=self.categoty_obj, slug='new-product', unit_price=10000, inventory=1)
+
+        response = self.api_client.get(self.category_list_url)
+        self.assertEqual(response.data['results'][0]['num_of_products'], 2)
+
+    def test_category_list_conditional_get(self):
+        response = self.api_client.get(self.category_list_url)
+        etag = response.headers['ETag']
+
+        response = self.api_client.get(self.category_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.product_obj.inventory += 1
+        self.product_obj.save()
+
+        response = self.api_client.get(self.category_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_products_preview_is_bounded(self):
+        for number in range(3):
+            Product.objects.create(name=f'preview {number}', category=self.category_1, slug=f'preview-{number}', unit_price=10000 * (number + 1), inventory=1)
+
+        response = self.api_client.get(self.category_list_url, {'products_limit': 2, 'products_ordering': '-unit_price'})
+        preview = [product['name'] for product in response.data['results'][0]['products']]
+        self.assertEqual(response.data['results'][0]['num_of_products'], 3)
+        self.assertEqual(preview, ['preview 2', 'preview 1'])
+
+    def test_category_products_sub_resource(self):
+        for number in range(3):
+            Product.objects.create(name=f'preview {number}', category=self.category_1, slug=f'preview-{number}', unit_price=10000, inventory=1)
+
+        response = self.api_client.get(reverse('category-products', args=[self.category_1.slug]), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+
     def test_category_filter_by_title(self):
         response = self.api_client.get(self.category_list_url, {'title': self.categoty_obj.title})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1338,13 +1701,41 @@ class OrderViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 4)
 
+    def test_order_sparse_fieldsets(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        response = self.api_client.get(self.order_list_url, {'fields': 'id,status'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+
+        response = self.api_client.get(self.order_detail_url, {'omit': 'customer,items'})
+        self.assertIn('total_items_price', response.data)
+        self.assertNotIn('customer', response.data)
+        self.assertNotIn('items', response.data)
+
     def test_order_create(self):
         self.set_authorization_header()
 
         cart_obj = self.mock_objs.cart_obj
+        # the cart holds 12 items of the product
+        Product.objects.filter(pk=self.mock_objs.product_obj.pk).update(inventory=20)
 
         response = self.api_client.post(self.order_list_url, {'cart_uuid': cart_obj.id})
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        product = Product.objects.get(pk=self.mock_objs.product_obj.pk)
+        self.assertEqual((product.inventory, product.reserved_inventory, get_available_inventory(product)), (20, 12, 8))
+
+    def test_order_create_with_insufficient_stock(self):
+        self.set_authorization_header()
+        orders_count = Order.objects.count()
+
+        # 12 items in the cart, 10 in stock
+        response = self.api_client.post(self.order_list_url, {'cart_uuid': self.mock_objs.cart_obj.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), orders_count)
+        self.assertTrue(Cart.objects.filter(pk=self.mock_objs.cart_obj.pk).exists())
+        self.assertEqual(Product.objects.get(pk=self.mock_objs.product_obj.pk).reserved_inventory, 0)
         
     def test_order_create_with_empty_cart_items(self):
         self.set_authorization_header()
@@ -1470,4 +1861,75 @@ class OrderViewSetTests(APITestCase):
         response = self.api_client.get(self.order_list_url, {'page_size': 2, 'page': 2})
         self.assertEqual(len(response.data['results']), 2)
         self.assertIsNotNone(response.data['previous'])
-        self.assertIsNone(response.data['next'])
\ No newline at end of file
+        self.assertIsNone(response.data['next'])
+
+    def test_order_cursor_pagination(self):
+        self.set_authorization_header()
+        self.set_manager_group()
+
+        response = self.api_client.get(self.order_list_url, {'pagination': 'cursor', 'page_size': 2})
+        self.assertNotIn('count', response.data)
+        self.assertEqual([result['id'] for result in response.data['results']], [self.order_3.id, self.order_2.id])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.api_client.get(response.data['next'])
+        self.assertEqual([result['id'] for result in response.data['results']], [self.order_1.id, self.order_obj.id])
+        self.assertIsNone(response.data['next'])
+
+class AsyncReadViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mock_objs = MockObjects()
+        cls.product_obj = cls.mock_objs.product_obj
+        # the anonymous throttle of the viewsets validates its group
+        Group.objects.bulk_create([Group(name='Product Manager'), Group(name='Content Manager')])
+
+    def setUp(self):
+        # cached group names and throttle history of earlier tests
+        cache.clear()
+
+    def test_read_view_requires_get_content(self):
+        with self.assertRaises(TypeError):
+            AsyncReadView()
+
+    async def test_async_views_apply_viewset_throttles(self):
+        with patch.object(AnonRateThrottle, 'get_rate', return_value='1/day'):
+            response = await self.async_client.get(reverse('async-category-list'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = await self.async_client.get(reverse('async-category-list'))
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+
+    async def test_async_product_list_matches_sync_list(self):
+        response = await self.async_client.get(reverse('async-product-list'), {'ordering': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sync_response = await sync_to_async(APIClient().get)(reverse('product-list'), {'ordering': 'name'})
+        self.assertEqual(response.json(), json.loads(sync_response.content))
+
+    async def test_async_product_detail_shares_sync_cache_entry(self):
+        response = await self.async_client.get(reverse('async-product-detail', args=[self.product_obj.slug]), {'fields': 'name'})
+        self.assertEqual(response.json(), {'name': self.product_obj.name})
+
+        _, cached_data = await sync_to_async(cache.get)(get_product_detail_cache_key(self.product_obj.slug))
+        self.assertEqual(cached_data['name'], self.product_obj.name)
+
+        response = await self.async_client.get(reverse('async-product-detail', args=['missing-product']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_comment_and_category_lists(self):
+        response = await self.async_client.get(reverse('async-product-comments-list', args=[self.product_obj.slug]))
+        self.assertEqual([comment['id'] for comment in response.json()['results']], [self.mock_objs.comment_obj.id])
+
+        response = await self.async_client.get(reverse('async-product-comments-list', args=['missing-product']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(reverse('async-category-list'))
+        self.assertEqual([category['title'] for category in response.json()['results']], [self.mock_objs.category_obj.title])
+
+    async def test_async_list_conditional_get(self):
+        response = await self.async_client.get(reverse('async-category-list'))
+
+        response = await self.async_client.get(reverse('async-category-list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
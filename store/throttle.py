@@ -1,9 +1,10 @@
 from rest_framework.throttling import BaseThrottle, UserRateThrottle, AnonRateThrottle, ScopedRateThrottle
 from rest_framework import views
 from rest_framework.exceptions import ValidationError
-from django.contrib.auth.models import Group
 from django.conf import settings
 
+from .permissions import get_group_names, get_user_group_names
+
 
 class AdminUserThrottle(BaseThrottle):
     def allow_request(self, request, view):
@@ -17,11 +18,13 @@ class BaseThrottleView(views.APIView):
         # validate group_name and throttle scope 
         self.validation(group_name=group_name, throttle_scope=throttle_scope)    
 
-        if request.user.is_superuser or request.user.groups.filter(name='admin').exists(): 
+        user_group_names = get_user_group_names(request.user)
+
+        if request.user.is_superuser or 'admin' in user_group_names: 
             return [AdminUserThrottle()]
         
         # throttle scope should set in the view and scoped rate throttle only can used by managers 
-        if request.user.groups.filter(name=group_name).exists():
+        if group_name in user_group_names:
             return [ScopedRateThrottle()]
         
         if request.user.is_authenticated:
@@ -32,7 +35,7 @@ class BaseThrottleView(views.APIView):
     
     def validation(self, group_name, throttle_scope):
         throttle_rates =  list(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}).keys())
-        valid_group_names = list(Group.objects.values_list('name', flat=True))
+        valid_group_names = get_group_names()
 
         if group_name and group_name not in valid_group_names:
             raise ValidationError(f'Invalid group name: {group_name}, options are: {valid_group_names}')
@@ -13,7 +13,11 @@ from .views import (
     AddToWishlistView,
     CartItemViewSet,
     WishlistProductView,
-    PaymentProcessView
+    PaymentProcessView,
+    AsyncProductListView,
+    AsyncProductDetailView,
+    AsyncCategoryListView,
+    AsyncCommentListView,
 )
 
 
@@ -39,7 +43,17 @@ wishlist_router = routers.NestedDefaultRouter(router, 'wishlist', lookup='wishli
 wishlist_router.register('products', WishlistProductView, basename='wishlist-products') # wishlist/id/products/product_id
 
 
+# async versions of the hot read endpoints, for ASGI deployments
+async_urlpatterns = [
+    path('products/', AsyncProductListView.as_view(), name='async-product-list'),
+    path('products/<str:slug>/', AsyncProductDetailView.as_view(), name='async-product-detail'),
+    path('products/<str:product_slug>/comments/', AsyncCommentListView.as_view(), name='async-product-comments-list'),
+    path('categories/', AsyncCategoryListView.as_view(), name='async-category-list'),
+]
+
+
 urlpatterns = [
     path('', include(router.urls)),
     path('payment', PaymentProcessView.as_view(), name='payment-process'),
+    path('async/', include(async_urlpatterns)),
 ] + product_router.urls + cart_router.urls + wishlist_router.urls
@@ -1,12 +1,14 @@
 from rest_framework import serializers
 
+from .inventory import get_available_inventory
 from .models import Product
 
 def quantity_validation(product: Product, quantity: int):
+    inventory = get_available_inventory(product)
 
-    if quantity > product.inventory:
+    if quantity > inventory:
         raise serializers.ValidationError(
-            f'quantity must be less than {product.name} inventory | < {product.inventory }'
+            f'quantity must be less than {product.name} inventory | < {inventory }'
         )
     
     return quantity
\ No newline at end of file
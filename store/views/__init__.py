@@ -5,4 +5,5 @@ from .wishlist_views import WishlistViewSet, AddToWishlistView, WishlistProductV
 from .cart_views import CartViewSet, AddToCartView, CartItemViewSet
 from .customer_views import CustomerViewSet, AddressViewSet
 from .order_views import OrderViewSet
-from .payment_views import PaymentProcessView
\ No newline at end of file
+from .payment_views import PaymentProcessView
+from .async_views import AsyncCategoryListView, AsyncCommentListView, AsyncProductDetailView, AsyncProductListView
\ No newline at end of file
@@ -0,0 +1,159 @@
+import abc
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views import View
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.renderers import JSONRenderer
+
+from config.async_cache import aget_cache_generation, aget_or_compute_cache, async_cache
+from config.db_routers import read_from_primary
+
+from .imports import *
+from .product_views import CategoryViewSet, CommentViewSet, ProductViewSet
+
+
+class AsyncReadView(View, metaclass=abc.ABCMeta):
+    """
+    Async version of a read action of `viewset_class` for ASGI deployments. The queryset, filters, pagination,
+    serializer and throttles of the viewset are reused, only the queries go through the async ORM and the cache
+    through async_cache. The content is read anonymously and rendered as json, the sync endpoints keep cursor
+    pagination and the browsable api.
+    """
+    viewset_class = None
+    action = 'list'
+    renderer_class = JSONRenderer
+    # cached bodies are keyed by the generation of this namespace, None disables the cache
+    cache_namespace = None
+    cache_timeout = 60 * 15
+
+    def get_viewset(self, request, *args, **kwargs):
+        viewset = self.viewset_class(action_map={'get': self.action}, args=args, kwargs=kwargs, format_kwarg=None)
+        # the drf request only authenticates when request.user is read, which the read actions do not do
+        viewset.request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.action = self.action
+        return viewset
+
+    def get_serializer_context(self, viewset):
+        return viewset.get_serializer_context()
+
+    def render(self, data):
+        return self.renderer_class().render(data)
+
+    async def get_cache_key(self, request):
+        generation = await aget_cache_generation(self.cache_namespace)
+        # absolute links in the body depend on the host
+        return f'{self.cache_namespace}.async:{generation}:{make_etag(request.get_host(), request.get_full_path())}'
+
+    async def check_throttles(self, viewset):
+        # same rates and request history as the sync endpoints, the throttles authenticate the user first
+        await sync_to_async(viewset.check_throttles)(viewset.request)
+
+    @abc.abstractmethod
+    async def get_content(self, viewset):
+        """
+        The rendered body of the response.
+        """
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.get_viewset(request, *args, **kwargs)
+
+        try:
+            await self.check_throttles(viewset)
+
+            if self.cache_namespace is None:
+                content = await self.get_content(viewset)
+            else:
+                cache_key = await self.get_cache_key(request)
+                content = await async_cache.get(cache_key)
+
+                if content is None:
+                    # shared by every client, see read_from_primary
+                    with read_from_primary():
+                        content = await self.get_content(viewset)
+                    await async_cache.set(cache_key, content, self.cache_timeout)
+
+        except APIException as exc:
+            response = HttpResponse(self.render({'detail': exc.detail}), status=exc.status_code, content_type=self.renderer_class.media_type)
+            if isinstance(exc, Throttled) and exc.wait is not None:
+                response['Retry-After'] = str(int(exc.wait))
+            return response
+
+        response = HttpResponse(content, content_type=self.renderer_class.media_type)
+        # bodies mostly come from the cache, hashing them is cheaper than the validator queries of the sync views
+        response['ETag'] = quote_etag(make_etag(content))
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+class AsyncListView(AsyncReadView):
+    async def get_content(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        serializer_class = viewset.get_serializer_class()
+        context = self.get_serializer_context(viewset)
+
+        # page number pagination only, it is the default of every viewset served here
+        paginator = viewset.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, viewset.request, view=viewset)
+
+        if page is None:
+            instances = [instance async for instance in queryset]
+            return self.render(serializer_class(instances, many=True, context=context).data)
+
+        serializer = serializer_class(page, many=True, context=context)
+        return self.render(paginator.get_paginated_response(serializer.data).data)
+
+
+class AsyncProductListView(AsyncListView):
+    viewset_class = ProductViewSet
+    cache_namespace = ProductViewSet.CACHE_KEY_PREFIX
+
+
+class AsyncProductDetailView(AsyncReadView):
+    viewset_class = ProductViewSet
+    action = 'retrieve'
+
+    async def get_content(self, viewset):
+        queryset = viewset.get_queryset().filter(slug=viewset.kwargs['slug'])
+
+        # embedded comments are not part of the cached payload
+        if viewset.expand_comments():
+            product = await queryset.afirst()
+            if product is None:
+                raise NotFound()
+            return self.render(ProductSerializer(product, context=self.get_serializer_context(viewset)).data)
+
+        async def get_product_data():
+            with read_from_primary():
+                product = await queryset.select_related('category').afirst()
+            if product is None:
+                raise NotFound()
+            return ProductSerializer(product, context={'request': viewset.request}).data
+
+        # same entry and refresh lock as ProductViewSet.retrieve
+        product_data = await aget_or_compute_cache(
+            get_product_detail_cache_key(viewset.kwargs['slug']),
+            get_product_data,
+            timeout=PRODUCT_DETAIL_CACHE_TIMEOUT,
+            soft_timeout=PRODUCT_DETAIL_SOFT_TIMEOUT,
+        )
+        return self.render(apply_fieldset(product_data, viewset.get_sparse_fieldset()))
+
+
+class AsyncCategoryListView(AsyncListView):
+    viewset_class = CategoryViewSet
+    cache_namespace = CategoryViewSet.CACHE_KEY_PREFIX
+
+
+class AsyncCommentListView(AsyncListView):
+    viewset_class = CommentViewSet
+
+    def get_serializer_context(self, viewset):
+        # the product of the sync context is only needed to create comments
+        return {'request': viewset.request}
+
+    async def get_content(self, viewset):
+        if not await Product.objects.filter(slug=viewset.kwargs['product_slug']).aexists():
+            raise NotFound()
+        return await super().get_content(viewset)
@@ -1,7 +1,7 @@
 from .imports import *
 
 
-class CartViewSet(ModelViewSet):
+class CartViewSet(SparseFieldsetViewMixin, ModelViewSet):
     http_method_names = ['get', 'delete', 'options', 'head']
     lookup_field = 'id'
     serializer_class = CartSerializer
@@ -19,9 +19,12 @@ class CartViewSet(ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         session_key = self.request.session.session_key
-        queryset =  Cart.objects.prefetch_related(
-                        Prefetch('items', queryset=CartItem.objects.select_related('product'))
-                    )
+        queryset = Cart.objects.all()
+
+        # items back both the items list and the total price
+        if self.is_field_rendered('items') or self.is_field_rendered('total_price'):
+            # the available inventory of every item is rendered from the annotated stock of its product
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=CartItem.objects.prefetch_related(prefetch_stock())))
 
         if self.is_admin_or_manager():
             return queryset.all().order_by('-created_at')
@@ -117,7 +120,7 @@ class CartItemViewSet(ModelViewSet):
     def get_queryset(self):
         request = self.request
         cart_id = self.kwargs['cart_id']
-        queryset = CartItem.objects.select_related('cart', 'product').filter(
+        queryset = CartItem.objects.select_related('cart').prefetch_related(prefetch_stock()).filter(
             cart__id=cart_id
             ).order_by('-quantity')
         
@@ -1,27 +1,44 @@
 import requests
 import json
 
-from celery import group
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.cache import cache
 from django.db import IntegrityError, transaction
-from django.db.models import Count, Prefetch
+from django.db.models import Count, Max, Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.utils.timezone import now
 from django.views.decorators.cache import cache_page
 
+from config.db_routers import read_from_primary
+from config.utils import cache_page_with_generation, conditional_view, get_cache_generation, get_or_compute_cache, make_etag
+
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, SAFE_METHODS
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ViewSet
 
-from ..filters import ProductFilter, OrderFilter, CustomerWithOutAddress
-from ..paginations import StandardResultSetPagination, LargeResultSetPagination
+from ..caching import PRODUCT_DETAIL_CACHE_TIMEOUT, PRODUCT_DETAIL_SOFT_TIMEOUT, get_product_detail_cache_key
+from ..exporters import ProductExporter
+from ..fieldsets import SparseFieldsetViewMixin, apply_fieldset
+from ..importers import ProductImporter
+from ..inventory import RESERVATION_TIMEOUT, InsufficientInventory, reserve_inventory
+from ..ledger import prefetch_stock
+from ..filters import ProductFilter, ProductSearchFilter, OrderFilter, CustomerWithOutAddress
+from ..paginations import (
+    StandardResultSetPagination, 
+    LargeResultSetPagination,
+    ProductCursorPagination,
+    OrderCursorPagination,
+    CursorPaginationMixin,
+)
 from ..permissions import IsProductManager, IsContentManager, IsCustomerManager, IsOrderManager 
 from ..throttle import BaseThrottleView
 from ..models import (
@@ -38,13 +55,15 @@ from ..models import (
 )
 from ..tasks import (
     approve_order_status_after_successful_payment,
-    update_inventory, 
+    update_order_inventory,
     change_anon_cart_to_auth_cart,
     transit_anon_cart_items_to_auth_cart_and_delete,
 )
 from ..serializers import (
+    CategoryProductsSerializer,
     CategorySerializer,
     CommentSerializer,
+    ProductBulkUpdateSerializer,
     ProductSerializer,
     WishlistProductSerializer,
     WishlistSerializer,
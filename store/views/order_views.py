@@ -1,21 +1,26 @@
 from .imports import *
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(SparseFieldsetViewMixin, CursorPaginationMixin, ModelViewSet):
     filter_backends = [OrderingFilter, SearchFilter, DjangoFilterBackend]
     filterset_class = OrderFilter
     search_fields = ['customer__user__username']
     ordering_fields = ['datetime_created']
     pagination_class = StandardResultSetPagination
+    cursor_pagination_class = OrderCursorPagination
 
     def is_manager(self):
         user = self.request.user
         return user.is_superuser or user.groups.filter(name='Order Manager').exists()
 
     def get_queryset(self):
-        queryset = Order.objects.prefetch_related(
-            Prefetch('items', OrderItem.objects.select_related('product')),
-        ).select_related('customer__user', 'customer__address').order_by('-datetime_created')
+        queryset = Order.objects.order_by('-datetime_created')
+
+        # items back both the items list and the total price
+        if self.is_field_rendered('items') or self.is_field_rendered('total_items_price'):
+            queryset = queryset.prefetch_related(Prefetch('items', OrderItem.objects.select_related('product')))
+        if self.is_field_rendered('customer'):
+            queryset = queryset.select_related('customer__user', 'customer__address')
         
         return queryset.all() if self.is_manager() else queryset.filter(customer__user=self.request.user)
 
@@ -40,11 +45,10 @@ class OrderViewSet(ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         order = self.get_object()
 
-        # Trigger the Celery task to increase products inventory asynchronously
-        task_list = group(
-            update_inventory.s(orderitem.product.id, orderitem.quantity, False) for orderitem in order.items.all()
-        )
-        task_list.apply_async()
+        # only paid orders took their items from the inventory, the reservations of unpaid ones are released on deletion
+        if order.status == Order.ORDER_STATUS_PAID:
+            # Trigger the Celery task to increase products inventory asynchronously, one task for the whole order
+            update_order_inventory.delay(list(order.items.values_list('product_id', 'quantity')), False)
 
         return super().destroy(request, *args, **kwargs)
 
@@ -39,14 +39,9 @@ class PaymentProcessView(APIView):
             
             if data['data']['code'] == 100:
                 # Trigger the Celery task to approve order status asynchronously
+                # the task also turns the stock reservation of the order into a deduction of the inventory
                 approve_order_status_after_successful_payment.delay(order_id)
 
-                # Trigger the Celery task to reduce products inventory asynchronously
-                task_list = group(
-                    update_inventory.s(orderitem.product.id, orderitem.quantity, True) for orderitem in order.items.all()
-                )
-                task_list.apply_async()
-
                 return Response(f"Transaction success. | ref_id: {data['data']['ref_id']}.", status=status.HTTP_200_OK)
             
             elif data['data']['code'] == 101:
@@ -67,12 +62,16 @@ class PaymentProcessView(APIView):
         order_id = request.data['order_id']
         order_obj = Order.objects.select_related('customer').prefetch_related('items').get(id=order_id)
 
-        # check the inventory to make sure the product stock is avaliable if not guide the user to update his order
-        has_sufficient_stock, insufficient_products =  order_obj.check_stock()
-
-        if not has_sufficient_stock:
+        # renew the stock reservation for the payment, items released after an expiry are reserved again if there is stock left
+        expires_at = now() + RESERVATION_TIMEOUT
+        try:
+            reserve_inventory(order_obj, [(orderitem.product_id, orderitem.quantity) for orderitem in order_obj.items.all()], expires_at)
+        except InsufficientInventory as e:
             order_obj.delete()
-            return Response(f'Your order items has not enough stock please submit your order again. | detail: {insufficient_products}', status=status.HTTP_400_BAD_REQUEST)
+            return Response(f'Your order items has not enough stock please submit your order again. | detail: {e.insufficient_products}', status=status.HTTP_400_BAD_REQUEST)
+
+        order_obj.expires_at = expires_at
+        order_obj.save(update_fields=['expires_at'])
         
         # payment data request to zarinpal
         zarinpal_request_url = 'https://sandbox.zarinpal.com/pg/v4/payment/request.json'
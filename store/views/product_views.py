@@ -1,51 +1,187 @@
 from .imports import *
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(SparseFieldsetViewMixin, CursorPaginationMixin, ModelViewSet):
     serializer_class = ProductSerializer
     lookup_field = 'slug'
-    queryset = Product.objects.prefetch_related('comments').select_related('category').annotate(
-        comments_count=Count('comments')
-        ).all().order_by('-id')
-    filter_backends = [SearchFilter, OrderingFilter , DjangoFilterBackend]
+    queryset = Product.objects.defer('search_vector').order_by('-id')
+    filter_backends = [ProductSearchFilter, OrderingFilter , DjangoFilterBackend]
     filterset_class = ProductFilter
     ordering_fields = ['name', 'inventory', 'unit_price']
-    search_fields = ['name', 'category__title']
     pagination_class = LargeResultSetPagination
+    cursor_pagination_class = ProductCursorPagination
     permission_classes = [IsProductManager]
 
     CACHE_KEY_PREFIX = "product_list"
+    FACETS_CACHE_TIMEOUT = 60 * 15
+    # query params that do not change which products are counted by the facets
+    FACETS_IGNORED_PARAMS = ['page', 'page_size', 'ordering', 'cursor', 'pagination', 'format']
+    EMBEDDED_COMMENTS_LIMIT = 3
+    MAX_EMBEDDED_COMMENTS_LIMIT = 10
 
-    @method_decorator(cache_page(60 * 15, key_prefix=CACHE_KEY_PREFIX))
+    def expand_comments(self):
+        expand = self.request.query_params.get('expand', '').split(',')
+        return self.request.method in SAFE_METHODS and 'comments' in expand and self.is_field_rendered('comments')
+    
+    def get_embedded_comments_limit(self):
+        try:
+            limit = int(self.request.query_params.get('comments_limit', self.EMBEDDED_COMMENTS_LIMIT))
+        except ValueError:
+            limit = self.EMBEDDED_COMMENTS_LIMIT
+        return min(max(limit, 1), self.MAX_EMBEDDED_COMMENTS_LIMIT)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        # the category link is rendered from the joined row
+        if self.is_field_rendered('category'):
+            queryset = queryset.select_related('category')
+
+        if self.expand_comments():
+            # sliced prefetch runs as one windowed query (ROW_NUMBER per product) for the whole page
+            latest_comments = Comment.approved.order_by('-datetime_created')[:self.get_embedded_comments_limit()]
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=latest_comments, to_attr='latest_comments'))
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_comments'] = self.expand_comments()
+        return context
+
+    def get_list_validators(self):
+        # embedded comments change without touching the product rows
+        if self.expand_comments():
+            return None, None
+
+        # a deleted row does not move the max timestamp but it changes the count
+        catalog_state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count = Count('id'),
+            last_modified = Max('datetime_modified'),
+            category_last_modified = Max('category__datetime_modified'),
+        )
+        return make_etag(self.request.accepted_renderer.format, *catalog_state.values()), None
+    
+    def get_detail_validators(self):
+        if self.expand_comments():
+            return None, None
+
+        product_state = Product.objects.filter(slug=self.kwargs['slug']) \
+            .values_list('datetime_modified', 'category__datetime_modified').first()
+        
+        if product_state is None:
+            return None, None
+        return make_etag(self.request.accepted_renderer.format, *product_state), max(product_state)
+
+    @conditional_view('get_list_validators')
+    @method_decorator(cache_page_with_generation(60 * 15, namespace=CACHE_KEY_PREFIX))
+    @method_decorator(read_from_primary())
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         
         page = self.paginate_queryset(queryset)
 
-        if page:
+        if page is not None:
             serializer = self.get_serializer(page, many=True)
             paginated_response = self.get_paginated_response(serializer.data)
 
             return paginated_response
+        
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
     
-    def retrieve(self, request, *args, **kwargs):
-        # custom caching to get the product slug dynamically
-        product_slug = kwargs.get('slug')
-        product_cache = cache.get(product_slug)
+    def get_facets_cache_key(self):
+        filter_params = sorted(
+            (param, sorted(values)) for param, values in self.request.query_params.lists()
+            if param not in self.FACETS_IGNORED_PARAMS
+        )
+        # product changes bump the list generation, facets of older generations are never read again
+        return f'product_facets:{get_cache_generation(self.CACHE_KEY_PREFIX)}:{make_etag(*filter_params)}'
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        cache_key = self.get_facets_cache_key()
+        facets = cache.get(cache_key)
+
+        if facets is None:
+            with read_from_primary():
+                queryset = self.filter_queryset(self.get_queryset())
+                facets = ProductFilter.get_facets(queryset)
+            cache.set(cache_key, facets, self.FACETS_CACHE_TIMEOUT)
+
+        return Response(facets, status=status.HTTP_200_OK)
 
-        if product_cache:
-            return Response(product_cache)
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_products(self, request):
+        """
+        Create or update products from an uploaded CSV or NDJSON `file`, products are matched by the slug of their name.
+        """
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({'file': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            product = self.get_queryset().get(slug=product_slug)
-            serializer = ProductSerializer(product, context={'request': request})
+        file_format = request.query_params.get('file_format') or uploaded_file.name.rsplit('.', 1)[-1].lower()
+        if file_format not in ProductImporter.FILE_FORMATS:
+            return Response(
+                {'file_format': f'Invalid file format: {file_format}, options are: {list(ProductImporter.FILE_FORMATS)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # feeds larger than the upload memory limit are streamed from a temporary file
+        report = ProductImporter().run(uploaded_file, file_format)
+        return Response(report, status=status.HTTP_200_OK)
 
-            # cache serialized product before returning the response 
-            cache.set(product_slug, serializer.data, 60 * 15)
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every product matching the list filters as ndjson, csv, xml, yaml or txt, one line per product.
+        """
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in ProductExporter.FILE_FORMATS:
+            return Response(
+                {'file_format': f'Invalid file format: {file_format}, options are: {list(ProductExporter.FILE_FORMATS)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        content_type, extension = ProductExporter.FILE_FORMATS[file_format]
+        exporter = ProductExporter(self.filter_queryset(Product.objects.all()))
 
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Product.DoesNotExist:
-            raise NotFound()
+        response = StreamingHttpResponse(exporter.export(file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{extension}"'
+        return response
+
+    @action(detail=False, methods=['patch'], url_path='bulk-update', serializer_class=ProductBulkUpdateSerializer)
+    def bulk_update(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated_count = serializer.save()
+
+        return Response({'updated': updated_count}, status=status.HTTP_200_OK)
+
+    @conditional_view('get_detail_validators')
+    def retrieve(self, request, *args, **kwargs):
+        # embedded comments are not part of the cached payload
+        if self.expand_comments():
+            return super().retrieve(request, *args, **kwargs)
+
+        product_slug = kwargs.get('slug')
+
+        @read_from_primary()
+        def get_product_data():
+            try:
+                product = self.get_queryset().select_related('category').get(slug=product_slug)
+            except Product.DoesNotExist:
+                raise NotFound()
+            # the full payload is cached, sparse fieldsets are applied to the copy served
+            return ProductSerializer(product, context={'request': request}).data
+
+        # a single request rebuilds a missing or stale entry, the others are served the stale copy
+        product_data = get_or_compute_cache(
+            get_product_detail_cache_key(product_slug),
+            get_product_data,
+            timeout=PRODUCT_DETAIL_CACHE_TIMEOUT,
+            soft_timeout=PRODUCT_DETAIL_SOFT_TIMEOUT,
+        )
+        return Response(apply_fieldset(product_data, self.get_sparse_fieldset()), status=status.HTTP_200_OK)
 
     def destroy(self, request, slug):
         product = get_object_or_404(Product.objects.select_related('category').all(), slug=slug)
@@ -70,15 +206,83 @@ class ProductViewSet(ModelViewSet):
 class CategoryViewSet(ModelViewSet):
     serializer_class = CategorySerializer
     lookup_field = 'slug'
-    queryset = Category.objects.all().annotate(
+    queryset = Category.objects.select_related('top_product').annotate(
             # with annotate method, products_count is known as a Category field when this view is called.
             products_count = Count('products')
-        ).prefetch_related('products').order_by('-products_count')
+        ).order_by('-products_count')
     filter_backends = [DjangoFilterBackend]
     filterset_fields  = ['title']
     pagination_class = StandardResultSetPagination
     permission_classes = [IsProductManager]
 
+    CACHE_KEY_PREFIX = "category_list"
+    PRODUCTS_PREVIEW_LIMIT = 5
+    MAX_PRODUCTS_PREVIEW_LIMIT = 20
+    PRODUCTS_ORDERING_FIELDS = ['name', 'unit_price', 'inventory', 'datetime_created']
+    DEFAULT_PRODUCTS_ORDERING = '-datetime_created'
+
+    def get_products_preview_limit(self):
+        try:
+            limit = int(self.request.query_params.get('products_limit', self.PRODUCTS_PREVIEW_LIMIT))
+        except ValueError:
+            limit = self.PRODUCTS_PREVIEW_LIMIT
+        return min(max(limit, 0), self.MAX_PRODUCTS_PREVIEW_LIMIT)
+    
+    def get_products_ordering(self):
+        ordering = self.request.query_params.get('products_ordering', self.DEFAULT_PRODUCTS_ORDERING)
+
+        if ordering.lstrip('-') not in self.PRODUCTS_ORDERING_FIELDS:
+            ordering = self.DEFAULT_PRODUCTS_ORDERING
+        # id keeps the order of equal values stable between pages
+        return [ordering, '-id']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action in ['list', 'retrieve']:
+            # sliced prefetch runs as one windowed query (ROW_NUMBER per category) instead of loading every product
+            preview_products = Product.objects.order_by(*self.get_products_ordering())[:self.get_products_preview_limit()]
+            queryset = queryset.prefetch_related(Prefetch('products', queryset=preview_products, to_attr='preview_products'))
+        return queryset
+
+    def get_catalog_state(self, categories):
+        return categories.order_by().aggregate(
+            count = Count('id', distinct=True),
+            last_modified = Max('datetime_modified'),
+            products_count = Count('products'),
+            products_last_modified = Max('products__datetime_modified'),
+        )
+
+    def get_list_validators(self):
+        catalog_state = self.get_catalog_state(self.filter_queryset(Category.objects.all()))
+        return make_etag(self.request.accepted_renderer.format, *catalog_state.values()), None
+    
+    def get_detail_validators(self):
+        catalog_state = self.get_catalog_state(Category.objects.filter(slug=self.kwargs['slug']))
+
+        if not catalog_state['count']:
+            return None, None
+        return make_etag(self.request.accepted_renderer.format, *catalog_state.values()), None
+
+    @conditional_view('get_list_validators')
+    @method_decorator(cache_page_with_generation(60 * 15, namespace=CACHE_KEY_PREFIX))
+    @method_decorator(read_from_primary())
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional_view('get_detail_validators')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'], serializer_class=CategoryProductsSerializer)
+    def products(self, request, slug):
+        category = get_object_or_404(Category.objects.all(), slug=slug)
+        queryset = Product.objects.filter(category=category).order_by(*self.get_products_ordering())
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def destroy(self, request, slug):
         category = get_object_or_404(Category.objects.all().annotate(products_count = Count('products')), slug=slug)
         if category.products.count() > 0:
@@ -1,7 +1,7 @@
 from .imports import *
 
 
-class WishlistViewSet(ModelViewSet):
+class WishlistViewSet(SparseFieldsetViewMixin, ModelViewSet):
     http_method_names = ['get', 'delete', 'options', 'head']
     lookup_field = 'id'
     serializer_class = WishlistSerializer
@@ -14,7 +14,10 @@ class WishlistViewSet(ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Wishlist.objects.select_related('user').prefetch_related('products')
+        queryset = Wishlist.objects.select_related('user')
+
+        if self.is_field_rendered('products'):
+            queryset = queryset.prefetch_related('products')
 
         if self.is_admin_or_manager():
             return queryset.all().order_by('user__id')